@@ -20,7 +20,10 @@ def handle_pdf_upload(files):
                 st.session_state.uploaded_pdfs.append(fname)
 
         if backend_files:
-            st.toast(f"✅ Added {len(backend_files)} PDF(s)")
+            if response.get("status") == "queued":
+                st.toast(f"⏳ Processing {len(backend_files)} PDF(s) in the background")
+            else:
+                st.toast(f"✅ Added {len(backend_files)} PDF(s)")
             st.session_state.uploader_key += 1  # this resets the widget of the streamlit file uploader
     
     st.session_state.processing = False
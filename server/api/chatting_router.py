@@ -37,12 +37,14 @@ async def run_rag(
             "retrieval_complete": False,
             "used_tools": [],
             "agent_scratchpad": [],
-            "retrieved_chunks": [],
+            "retrieved_chunks": None,
             "reranked_chunks": [],
             "selected_chunks": [],
             "tool_outputs": [],
             "sources_used": [],
             "next_tool_hint": "",
+            "planned_tools": [],
+            "tool_reports": None,
         }
 
         # 2. Invoke Graph logic
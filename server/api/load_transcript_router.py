@@ -1,13 +1,19 @@
+import json
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from modules.verify_session import verify_and_initialize_session
 from auth.dependencies import get_current_user_optional
-from modules.load_transcript import load_transcript 
+from modules.load_transcript import (
+    TRANSCRIPT_BULK_MAX_VIDEOS,
+    load_transcript,
+    load_transcripts_bulk,
+)
+from modules.get_transcript import fetch_playlist_video_ids
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +26,11 @@ class TranscriptRequest(BaseModel):
     url: str
     session_id: str
 
+class BulkTranscriptRequest(BaseModel):
+    session_id: str
+    urls: List[str] = []
+    playlist_id: Optional[str] = None
+
 # --- Router Endpoint ---
 @router.post("/load")
 async def load_transcripts_endpoint(
@@ -54,4 +65,49 @@ async def load_transcripts_endpoint(
         return JSONResponse(
             status_code=500, 
             content={"error": "An internal error occurred while processing the transcript"}
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/load/bulk")
+async def load_transcripts_bulk_endpoint(
+    request_data: BulkTranscriptRequest,
+    oauth_id: Optional[str] = Depends(get_current_user_optional)
+):
+    """
+    Loads a list of YouTube URLs and/or a playlist into a session.
+    SSE stream: one `video` event per status change, then a `done` summary.
+    """
+    session_id = request_data.session_id
+    urls = list(request_data.urls)
+
+    await verify_and_initialize_session(session_id, oauth_id)
+
+    if request_data.playlist_id:
+        video_ids = await fetch_playlist_video_ids(request_data.playlist_id, TRANSCRIPT_BULK_MAX_VIDEOS)
+        urls += [f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids]
+
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs or playlist given.")
+    if len(urls) > TRANSCRIPT_BULK_MAX_VIDEOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {TRANSCRIPT_BULK_MAX_VIDEOS} videos can be loaded per request.",
+        )
+
+    async def event_generator():
+        try:
+            async for event in load_transcripts_bulk(urls, session_id=session_id):
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.exception("Bulk transcript load failed")
+            yield f"data: {json.dumps({'type': 'error', 'data': 'An internal error occurred while processing the transcripts'})}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Critical for Nginx
+        },
+    )
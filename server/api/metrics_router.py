@@ -0,0 +1,27 @@
+import logging
+from fastapi import APIRouter
+from global_modules.embedding_service import get_embedding_service
+from global_modules.ocr_cache import get_ocr_cache
+from global_modules.reranker_service import get_reranker_service
+from modules.session_gc import get_session_gc
+from mongodb.session_index import get_session_index_cache
+from modules.transcript_service import get_transcript_service
+from tools.vector_search import hybrid_search_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Runtime counters of the shared services."""
+    return {
+        "embedding_service": get_embedding_service().stats(),
+        "reranker_service": get_reranker_service().stats(),
+        "session_vector_index": get_session_index_cache().stats(),
+        "ocr_cache": get_ocr_cache().stats(),
+        "transcript_cache": get_transcript_service().stats(),
+        "session_gc": get_session_gc().stats(),
+        "hybrid_search": hybrid_search_stats(),
+    }
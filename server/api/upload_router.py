@@ -1,11 +1,12 @@
+import json
 import logging
 from typing import List, Optional
 from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from modules.verify_session import verify_and_initialize_session
 from auth.dependencies import get_current_user_optional
-from modules.pdf_handlers import save_uploaded_files
-from mongodb.vector_ingest import ingest_files_to_mongo
+from modules.pdf_handlers import discard_uploads, save_uploaded_files
+from modules.ingestion_jobs import get_ingestion_queue, TERMINAL_STATUSES
 
 logger = logging.getLogger(__name__)
 
@@ -18,38 +19,112 @@ router = APIRouter(
 async def upload_pdfs(
     files: List[UploadFile] = File(...),
     session_id: str = Form(...),
-    oauth_id: Optional[str] = Depends(get_current_user_optional) 
+    oauth_id: Optional[str] = Depends(get_current_user_optional)
 ):
     """
-    Handles PDF uploads: saves locally, updates Postgres, and ingests to Vector DB.
+    Handles PDF uploads: saves locally, updates Postgres, and queues the
+    Vector DB ingestion. Returns a job id to poll instead of waiting for it.
     """
     if not files or all(f.filename.strip() == "" for f in files):
         raise HTTPException(status_code=400, detail="No files were uploaded.")
-    
+
     uploaded_filenames = [f.filename for f in files if f.filename.strip() != ""]
-    
+
     # 1. Security check
     await verify_and_initialize_session(session_id, oauth_id)
-    
-    try: 
+
+    queue = get_ingestion_queue()
+    # Cheap rejection before anything is written; submit() re-checks atomically
+    queue.ensure_capacity()
+
+    try:
         # 2. temporarly save files & Update Postgres
-        saved_paths = await save_uploaded_files(files, session_id)
-        
-        # 3. Vector ingestion
-        result = await ingest_files_to_mongo(
-            file_paths=saved_paths,
-            session_id=session_id,
-            keep_local=False, # Deletes files after ingestion
-        )
-        
+        saved_uploads = await save_uploaded_files(files, session_id)
+
+        # 3. Vector ingestion runs in the background job queue
+        try:
+            job_id = await queue.submit(session_id, oauth_id, saved_uploads)
+        except Exception:
+            # Not queued: nothing would ever ingest or delete these files
+            await discard_uploads(session_id, saved_uploads)
+            raise
+
         return JSONResponse(
-            status_code=200, 
-            content={"status": result.get("status", "success"), "session_id": session_id, "filenames":uploaded_filenames}
+            status_code=202,
+            content={"status": "queued", "job_id": job_id, "session_id": session_id, "filenames":uploaded_filenames}
         )
 
+    except HTTPException as he:
+        # Pass through size limit / empty file / queue full errors
+        raise he
     except Exception as e:
         logger.exception("Upload or Ingestion failed")
         return JSONResponse(
-            status_code=500, 
+            status_code=500,
             content={"error": "An internal error occurred during file processing"}
-        )
\ No newline at end of file
+        )
+
+
+async def _get_owned_job(job_id: str, oauth_id: Optional[str]):
+    job = await get_ingestion_queue().get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["oauth_id"] is not None and job["oauth_id"] != oauth_id:
+        raise HTTPException(status_code=403, detail="❌ Access Denied: This job is private.")
+    return job
+
+
+def _job_response(job):
+    return {k: v for k, v in job.items() if k not in ("oauth_id", "version")}
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    oauth_id: Optional[str] = Depends(get_current_user_optional)
+):
+    """Poll the status, page progress and final chunk counts of an ingestion job."""
+    job = await _get_owned_job(job_id, oauth_id)
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ingestion_job(
+    job_id: str,
+    oauth_id: Optional[str] = Depends(get_current_user_optional)
+):
+    """SSE stream of job snapshots; ends after the job completes or fails."""
+    job = await _get_owned_job(job_id, oauth_id)
+    queue = get_ingestion_queue()
+
+    async def event_generator():
+        current = job
+        last_sent = None
+        try:
+            while True:
+                payload = _job_response(current)
+                if payload != last_sent:
+                    yield f"data: {json.dumps({'type': 'progress', 'data': payload})}\n\n"
+                    last_sent = payload
+                else:
+                    yield f"data: {json.dumps({'type': 'heartbeat', 'data': 'keep-alive'})}\n\n"
+
+                if current["status"] in TERMINAL_STATUSES:
+                    yield f"data: {json.dumps({'type': 'done', 'data': current['status']})}\n\n"
+                    break
+
+                await queue.wait_for_change(job_id, current.get("version", 0), timeout=15)
+                current = await queue.get_job(job_id) or current
+        except Exception as e:
+            logger.error(f"SSE Error: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'data': 'Stream Break'})}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Critical for Nginx
+        },
+    )
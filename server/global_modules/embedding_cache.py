@@ -0,0 +1,184 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from global_modules.mongo_collections import embedding_cache_collection
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBED_CACHE_MEMORY_ENTRIES", "20000"))
+EMBED_CACHE_PERSIST = os.getenv("EMBED_CACHE_PERSIST", "true").lower() == "true"
+# Tier-1 entries older than this are looked up again (0: kept until evicted)
+EMBED_CACHE_MEMORY_TTL_SEC = float(os.getenv("EMBED_CACHE_MEMORY_TTL_SEC", "3600"))
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    raw = f"{model_name}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by (model, normalized text hash).
+
+    Tier 1 is an in-process LRU + TTL cache of float32 arrays; tier 2 is the
+    shared `embedding_cache` Mongo collection (vectors packed as float32 bytes).
+    Query vectors go through the same tiers, so a repeated question is
+    answered from memory.
+    The model name is part of every key, and entries of any other model are
+    purged the first time the cache is used, so changing EMBEDDING_MODEL
+    invalidates it automatically.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = EMBED_CACHE_MEMORY_ENTRIES,
+        persist: bool = EMBED_CACHE_PERSIST,
+        collection=embedding_cache_collection,
+        memory_ttl: float = EMBED_CACHE_MEMORY_TTL_SEC,
+    ):
+        self.model_name = model_name
+        self.max_entries = max(0, max_entries)
+        self.memory_ttl = memory_ttl
+        self.persist = persist
+        self.collection = collection
+        self._memory: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._purged = False
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    # =================================================
+    # TIER 1
+    # =================================================
+
+    def _recall(self, key: str) -> Optional[np.ndarray]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            del self._memory[key]
+            self.expired += 1
+            return None
+        self._memory.move_to_end(key)
+        return vector
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.memory_ttl if self.memory_ttl > 0 else float("inf")
+        self._memory[key] = (expires_at, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors in input order, None where the text is not cached."""
+        await self._purge_stale_models()
+
+        keys = [embedding_cache_key(self.model_name, t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        from_memory = set()
+
+        for key in keys:
+            vector = self._recall(key)
+            if vector is not None:
+                found[key] = vector
+                from_memory.add(key)
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self.persist:
+            try:
+                cursor = self.collection.find(
+                    {"_id": {"$in": missing}},
+                    {"vector": 1},
+                )
+                async for doc in cursor:
+                    vector = np.frombuffer(doc["vector"], dtype=np.float32)
+                    found[doc["_id"]] = vector
+                    self._remember(doc["_id"], vector)
+            except Exception as e:
+                logger.error(f"🔴 Embedding cache lookup failed: {e}")
+
+        for key in keys:
+            if key in from_memory:
+                self.memory_hits += 1
+            elif key in found:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+
+        return [found[k].tolist() if k in found else None for k in keys]
+
+    async def put_many(self, texts: List[str], vectors: List[List[float]]):
+        ops = []
+        now = datetime.now(timezone.utc)
+        for text, vector in zip(texts, vectors):
+            key = embedding_cache_key(self.model_name, text)
+            packed = np.asarray(vector, dtype=np.float32)
+            self._remember(key, packed)
+            ops.append(UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {
+                    "model": self.model_name,
+                    "vector": Binary(packed.tobytes()),
+                    "created_at": now,
+                }},
+                upsert=True,
+            ))
+
+        if ops and self.persist:
+            try:
+                await self.collection.bulk_write(ops, ordered=False)
+            except Exception as e:
+                logger.error(f"🔴 Embedding cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_expired": self.expired,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    # =================================================
+    # INVALIDATION
+    # =================================================
+
+    async def _purge_stale_models(self):
+        if self._purged or not self.persist:
+            return
+        self._purged = True
+        try:
+            result = await self.collection.delete_many({"model": {"$ne": self.model_name}})
+            if result.deleted_count:
+                logger.info(
+                    "🗑️ Purged %d cached embeddings of previous models", result.deleted_count
+                )
+        except Exception as e:
+            logger.error(f"🔴 Embedding cache purge failed: {e}")
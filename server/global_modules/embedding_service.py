@@ -0,0 +1,235 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from global_modules.embeddings import embeddings, EMBEDDING_MODEL
+from global_modules.embedding_cache import EmbeddingCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Max texts per model call; a single larger request still runs as one call
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+# How long the first request of a batch waits for others to join
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "10"))
+
+
+@dataclass
+class _EmbedRequest:
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingService:
+    """
+    Runs embedding inference on one dedicated thread, never on the event loop.
+
+    Concurrent requests from every session are coalesced into micro-batches:
+    the first waiting request opens a window of EMBED_MAX_WAIT_MS, and anything
+    arriving inside it shares the model call. Query requests are batched ahead
+    of document requests so chat latency is not stuck behind bulk uploads.
+    Texts already in the embedding cache never reach the queue, and
+    concurrent misses on the same query wait for a single embedding.
+    """
+
+    def __init__(
+        self,
+        model=embeddings,
+        max_batch: int = EMBED_MAX_BATCH,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.model = model
+        self.cache = cache
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queries: Deque[_EmbedRequest] = deque()
+        self._documents: Deque[_EmbedRequest] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight_queries: Dict[str, asyncio.Task] = {}
+
+        # metrics
+        self._query_hits = 0
+        self._query_misses = 0
+        self._query_joined = 0
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._max_batch_seen = 0
+        self._last_batch_size = 0
+        self._inference_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return await self._cached_embed(list(texts), self._documents)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        embed = self._inflight_queries.get(key)
+        if embed is not None:
+            self._query_joined += 1
+        else:
+            # Detached from this caller: a cancelled request must not cancel
+            # the embedding that identical queries are waiting on
+            embed = asyncio.ensure_future(self._cached_embed([text], self._queries))
+            self._inflight_queries[key] = embed
+            embed.add_done_callback(lambda task: self._query_done(key, task))
+        vectors = await asyncio.shield(embed)
+        return vectors[0]
+
+    def _query_done(self, key: str, task: asyncio.Task):
+        if self._inflight_queries.get(key) is task:
+            del self._inflight_queries[key]
+        if not task.cancelled():
+            # Every caller may have gone away; mark the exception as retrieved
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._query_hits + self._query_misses
+        return {
+            "cache": self.cache.stats() if self.cache else None,
+            "queries": {
+                "hits": self._query_hits,
+                "misses": self._query_misses,
+                "joined_inflight": self._query_joined,
+                "hit_rate": round(self._query_hits / lookups, 4) if lookups else 0.0,
+            },
+            "queue_depth": len(self._queries) + len(self._documents),
+            "queued_texts": sum(len(r.texts) for r in (*self._queries, *self._documents)),
+            "requests": self._requests,
+            "texts": self._texts,
+            "batches": self._batches,
+            "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size": self._max_batch_seen,
+            "avg_inference_ms": round(1000 * self._inference_seconds / self._batches, 2) if self._batches else 0.0,
+            "avg_queue_wait_ms": round(1000 * self._wait_seconds / self._requests, 2) if self._requests else 0.0,
+        }
+
+    async def close(self):
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        for request in (*self._queries, *self._documents):
+            if not request.future.done():
+                request.future.cancel()
+        self._queries.clear()
+        self._documents.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # =================================================
+    # INTERNALS
+    # =================================================
+
+    async def _cached_embed(self, texts: List[str], lane: Deque[_EmbedRequest]) -> List[List[float]]:
+        if self.cache is None:
+            if lane is self._queries:
+                self._query_misses += len(texts)
+            return await self._submit(texts, lane)
+
+        vectors = await self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if lane is self._queries:
+            self._query_hits += len(texts) - len(missing)
+            self._query_misses += len(missing)
+        if not missing:
+            return vectors
+
+        computed = dict(zip(missing, await self._submit(missing, lane)))
+        await self.cache.put_many(missing, [computed[t] for t in missing])
+        return [v if v is not None else computed[t] for t, v in zip(texts, vectors)]
+
+    async def _submit(self, texts: List[str], lane: Deque[_EmbedRequest]) -> List[List[float]]:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+        request = _EmbedRequest(texts=texts, future=asyncio.get_running_loop().create_future())
+        lane.append(request)
+        self._wakeup.set()
+        return await request.future
+
+    def _take_batch(self) -> List[_EmbedRequest]:
+        batch: List[_EmbedRequest] = []
+        size = 0
+        for lane in (self._queries, self._documents):
+            while lane and (not batch or size + len(lane[0].texts) <= self.max_batch):
+                request = lane.popleft()
+                batch.append(request)
+                size += len(request.texts)
+        return batch
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.embed_documents(texts)
+        return [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queries and not self._documents:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Give concurrent callers a short window to join this batch
+            pending = sum(len(r.texts) for r in (*self._queries, *self._documents))
+            if pending < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+
+            batch = self._take_batch()
+            texts = [t for r in batch for t in r.texts]
+
+            started = time.monotonic()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                logger.exception("🔴 Embedding batch of %d texts failed", len(texts))
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._texts += len(texts)
+            self._requests += len(batch)
+            self._last_batch_size = len(texts)
+            self._max_batch_seen = max(self._max_batch_seen, len(texts))
+            self._inference_seconds += time.monotonic() - started
+            self._wait_seconds += sum(started - r.enqueued_at for r in batch)
+
+            offset = 0
+            for r in batch:
+                if not r.future.done():
+                    r.future.set_result(vectors[offset:offset + len(r.texts)])
+                offset += len(r.texts)
+
+
+_embedding_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService(cache=EmbeddingCache(EMBEDDING_MODEL))
+        logger.info("✅ Embedding service initialized")
+    return _embedding_service
+
+
+async def close_embedding_service():
+    global _embedding_service
+    if _embedding_service is not None:
+        await _embedding_service.close()
+        _embedding_service = None
@@ -1,9 +1,43 @@
 import os
+import logging
 from dotenv import load_dotenv
 load_dotenv()
 
 from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
+
 MONGODB_URI = os.getenv("MONGODB_URI_STRING")
 _MONGO_CLIENT = AsyncIOMotorClient(os.getenv("MONGODB_URI_STRING"))
 
-collection = _MONGO_CLIENT["rag_db"]["documents"]
\ No newline at end of file
+collection = _MONGO_CLIENT["rag_db"]["documents"]
+
+# Content-addressed store: one manifest per (file hash, chunking, model) + its chunks
+document_store_collection = _MONGO_CLIENT["rag_db"]["document_store"]
+document_store_chunks_collection = _MONGO_CLIENT["rag_db"]["document_store_chunks"]
+
+# Embeddings keyed by (model, normalized text hash), shared by every worker
+embedding_cache_collection = _MONGO_CLIENT["rag_db"]["embedding_cache"]
+
+
+async def ensure_mongo_indexes():
+    """Create the scalar indexes the app relies on (idempotent)."""
+    try:
+        await collection.create_index([("session_id", 1)], name="idx_session_id")
+        # Neighbor expansion: fetch chunk_index ± N of a source within a session
+        await collection.create_index(
+            [("session_id", 1), ("source", 1), ("chunk_index", 1)], name="idx_session_source_chunk"
+        )
+        # Lexical side of hybrid search; "none" keeps identifiers and
+        # non-English words unstemmed and stopwords searchable
+        await collection.create_index(
+            [("session_id", 1), ("text", "text")], name="idx_session_text", default_language="none"
+        )
+        await document_store_chunks_collection.create_index(
+            [("key", 1), ("ordinal", 1)], name="idx_key_ordinal"
+        )
+        # Session GC: entries not reused within DOCUMENT_STORE_TTL_DAYS
+        await document_store_collection.create_index([("last_used_at", 1)], name="idx_last_used_at")
+        logger.info("✅ MongoDB indexes ensured")
+    except Exception as e:
+        logger.error(f"🔴 Could not ensure MongoDB indexes: {e}")
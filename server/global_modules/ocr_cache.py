@@ -0,0 +1,176 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "./ocr_cache")
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+# Oldest documents are evicted past this size (0: unbounded)
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "2048"))
+# Eviction frees down to this fraction of the limit, so the next write does not rescan
+OCR_CACHE_LOW_WATER = 0.9
+
+
+def ocr_variant(zoom: float, lang: Optional[str], config: str) -> str:
+    """Everything besides the page that changes tesseract's output."""
+    raw = f"{zoom}|{lang or ''}|{config}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR text per page, keyed by
+    (pdf sha256, page index, zoom, lang, tesseract config).
+
+    Layout: <dir>/<sha[:2]>/<sha>/<variant>/<page>.txt, one small file per page,
+    written atomically so concurrent jobs and crashes never leave partial text.
+    Failed pages are not cached; genuinely blank pages are (as empty files).
+
+    Past `max_mb` whole <variant> folders are evicted, least recently used
+    (oldest mtime) first; a lookup that hits touches its folder.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = OCR_CACHE_DIR,
+        enabled: bool = OCR_CACHE_ENABLED,
+        max_mb: float = OCR_CACHE_MAX_MB,
+    ):
+        self.base_dir = Path(base_dir)
+        self.enabled = enabled
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # Unknown until the first write scans the directory
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+
+    def _dir(self, content_hash: str, variant: str) -> Path:
+        return self.base_dir / content_hash[:2] / content_hash / variant
+
+    def _read(self, folder: Path, pages: List[int]) -> Dict[int, str]:
+        found: Dict[int, str] = {}
+        if not folder.is_dir():
+            return found
+        for page in pages:
+            try:
+                found[page] = (folder / f"{page}.txt").read_text(encoding="utf-8")
+            except FileNotFoundError:
+                continue
+        if found:
+            # Recently used: evicted last
+            os.utime(folder)
+        return found
+
+    def _write(self, folder: Path, texts: Dict[int, str]) -> int:
+        folder.mkdir(parents=True, exist_ok=True)
+        written = 0
+        for page, text in texts.items():
+            # Unique per writer: threads of one process write the same page concurrently
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=folder, prefix=f"{page}.txt.", suffix=".tmp", delete=False
+            ) as tmp:
+                tmp.write(text)
+            try:
+                os.replace(tmp.name, folder / f"{page}.txt")
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+            written += len(text.encode("utf-8"))
+        return written
+
+    def _folders(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, bytes, path) of every <sha>/<variant> folder."""
+        folders = []
+        for folder in self.base_dir.glob("*/*/*"):
+            try:
+                size = sum(f.stat().st_size for f in folder.iterdir())
+                folders.append((folder.stat().st_mtime, size, folder))
+            except (FileNotFoundError, NotADirectoryError):
+                # Evicted by a concurrent writer
+                continue
+        return folders
+
+    def _evict(self) -> int:
+        """Removes the oldest folders while over the limit; returns the size left."""
+        folders = self._folders()
+        total = sum(size for _, size, _ in folders)
+        if total <= self.max_bytes:
+            return total
+        target = self.max_bytes * OCR_CACHE_LOW_WATER
+        for _, size, folder in sorted(folders):
+            if total <= target:
+                break
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= size
+            self.evicted += 1
+            # The <sha> and <sha[:2]> folders, once empty
+            for parent in (folder.parent, folder.parent.parent):
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+        logger.info("🧹 OCR cache evicted down to %.1f MB", total / (1024 * 1024))
+        return total
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    async def get_many(self, content_hash: str, variant: str, pages: List[int]) -> Dict[int, str]:
+        """Cached text of the requested pages; missing pages are absent from the result."""
+        if not self.enabled or not pages:
+            return {}
+        try:
+            found = await run_in_threadpool(self._read, self._dir(content_hash, variant), pages)
+        except Exception as e:
+            logger.error(f"🔴 OCR cache lookup failed: {e}")
+            found = {}
+        self.hits += len(found)
+        self.misses += len(pages) - len(found)
+        return found
+
+    async def put_many(self, content_hash: str, variant: str, texts: Dict[int, str]):
+        if not self.enabled or not texts:
+            return
+        try:
+            written = await run_in_threadpool(self._write, self._dir(content_hash, variant), texts)
+            self.writes += len(texts)
+            if self.max_bytes:
+                if self._size is None or self._size + written > self.max_bytes:
+                    self._size = await run_in_threadpool(self._evict)
+                else:
+                    self._size += written
+        except Exception as e:
+            logger.error(f"🔴 OCR cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evicted_documents": self.evicted,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_ocr_cache: Optional[OCRCache] = None
+
+
+def get_ocr_cache() -> OCRCache:
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = OCRCache()
+    return _ocr_cache
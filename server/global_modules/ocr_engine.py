@@ -0,0 +1,175 @@
+import os
+import io
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fitz  # PyMuPDF, also used for the text layer
+except Exception:
+    fitz = None
+
+# Optional OCR imports (also imported inside every worker process)
+try:
+    from PIL import Image
+    import pytesseract
+    OCR_AVAILABLE = fitz is not None
+except Exception:
+    Image = None
+    pytesseract = None
+    OCR_AVAILABLE = False
+
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+# Global cap on pages being rasterized/OCR'd at once, shared by every upload
+OCR_MAX_CONCURRENT_PAGES = int(os.getenv("OCR_MAX_CONCURRENT_PAGES", OCR_MAX_WORKERS * 4))
+# Pages handed to a worker per task (the worker opens the document once per batch)
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+
+TESSERACT_CONFIG = r'--oem 3 --psm 6'
+
+
+# =====================================================
+# WORKER SIDE (runs inside the process pool)
+# =====================================================
+
+def _ocr_page_batch(
+    pdf_path: str,
+    page_numbers: List[int],
+    zoom: float,
+    lang: Optional[str],
+) -> List[Tuple[int, Optional[str]]]:
+    """Open the PDF once and OCR every requested page. Never raises; failed pages get None."""
+    results: List[Tuple[int, Optional[str]]] = []
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        logger.error("🔴 OCR worker could not open %s: %s", pdf_path, e)
+        return [(n, None) for n in page_numbers]
+
+    with doc:
+        mat = fitz.Matrix(zoom, zoom)
+        for page_number in page_numbers:
+            try:
+                page = doc.load_page(page_number)
+                pix = page.get_pixmap(matrix=mat, alpha=False)
+                with Image.open(io.BytesIO(pix.tobytes("png"))) as img:
+                    img = img.convert("RGB")
+                    text = pytesseract.image_to_string(img, lang=lang, config=TESSERACT_CONFIG)
+                results.append((page_number, (text or "").strip()))
+            except Exception as e:
+                logger.error("OCR failed for %s page %d: %s", pdf_path, page_number, e)
+                results.append((page_number, None))
+    return results
+
+
+# =====================================================
+# EVENT LOOP SIDE
+# =====================================================
+
+class _PageBudget:
+    """Counting limiter that hands out several page permits atomically."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.available = self.capacity
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n: int) -> int:
+        n = min(max(1, n), self.capacity)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.available >= n)
+            self.available -= n
+        return n
+
+    async def release(self, n: int):
+        async with self._cond:
+            self.available += n
+            self._cond.notify_all()
+
+
+class OCREngine:
+    """
+    Process-pool OCR. Keeps tesseract and rasterization off the event loop's
+    thread pool and out of the GIL.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = OCR_MAX_WORKERS,
+        max_concurrent_pages: int = OCR_MAX_CONCURRENT_PAGES,
+        batch_size: int = OCR_BATCH_SIZE,
+    ):
+        self.max_workers = max_workers
+        self.batch_size = max(1, batch_size)
+        self._budget = _PageBudget(max_concurrent_pages)
+        # spawn: never fork a process that already holds torch / the event loop
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def ocr_pages(
+        self,
+        pdf_path: str,
+        page_numbers: List[int],
+        zoom: float = 1.5,
+        lang: Optional[str] = None,
+        on_pages_done: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> Dict[int, Optional[str]]:
+        """OCR the given pages of one PDF. Returns {page_number: text}, None where OCR failed."""
+        if not page_numbers:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        pages = sorted(page_numbers)
+        batches = [
+            pages[i:i + self.batch_size]
+            for i in range(0, len(pages), self.batch_size)
+        ]
+
+        async def run_batch(batch: List[int]) -> List[Tuple[int, Optional[str]]]:
+            permits = await self._budget.acquire(len(batch))
+            try:
+                result = await loop.run_in_executor(
+                    self._pool, _ocr_page_batch, pdf_path, batch, zoom, lang
+                )
+            except Exception as e:
+                logger.exception("🔴 OCR batch failed for %s: %s", pdf_path, e)
+                result = [(n, None) for n in batch]
+            finally:
+                await self._budget.release(permits)
+
+            if on_pages_done:
+                await on_pages_done(len(batch))
+            return result
+
+        results = await asyncio.gather(*(run_batch(b) for b in batches))
+        return {page: text for batch in results for page, text in batch}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_ocr_engine: Optional[OCREngine] = None
+
+
+def get_ocr_engine() -> OCREngine:
+    global _ocr_engine
+    if _ocr_engine is None:
+        _ocr_engine = OCREngine()
+        logger.info(
+            "✅ OCR process pool initialized (%d workers, %d concurrent pages)",
+            OCR_MAX_WORKERS, OCR_MAX_CONCURRENT_PAGES,
+        )
+    return _ocr_engine
+
+
+def close_ocr_engine():
+    global _ocr_engine
+    if _ocr_engine is not None:
+        _ocr_engine.shutdown()
+        _ocr_engine = None
@@ -0,0 +1,102 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from global_modules.embedding_cache import normalize_text
+
+RERANK_CACHE_ENTRIES = int(os.getenv("RERANK_CACHE_ENTRIES", "50000"))
+RERANK_CACHE_TTL_SEC = float(os.getenv("RERANK_CACHE_TTL_SEC", "3600"))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:32]
+
+
+def rerank_model_id(model_name: str, backend: str) -> str:
+    """Scores differ across backends (int8 ONNX is approximate), so both name the scorer."""
+    return f"{model_name}:{backend}"
+
+
+class RerankScoreCache:
+    """
+    In-process LRU + TTL cache of cross-encoder scores, keyed by
+    (model, normalized query hash, chunk hash).
+
+    A retrieval loop that goes back to tool_call rescoring its earlier chunks,
+    and a follow-up question hitting the same document chunks, only send the
+    new pairs to the model.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = RERANK_CACHE_ENTRIES,
+        ttl: float = RERANK_CACHE_TTL_SEC,
+    ):
+        self.model_name = model_name
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+
+    def keys(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+        """Cache key of every (query, chunk) pair; each distinct query is hashed once."""
+        query_hashes = {q: text_hash(q) for q in {q for q, _ in pairs}}
+        return [(self.model_name, query_hashes[q], text_hash(c)) for q, c in pairs]
+
+    def use_model(self, model_name: str):
+        """Switches to another scorer; scores of the previous one can never hit again."""
+        if model_name == self.model_name:
+            return
+        self.invalidated += len(self._entries)
+        self._entries.clear()
+        self.model_name = model_name
+
+    def get_many(self, keys: List[Tuple[str, str, str]]) -> List[Optional[float]]:
+        now = time.monotonic()
+        scores = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                scores.append(None)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                scores.append(entry[1])
+        return scores
+
+    def put_many(self, keys: List[Tuple[str, str, str]], scores: List[float]):
+        if not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for key, score in zip(keys, scores):
+            self._entries[key] = (expires_at, score)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
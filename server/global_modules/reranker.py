@@ -1,4 +1,178 @@
-from sentence_transformers import CrossEncoder
+import os
+import logging
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Optional ONNX Runtime backend
+try:
+    import onnxruntime
+except Exception:
+    onnxruntime = None
+
+RERANKER_MODEL = os.environ.get(
+    "RERANKER_MODEL",
+    "cross-encoder/ms-marco-MiniLM-L-6-v2"
+)
+# torch | onnx | onnx-int8 (dynamically quantized weights)
+RERANKER_BACKEND = os.environ.get("RERANKER_BACKEND", "torch")
+# Exported / quantized models are written here once and reused
+RERANKER_ONNX_DIR = os.environ.get("RERANKER_ONNX_DIR", "models/reranker-onnx")
+# CPU threads of one reranker call (0: library default, i.e. all cores).
+# ONNX Runtime applies it to its own session; torch only has a process-wide setting.
+RERANKER_THREADS = int(os.environ.get("RERANKER_THREADS", "0"))
+RERANKER_MAX_LENGTH = 512
+
+# Max |score - torch score| an ONNX model may show on PARITY_PAIRS at load
+ONNX_FP32_TOLERANCE = 1e-3
+ONNX_INT8_TOLERANCE = float(os.environ.get("RERANKER_INT8_TOLERANCE", "0.05"))
+
+PARITY_PAIRS = [
+    ("what is retrieval augmented generation", "Retrieval augmented generation grounds a language model in documents."),
+    ("what is retrieval augmented generation", "The weather in Paris is mild in spring."),
+    ("error code E1042 timeout", "E1042: the upstream request timed out after 30 seconds."),
+    ("how are pdf pages chunked", "Each page is split into chunks that are embedded and stored for vector search."),
+    ("who wrote the report", "Chunks carry the page range they were cut from."),
+]
+
+
+class OnnxCrossEncoder:
+    """
+    CrossEncoder.predict on ONNX Runtime. The model is exported from the
+    Hugging Face checkpoint on first use (and quantized to int8 when asked),
+    then loaded from RERANKER_ONNX_DIR on every later start.
+    """
+
+    def __init__(self, model_name: str, onnx_dir: str, quantize: bool, threads: int):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        model_dir = os.path.join(onnx_dir, model_name.replace("/", "__"))
+        path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(path):
+            self._export(model_name, path)
+        if quantize:
+            path = self._quantize(path)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_score_diff = self._check_parity(model_name, quantize)
+        logger.info("🟢 Reranker running on ONNX Runtime: %s (max |score - torch| %.4f)", path, self.max_score_diff)
+
+    def _export(self, model_name: str, path: str):
+        import inspect
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        sample = self.tokenizer(["query"], ["passage"], return_tensors="pt")
+        # Positional args bind by forward()'s order (input_ids, attention_mask,
+        # token_type_ids), not by the tokenizer's key order
+        names = [n for n in inspect.signature(model.forward).parameters if n in sample]
+        dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+        options = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            options["dynamo"] = False
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            path,
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes={**dynamic, "logits": {0: "batch"}},
+            opset_version=14,
+            **options,
+        )
+        logger.info("🟢 Exported %s to %s", model_name, path)
+
+    def _quantize(self, path: str) -> str:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = os.path.join(os.path.dirname(path), "model.int8.onnx")
+        if not os.path.exists(quantized):
+            quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+            logger.info("🟢 Quantized reranker to %s", quantized)
+        return quantized
+
+    def _check_parity(self, model_name: str, quantize: bool) -> float:
+        """Scores PARITY_PAIRS with torch and ONNX; refuses a model that drifts."""
+        from sentence_transformers import CrossEncoder
+
+        expected = np.asarray(CrossEncoder(model_name).predict(PARITY_PAIRS), dtype=np.float32)
+        diff = float(np.max(np.abs(self.predict(PARITY_PAIRS) - expected)))
+        tolerance = ONNX_INT8_TOLERANCE if quantize else ONNX_FP32_TOLERANCE
+        if diff > tolerance:
+            raise RuntimeError(f"ONNX reranker scores differ from torch by {diff:.4f} (> {tolerance})")
+        return diff
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs):
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            batch = pairs[i:i + batch_size]
+            features = self.tokenizer(
+                [q for q, _ in batch],
+                [p for _, p in batch],
+                padding=True,
+                truncation=True,
+                max_length=RERANKER_MAX_LENGTH,
+                return_tensors="np",
+            )
+            inputs = {k: v.astype(np.int64) for k, v in features.items() if k in self.input_names}
+            logits = self.session.run(["logits"], inputs)[0][:, 0]
+            # Same activation CrossEncoder applies to single-label models
+            scores.append(1.0 / (1.0 + np.exp(-logits)))
+        return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+
+def load_reranker(
+    backend: str = RERANKER_BACKEND,
+    threads: int = RERANKER_THREADS,
+    model_name: str = RERANKER_MODEL,
+):
+
+    if backend.startswith("onnx"):
+
+        if onnxruntime is None:
+
+            logger.error("🔴 RERANKER_BACKEND=%s but onnxruntime is not installed, using torch", backend)
+
+        else:
+
+            try:
+
+                return OnnxCrossEncoder(
+                    model_name,
+                    RERANKER_ONNX_DIR,
+                    quantize=backend == "onnx-int8",
+                    threads=threads,
+                )
+
+            except Exception as e:
+
+                logger.error(f"🔴 ONNX reranker unusable, using torch: {e}")
+
+    from sentence_transformers import CrossEncoder
+
+    if threads > 0:
+
+        import torch
+
+        torch.set_num_threads(threads)
+
+    return CrossEncoder(
+        model_name
+    )
+
 
 _reranker = None
 
@@ -9,8 +183,6 @@ def get_reranker():
 
     if _reranker is None:
 
-        _reranker = CrossEncoder(
-            "cross-encoder/ms-marco-MiniLM-L-6-v2"
-        )
+        _reranker = load_reranker()
 
-    return _reranker
\ No newline at end of file
+    return _reranker
@@ -0,0 +1,204 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from global_modules.reranker import RERANKER_BACKEND, RERANKER_MODEL, get_reranker
+from global_modules.rerank_cache import RerankScoreCache, rerank_model_id
+
+logger = logging.getLogger(__name__)
+
+# Max (query, passage) pairs per model call; a single larger request still runs as one call
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", "64"))
+# How long the first request of a batch waits for others to join
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+
+
+@dataclass
+class _RerankRequest:
+    pairs: List[Tuple[str, str]]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RerankerService:
+    """
+    Runs cross-encoder scoring on one dedicated thread, never on the event
+    loop or the default executor.
+
+    Pairs from concurrent graph runs are coalesced into micro-batches the same
+    way the embedding service does it: the first waiting request opens a window
+    of RERANK_MAX_WAIT_MS and everything arriving inside it shares the model call.
+    The model itself is loaded on that thread by the first batch. Pairs
+    already in the score cache never reach the queue.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = RERANK_MAX_BATCH,
+        max_wait_ms: float = RERANK_MAX_WAIT_MS,
+        model=None,
+        cache: Optional[RerankScoreCache] = None,
+    ):
+        self.model = model
+        self.cache = cache
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._queue: Deque[_RerankRequest] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # metrics
+        self._requests = 0
+        self._pairs = 0
+        self._batches = 0
+        self._max_batch_seen = 0
+        self._last_batch_size = 0
+        self._inference_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    async def ascore(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Relevance score of every (query, passage) pair, in order."""
+        if not pairs:
+            return []
+        if self.cache is None:
+            return await self._submit(list(pairs))
+
+        keys = self.cache.keys(pairs)
+        scores = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(
+            (key, pair) for key, pair, score in zip(keys, pairs, scores) if score is None
+        ))
+        if not missing:
+            return scores
+
+        computed = dict(zip(
+            [key for key, _ in missing],
+            await self._submit([pair for _, pair in missing]),
+        ))
+        self.cache.put_many(list(computed), list(computed.values()))
+        return [s if s is not None else computed[k] for k, s in zip(keys, scores)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": RERANKER_BACKEND,
+            "cache": self.cache.stats() if self.cache else None,
+            "queue_depth": len(self._queue),
+            "requests": self._requests,
+            "pairs": self._pairs,
+            "batches": self._batches,
+            "avg_batch_size": round(self._pairs / self._batches, 2) if self._batches else 0.0,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size": self._max_batch_seen,
+            "avg_inference_ms": round(1000 * self._inference_seconds / self._batches, 2) if self._batches else 0.0,
+            "pairs_per_sec": round(self._pairs / self._inference_seconds, 1) if self._inference_seconds else 0.0,
+            "avg_queue_wait_ms": round(1000 * self._wait_seconds / self._requests, 2) if self._requests else 0.0,
+        }
+
+    async def close(self):
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        for request in self._queue:
+            if not request.future.done():
+                request.future.cancel()
+        self._queue.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # =================================================
+    # INTERNALS
+    # =================================================
+
+    async def _submit(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+        request = _RerankRequest(pairs=pairs, future=asyncio.get_running_loop().create_future())
+        self._queue.append(request)
+        self._wakeup.set()
+        return await request.future
+
+    def _take_batch(self) -> List[_RerankRequest]:
+        batch: List[_RerankRequest] = []
+        size = 0
+        while self._queue and (not batch or size + len(self._queue[0].pairs) <= self.max_batch):
+            request = self._queue.popleft()
+            batch.append(request)
+            size += len(request.pairs)
+        return batch
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        if self.model is None:
+            self.model = get_reranker()
+        scores = self.model.predict(pairs, batch_size=max(self.max_batch, len(pairs)))
+        return [float(s) for s in scores]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Give concurrent graph runs a short window to join this batch
+            pending = sum(len(r.pairs) for r in self._queue)
+            if pending < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+
+            batch = self._take_batch()
+            pairs = [p for r in batch for p in r.pairs]
+
+            started = time.monotonic()
+            try:
+                scores = await loop.run_in_executor(self._executor, self._predict, pairs)
+            except Exception as e:
+                logger.exception("🔴 Rerank batch of %d pairs failed", len(pairs))
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._pairs += len(pairs)
+            self._requests += len(batch)
+            self._last_batch_size = len(pairs)
+            self._max_batch_seen = max(self._max_batch_seen, len(pairs))
+            self._inference_seconds += time.monotonic() - started
+            self._wait_seconds += sum(started - r.enqueued_at for r in batch)
+
+            offset = 0
+            for r in batch:
+                if not r.future.done():
+                    r.future.set_result(scores[offset:offset + len(r.pairs)])
+                offset += len(r.pairs)
+
+
+_reranker_service: Optional[RerankerService] = None
+
+
+def get_reranker_service() -> RerankerService:
+    global _reranker_service
+    if _reranker_service is None:
+        _reranker_service = RerankerService(
+            cache=RerankScoreCache(rerank_model_id(RERANKER_MODEL, RERANKER_BACKEND)),
+        )
+        logger.info("✅ Reranker service initialized")
+    return _reranker_service
+
+
+async def close_reranker_service():
+    global _reranker_service
+    if _reranker_service is not None:
+        await _reranker_service.close()
+        _reranker_service = None
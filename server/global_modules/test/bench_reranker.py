@@ -0,0 +1,125 @@
+# Reranker throughput: pairs/sec of the previous path (one asyncio.to_thread
+# predict call per request) against the micro-batching RerankerService, per
+# backend, with N graph runs reranking concurrently. For the ONNX backends the
+# score deviation from the torch CrossEncoder is reported as well.
+#
+#   cd server
+#   python -m global_modules.test.bench_reranker --requests 64 --pairs 12
+#   python -m global_modules.test.bench_reranker --backends torch onnx onnx-int8 --threads 2
+#   python -m global_modules.test.bench_reranker --model ./path/to/local/checkpoint
+#
+# The ONNX backends need `pip install onnxruntime`; the first run exports the
+# model to RERANKER_ONNX_DIR.
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+import numpy as np
+
+from global_modules.reranker import RERANKER_MODEL, load_reranker, onnxruntime
+from global_modules.reranker_service import RerankerService
+
+WORDS = (
+    "retrieval augmented generation grounds a language model in documents each page "
+    "is split into chunks embedded and stored for vector search the reranker scores "
+    "every query passage pair error code timeout index session transcript video"
+).split()
+
+
+def make_requests(requests, pairs, passage_words, rng):
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    return [
+        [(sentence(8), sentence(passage_words)) for _ in range(pairs)]
+        for _ in range(requests)
+    ]
+
+
+async def run_direct(model, workload):
+    """Previous path: every request is its own predict call on the default executor."""
+    async def one(pairs):
+        started = time.perf_counter()
+        scores = await asyncio.to_thread(model.predict, pairs)
+        return time.perf_counter() - started, scores
+
+    return await asyncio.gather(*(one(p) for p in workload))
+
+
+async def run_service(model, workload, max_batch, max_wait_ms):
+    service = RerankerService(max_batch=max_batch, max_wait_ms=max_wait_ms, model=model)
+
+    async def one(pairs):
+        started = time.perf_counter()
+        scores = await service.ascore(pairs)
+        return time.perf_counter() - started, scores
+
+    try:
+        return await asyncio.gather(*(one(p) for p in workload)), service.stats()
+    finally:
+        await service.close()
+
+
+def report(name, elapsed, results, total_pairs):
+    latencies = sorted(1000 * r[0] for r in results)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"  {name:<10} {total_pairs / elapsed:>9.1f} pairs/sec  "
+        f"p50 {statistics.median(latencies):>7.1f} ms  p95 {p95:>7.1f} ms"
+    )
+
+
+async def bench_backend(backend, args, workload, reference):
+    model = load_reranker(backend, args.threads, args.model)
+    # Warm up: first call pays for lazy initialization
+    model.predict(workload[0])
+    total_pairs = sum(len(p) for p in workload)
+
+    print(f"{backend} ({type(model).__name__}, threads={args.threads or 'default'})")
+
+    started = time.perf_counter()
+    direct = await run_direct(model, workload)
+    report("direct", time.perf_counter() - started, direct, total_pairs)
+
+    started = time.perf_counter()
+    batched, stats = await run_service(model, workload, args.max_batch, args.max_wait_ms)
+    report("batched", time.perf_counter() - started, batched, total_pairs)
+    print(f"  {'':<10} {stats['batches']} batches, avg {stats['avg_batch_size']} pairs")
+
+    scores = np.concatenate([np.asarray(r[1], dtype=np.float32) for r in batched])
+    if reference is not None:
+        print(f"  {'':<10} max |score - torch| = {float(np.max(np.abs(scores - reference))):.4f}")
+    return scores
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=RERANKER_MODEL, help="Hub id or local checkpoint")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--requests", type=int, default=64, help="Concurrent rerank requests")
+    parser.add_argument("--pairs", type=int, default=12, help="Pairs per request")
+    parser.add_argument("--passage-words", type=int, default=120)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = make_requests(args.requests, args.pairs, args.passage_words, random.Random(args.seed))
+    print(f"{args.requests} concurrent requests x {args.pairs} pairs\n")
+
+    reference = None
+    for backend in args.backends:
+        if backend.startswith("onnx") and onnxruntime is None:
+            print(f"{backend}\n  skipped (onnxruntime not installed)")
+            continue
+        scores = await bench_backend(backend, args, workload, reference)
+        if backend == "torch":
+            reference = scores
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
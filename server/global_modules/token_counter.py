@@ -0,0 +1,98 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Chat models are Llama 3 / GPT-OSS; cl100k_base is a close, fast stand-in for their BPE
+LLM_TOKEN_ENCODING = "cl100k_base"
+# Used only when a tokenizer is not installed
+CHARS_PER_TOKEN = 4
+# Splitters measure every word and separator they try; those short pieces
+# repeat constantly, so their counts are memoized
+PIECE_CACHE_MAX_CHARS = 32
+
+_SENTENCE_END = re.compile(r"[.!?](\s|$)")
+
+
+@lru_cache(maxsize=1)
+def _llm_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(LLM_TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning(f"🔴 tiktoken unavailable, estimating LLM tokens from length: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def _embedding_tokenizer():
+    try:
+        from transformers import AutoTokenizer
+        from global_modules.embeddings import EMBEDDING_MODEL
+        return AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning(f"🔴 Embedding tokenizer unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def llm_token_count(text: str) -> int:
+    """Tokens `text` costs in a chat prompt."""
+    encoding = _llm_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=65536)
+def _short_embedding_token_count(text: str) -> int:
+    return len(_embedding_tokenizer().encode(text, add_special_tokens=False))
+
+
+def embedding_token_count(text: str) -> int:
+    """Word pieces the embedding model sees (without [CLS]/[SEP])."""
+    tokenizer = _embedding_tokenizer()
+    if tokenizer is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    if len(text) <= PIECE_CACHE_MAX_CHARS:
+        return _short_embedding_token_count(text)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def embedding_token_counts(texts: Sequence[str]) -> List[int]:
+    """embedding_token_count of many texts in one (batched) tokenizer call."""
+    tokenizer = _embedding_tokenizer()
+    if tokenizer is None:
+        return [-(-len(t) // CHARS_PER_TOKEN) for t in texts]
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+
+def warm_tokenizers():
+    """Blocking: loads both tokenizers. Run it off the event loop at startup."""
+    _llm_encoding()
+    _embedding_tokenizer()
+
+
+def truncate_to_tokens(text: str, max_tokens: int, token_count: Optional[int] = None) -> str:
+    """
+    Cuts `text` to at most `max_tokens` LLM tokens, backing up to the last
+    sentence end when one is reasonably close. `token_count` skips re-counting.
+    """
+    if max_tokens <= 0:
+        return ""
+    if (token_count if token_count is not None else llm_token_count(text)) <= max_tokens:
+        return text
+
+    encoding = _llm_encoding()
+    if encoding is None:
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+    ends = [m.end() for m in _SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] >= len(cut) // 2:
+        return cut[:ends[-1]].rstrip()
+    return cut.rstrip()
@@ -48,6 +48,14 @@ from nodes.prune_states import (
     prune_state_node,
 )
 
+from nodes.parallel_retrieval import (
+    PARALLEL_RETRIEVAL,
+    retrieval_planner_node,
+    fan_out_retrieval,
+    retrieval_branch_node,
+    merge_retrieval_node,
+)
+
 
 class RAGGraphBuilder:
 
@@ -57,6 +65,7 @@ class RAGGraphBuilder:
         simple_chat_llm_factory: Any,
         tool_llm_factory: Any,
         rag_llm_factory: Any,
+        parallel_retrieval: bool = PARALLEL_RETRIEVAL,
     ):
 
         self.router_llm_factory = (
@@ -75,6 +84,11 @@ class RAGGraphBuilder:
             rag_llm_factory
         )
 
+        # Planner picks a set of tools per round, run concurrently via Send
+        self.parallel_retrieval = (
+            parallel_retrieval
+        )
+
         self.builder = StateGraph(State)
 
     # =====================================================
@@ -103,30 +117,54 @@ class RAGGraphBuilder:
             ),
         )
 
-        self.builder.add_node(
-            "tool_call",
-            partial(
-                tool_call_node,
-                tool_llm_factory=(
-                    self.tool_llm_factory
+        if self.parallel_retrieval:
+
+            self.builder.add_node(
+                "tool_call",
+                partial(
+                    retrieval_planner_node,
+                    tool_llm_factory=(
+                        self.tool_llm_factory
+                    ),
                 ),
-            ),
-        )
+            )
+
+            self.builder.add_node(
+                "retrieve",
+                retrieval_branch_node,
+            )
+
+            self.builder.add_node(
+                "merge_retrieval",
+                merge_retrieval_node,
+            )
+
+        else:
+
+            self.builder.add_node(
+                "tool_call",
+                partial(
+                    tool_call_node,
+                    tool_llm_factory=(
+                        self.tool_llm_factory
+                    ),
+                ),
+            )
 
-        self.builder.add_node(
-            "vector_search",
-            vector_search_node,
-        )
+            self.builder.add_node(
+                "vector_search",
+                vector_search_node,
+            )
 
-        self.builder.add_node(
-            "internet_search",
-            internet_search_node,
-        )
+            self.builder.add_node(
+                "internet_search",
+                internet_search_node,
+            )
 
-        self.builder.add_node(
-            "web_scraper",
-            web_scraper_node,
-        )
+            self.builder.add_node(
+                "web_scraper",
+                web_scraper_node,
+            )
 
         self.builder.add_node(
             "reranker",
@@ -186,6 +224,39 @@ class RAGGraphBuilder:
             "prune",
         )
 
+        if self.parallel_retrieval:
+
+            self._setup_parallel_retrieval_edges()
+
+        else:
+
+            self._setup_serial_retrieval_edges()
+
+        # -----------------------------------------
+        # Evaluation
+        # -----------------------------------------
+
+        self.builder.add_edge("reranker","retrieval_evaluator")
+
+        self.builder.add_conditional_edges(
+            "retrieval_evaluator",
+            lambda s: s.get("route","fallback"),
+            {
+                "tools": "tool_call",
+                "rag": "rag_chatbot",
+                "fallback": "simple_chat",
+            },
+        )
+
+        # -----------------------------------------
+        # Final answer
+        # -----------------------------------------
+
+        self.builder.add_edge("rag_chatbot","prune")
+        self.builder.add_edge( "prune", END)
+
+    def _setup_serial_retrieval_edges(self):
+
         # -----------------------------------------
         # Planner routing
         # -----------------------------------------
@@ -219,25 +290,29 @@ class RAGGraphBuilder:
         self.builder.add_edge("vector_search","reranker")
         self.builder.add_edge("internet_search","reranker")
         self.builder.add_edge("web_scraper", "reranker")
-        self.builder.add_edge("reranker","retrieval_evaluator")
 
+    def _setup_parallel_retrieval_edges(self):
+
+        # -----------------------------------------
+        # Planner fan-out: one branch per tool
+        # -----------------------------------------
 
         self.builder.add_conditional_edges(
-            "retrieval_evaluator",
-            lambda s: s.get("route","fallback"),
-            {
-                "tools": "tool_call",
-                "rag": "rag_chatbot",
-                "fallback": "simple_chat",
-            },
+            "tool_call",
+            fan_out_retrieval,
+            [
+                "retrieve",
+                "rag_chatbot",
+                "simple_chat",
+            ],
         )
 
         # -----------------------------------------
-        # Final answer
+        # Fan-in: all branches, then one rerank
         # -----------------------------------------
 
-        self.builder.add_edge("rag_chatbot","prune")
-        self.builder.add_edge( "prune", END)
+        self.builder.add_edge("retrieve","merge_retrieval")
+        self.builder.add_edge("merge_retrieval","reranker")
 
     # =====================================================
     # COMPILE
@@ -5,6 +5,15 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from logger import logger
 from global_modules.pg_pool import get_pg_pool,close_pg_pool
+from global_modules.ocr_engine import close_ocr_engine
+from global_modules.mongo_collections import ensure_mongo_indexes
+from modules.ingestion_jobs import get_ingestion_queue
+from modules.pdf_handlers import reject_oversized_upload
+from modules.session_gc import get_session_gc, SESSION_GC_ENABLED
+from global_modules.embedding_service import close_embedding_service
+from global_modules.reranker_service import close_reranker_service
+from global_modules.token_counter import warm_tokenizers
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 
 # routers
@@ -14,22 +23,38 @@ from api.load_chats_router import router as load_chats_router
 from api.home import router as home_router
 from api.load_transcript_router import router as transcripts_router
 from api.upload_router import router as upload_router
+from api.metrics_router import router as metrics_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup Logic ---
     logger.info("🔰 Starting up: Initializing resources...")
     await get_pg_pool() 
+    await ensure_mongo_indexes()
+    # Loading them lazily would block the event loop on the first upload/chat
+    await run_in_threadpool(warm_tokenizers)
+    await get_ingestion_queue().start()
+    if SESSION_GC_ENABLED:
+        await get_session_gc().start()
     
     yield  # The server is now running and "yielding" control to requests
     
     # --- Shutdown Logic ---
     logger.info("Shutting down: Cleaning up resources...")
+    await get_session_gc().stop()
+    await get_ingestion_queue().stop()
+    await close_embedding_service()
+    await close_reranker_service()
     await close_pg_pool()
+    close_ocr_engine()
 
 
 app = FastAPI(title="DocTubeAI Server", version="1.0.0",lifespan=lifespan)
 
+# Oversized uploads are refused from their headers, before the body is read.
+# Registered first so CORS headers still reach the browser on a 413.
+app.middleware("http")(reject_oversized_upload)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -44,6 +69,7 @@ app.include_router(load_chats_router)
 app.include_router(home_router)
 app.include_router(transcripts_router)
 app.include_router(upload_router)
+app.include_router(metrics_router)
 
 @app.middleware("http")
 async def catch_exception_middleware(request: Request, call_next):
@@ -63,8 +63,11 @@ def build_initial_state(query: str):
         "retrieval_complete": False,
         "used_tools": [],
         "next_tool_hint": "",
+        "planned_tools": [],
+        "tool_reports": None,
         "agent_scratchpad": [],
-        "retrieved_chunks": [],
+        # None resets the merged list left over from an interrupted run
+        "retrieved_chunks": None,
         "reranked_chunks": [],
         "selected_chunks": [],
         "tool_outputs": [],
@@ -369,6 +372,8 @@ async def ask_with_graph_stream(obj: Dict[str, Any]) -> AsyncGenerator[dict, Non
 
                     "web_scraper": "Reading webpage content...",
 
+                    "retrieve": "Searching sources in parallel...",
+
                     "reranker": "Ranking retrieved evidence...",
 
                     "retrieval_evaluator": "Evaluating evidence quality...",
@@ -3,6 +3,11 @@
 from urllib.parse import urlparse, parse_qs
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from dataclasses import dataclass
+import os
+import re
+import asyncio
 import logging
 from global_modules.http_client import get_http_client
 
@@ -11,7 +16,31 @@ from global_modules.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
-def _extract_video_id(url: str) -> str | None:
+# Videos fetched from YouTube at once, across all requests
+TRANSCRIPT_FETCH_CONCURRENCY = int(os.getenv("TRANSCRIPT_FETCH_CONCURRENCY", "4"))
+
+TRANSCRIPT_LANGUAGES = [
+    "en", "hi", "de", "fr", "es", "it", "ru", "zh", "ja", "ko",
+    "ar", "pt", "tr", "nl", "sv", "pl", "uk", "ro", "cs", "el",
+    "bn", "fa", "ur", "ta", "te", "ml", "kn"
+]
+
+_fetch_slots = asyncio.Semaphore(TRANSCRIPT_FETCH_CONCURRENCY)
+
+_PLAYLIST_VIDEO_ID = re.compile(r'"videoId":"([A-Za-z0-9_-]{11})"')
+
+
+@dataclass
+class Transcript:
+    video_id: str
+    title: str
+    # Caption segments in order: {"text", "start", "duration"} (seconds)
+    segments: list[dict]
+    # False: the page title could not be read and `title` names the video id
+    title_known: bool = True
+
+
+def extract_video_id(url: str) -> str | None:
     parsed = urlparse(url)
     if parsed.hostname in ("www.youtube.com", "youtube.com", "m.youtube.com"):
         qs = parse_qs(parsed.query)
@@ -20,6 +49,26 @@ def _extract_video_id(url: str) -> str | None:
         return parsed.path.lstrip("/")
     return None
 
+async def fetch_playlist_video_ids(playlist_id: str, limit: int) -> list[str]:
+    """
+    Video ids of a public playlist, in playlist order, read from its page
+    (the first ~100 entries are rendered server-side).
+    """
+    client = await get_http_client()
+    try:
+        response = await client.get(
+            "https://www.youtube.com/playlist", params={"list": playlist_id}, timeout=10.0
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"🔴 could not retrieve playlist {playlist_id}: {e}")
+        raise HTTPException(status_code=502, detail="Could not retrieve the playlist.")
+
+    video_ids = list(dict.fromkeys(_PLAYLIST_VIDEO_ID.findall(response.text)))
+    if not video_ids:
+        raise HTTPException(status_code=404, detail="Playlist is empty, private or does not exist.")
+    return video_ids[:limit]
+
 # def to_english(text: str) -> str:
 #     text = text.strip()
 #     if not text:
@@ -49,9 +98,10 @@ def _extract_video_id(url: str) -> str | None:
 
 #     return " ".join(translated_parts)
 
-async def get_video_title(url: str) -> str:
+async def get_video_title(url: str) -> str | None:
     """
     Fetches the title of the YouTube video using the singleton httpx client.
+    Returns None when it cannot be read.
     """
     try:
         # Get your singleton client
@@ -66,38 +116,45 @@ async def get_video_title(url: str) -> str:
         return title
     except Exception as e:
         logger.error(f"🔴 could not retrieve title from url-{url}: {e}")
-        # Returning a placeholder instead of crashing ensures the transcript can still load
-        return "Unknown YouTube Video"
+        # The transcript still loads, under a name derived from its video id
+        return None
+
+def _fetch_raw_transcript(video_id: str) -> list:
+    """Blocking youtube-transcript-api call; run it in the threadpool."""
+    return YouTubeTranscriptApi().fetch(video_id, languages=TRANSCRIPT_LANGUAGES).to_raw_data()
+
 
-async def transcrpition_extractor(url: str) -> str :
-    video_id = _extract_video_id(url)
+async def fetch_transcript(url: str) -> Transcript:
+    """
+    Fetches the title and transcript of a video. Both requests run concurrently,
+    the transcript one off the event loop, and at most TRANSCRIPT_FETCH_CONCURRENCY
+    videos are fetched at once across all requests.
+    """
+    video_id = extract_video_id(url)
     if not video_id:
         logger.info(f"Could not extract video ID from URL: {url!r}")
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
 
     try:
-        # 1) Get the title asynchronously
-        title = await get_video_title(url)
-
-        # 2) Fetch transcript
-        transcript = YouTubeTranscriptApi().fetch(video_id, languages=[
-            "en", "hi", "de", "fr", "es", "it", "ru", "zh", "ja", "ko",
-            "ar", "pt", "tr", "nl", "sv", "pl", "uk", "ro", "cs", "el",
-            "bn", "fa", "ur", "ta", "te", "ml", "kn"
-        ]).to_raw_data()
-        
-        full_text = " ".join(
-            piece["text"].replace("\n", " ")
-            for piece in transcript
-            if "text" in piece
-        )
-
-        # Prepend the title to the transcript text
-        full_text_with_title = f"Video Title: {title}\n\nTranscript: {full_text}"
+        async with _fetch_slots:
+            title, raw = await asyncio.gather(
+                get_video_title(url),
+                run_in_threadpool(_fetch_raw_transcript, video_id),
+            )
 
-        # 3) Translate to English 
-        text = full_text_with_title # = to_english(full_text_with_title)
-        return text
+        segments = [
+            {
+                "text": piece["text"].replace("\n", " ").strip(),
+                "start": float(piece.get("start", 0.0)),
+                "duration": float(piece.get("duration", 0.0)),
+            }
+            for piece in raw
+            if piece.get("text", "").strip()
+        ]
+        if title:
+            return Transcript(video_id=video_id, title=title, segments=segments)
+        # One name per video: a shared placeholder would merge different videos' chunks
+        return Transcript(video_id=video_id, title=f"YouTube video {video_id}", segments=segments, title_known=False)
 
     except (TranscriptsDisabled, NoTranscriptFound):
         raise HTTPException(status_code=404, detail="No transcript found or captions are disabled for this video.")
@@ -105,4 +162,4 @@ async def transcrpition_extractor(url: str) -> str :
         raise HTTPException(status_code=404, detail="Video is unavailable or private.")
     except Exception as e:
         logger.error(f"Unexpected error in extractor: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
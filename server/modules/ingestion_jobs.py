@@ -0,0 +1,287 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from global_modules.pg_pool import get_pg_pool
+from modules.pdf_handlers import SavedUpload
+from mongodb.vector_ingest import ingest_files_to_mongo
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_MAXSIZE = int(os.getenv("INGEST_QUEUE_MAXSIZE", "100"))
+# Progress rows are written to Postgres at most this often per job
+PROGRESS_PERSIST_INTERVAL = 1.0
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+CREATE_JOBS_TABLE = """
+    CREATE TABLE IF NOT EXISTS ingestion_jobs (
+        job_id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        oauth_id TEXT,
+        status TEXT NOT NULL,
+        filenames TEXT[],
+        pages_done INTEGER DEFAULT 0,
+        pages_total INTEGER DEFAULT 0,
+        pages_per_sec REAL DEFAULT 0,
+        result JSONB,
+        error TEXT,
+        created_at TIMESTAMPTZ DEFAULT NOW(),
+        updated_at TIMESTAMPTZ DEFAULT NOW()
+    );
+"""
+
+
+class IngestionJobQueue:
+    """
+    Bounded in-process queue of PDF ingestion jobs.
+
+    Live progress is kept in memory (for polling / SSE) and mirrored to the
+    `ingestion_jobs` table so the status survives the request and the process.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, maxsize: int = INGEST_QUEUE_MAXSIZE):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._changed: Dict[str, asyncio.Condition] = {}
+        self._last_persist: Dict[str, float] = {}
+        # Slots claimed by submits still writing their row; put_nowait must not fail for them
+        self._reserved = 0
+
+    # =================================================
+    # LIFECYCLE
+    # =================================================
+
+    async def start(self):
+        pool = await get_pg_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(CREATE_JOBS_TABLE)
+                # Jobs that were in flight when the previous process died will never finish
+                await cur.execute(
+                    """
+                    UPDATE ingestion_jobs
+                    SET status = 'failed', error = 'Interrupted by server restart', updated_at = NOW()
+                    WHERE status IN ('queued', 'running');
+                    """
+                )
+            await conn.commit()
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info("✅ Ingestion job queue started with %d workers", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    def has_capacity(self) -> bool:
+        return not self._queue.maxsize or self._queue.qsize() + self._reserved < self._queue.maxsize
+
+    def ensure_capacity(self):
+        if not self.has_capacity():
+            raise HTTPException(status_code=503, detail="Ingestion queue is full. Please retry shortly.")
+
+    async def submit(self, session_id: str, oauth_id: Optional[str], uploads: List[SavedUpload]) -> str:
+        # Claimed before the first await, so concurrent submits cannot overfill the queue
+        self.ensure_capacity()
+        self._reserved += 1
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "oauth_id": oauth_id,
+            "status": "queued",
+            "filenames": [u.filename for u in uploads],
+            "pages_done": 0,
+            "pages_total": 0,
+            "pages_per_sec": 0.0,
+            "result": None,
+            "error": None,
+            "version": 0,
+        }
+
+        try:
+            pool = await get_pg_pool()
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        """
+                        INSERT INTO ingestion_jobs (job_id, session_id, oauth_id, status, filenames)
+                        VALUES (%s, %s, %s, %s, %s);
+                        """,
+                        (job_id, session_id, oauth_id, "queued", job["filenames"]),
+                    )
+                await conn.commit()
+        finally:
+            self._reserved -= 1
+
+        self._jobs[job_id] = job
+        self._changed[job_id] = asyncio.Condition()
+        self._queue.put_nowait((job_id, uploads))
+        logger.info("🔰 Queued ingestion job %s (%d files)", job_id, len(uploads))
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Live state if this process owns the job, otherwise the persisted row."""
+        if job_id in self._jobs:
+            return self._public(self._jobs[job_id])
+
+        pool = await get_pg_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT job_id, session_id, oauth_id, status, filenames,
+                           pages_done, pages_total, pages_per_sec, result, error
+                    FROM ingestion_jobs WHERE job_id = %s;
+                    """,
+                    (job_id,),
+                )
+                row = await cur.fetchone()
+
+        if not row:
+            return None
+
+        keys = ("job_id", "session_id", "oauth_id", "status", "filenames",
+                "pages_done", "pages_total", "pages_per_sec", "result", "error")
+        return self._public(dict(zip(keys, row)))
+
+    async def wait_for_change(self, job_id: str, seen_version: int, timeout: float):
+        """Blocks until the job moves past `seen_version` or the timeout expires."""
+        cond = self._changed.get(job_id)
+        if cond is None:
+            await asyncio.sleep(timeout)
+            return
+
+        def changed():
+            return self._jobs.get(job_id, {}).get("version", 0) != seen_version
+
+        async with cond:
+            try:
+                await asyncio.wait_for(cond.wait_for(changed), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    # =================================================
+    # INTERNALS
+    # =================================================
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **job,
+            "filenames": list(job.get("filenames") or []),
+            "pages_per_sec": float(job.get("pages_per_sec") or 0),
+        }
+
+    async def _notify(self, job_id: str):
+        cond = self._changed.get(job_id)
+        if cond:
+            async with cond:
+                cond.notify_all()
+
+    async def _persist(self, job: Dict[str, Any]):
+        pool = await get_pg_pool()
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        """
+                        UPDATE ingestion_jobs
+                        SET status = %s, pages_done = %s, pages_total = %s, pages_per_sec = %s,
+                            result = %s::jsonb, error = %s, updated_at = NOW()
+                        WHERE job_id = %s;
+                        """,
+                        (
+                            job["status"], job["pages_done"], job["pages_total"], job["pages_per_sec"],
+                            json.dumps(job["result"]) if job["result"] is not None else None,
+                            job["error"], job["job_id"],
+                        ),
+                    )
+                await conn.commit()
+        except Exception as e:
+            logger.error(f"🔴 Failed to persist ingestion job {job['job_id']}: {e}")
+
+    async def _set(self, job_id: str, force_persist: bool = True, **fields):
+        job = self._jobs[job_id]
+        job.update(fields)
+        job["version"] += 1
+        await self._notify(job_id)
+
+        now = time.monotonic()
+        if force_persist or now - self._last_persist.get(job_id, 0) >= PROGRESS_PERSIST_INTERVAL:
+            self._last_persist[job_id] = now
+            await self._persist(job)
+
+    async def _run_job(self, job_id: str, uploads: List[SavedUpload]):
+        job = self._jobs[job_id]
+        await self._set(job_id, status="running")
+
+        async def on_progress(snapshot: Dict[str, Any]):
+            await self._set(
+                job_id,
+                force_persist=False,
+                pages_done=snapshot["pages_done"],
+                pages_total=snapshot["pages_total"],
+                pages_per_sec=snapshot["pages_per_sec"],
+            )
+
+        result = await ingest_files_to_mongo(
+            file_paths=[u.path for u in uploads],
+            session_id=job["session_id"],
+            keep_local=False, # Deletes files after ingestion
+            file_hashes={u.path: u.sha256 for u in uploads},
+            progress_callback=on_progress,
+        )
+
+        if result.get("status") == "ingest_failed":
+            await self._set(job_id, status="failed", result=result, error=result.get("error"))
+        else:
+            await self._set(job_id, status="completed", result=result)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id, uploads = await self._queue.get()
+            try:
+                await self._run_job(job_id, uploads)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("🔴 Ingestion job %s crashed", job_id)
+                await self._set(job_id, status="failed", error=str(e))
+            finally:
+                self._queue.task_done()
+                self._last_persist.pop(job_id, None)
+                # Keep the finished job in memory briefly so late pollers/SSE still see it live
+                asyncio.get_running_loop().call_later(300, self._forget, job_id)
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._changed.pop(job_id, None)
+
+
+_job_queue: Optional[IngestionJobQueue] = None
+
+
+def get_ingestion_queue() -> IngestionJobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = IngestionJobQueue()
+    return _job_queue
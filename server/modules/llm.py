@@ -208,6 +208,9 @@ def get_chatbot_prompt():
             7. Avoid hallucinating unsupported claims.
             8. Do NOT pretend retrieval occurred if no tools were used.
             9. Keep responses concise unless detailed explanation is requested.
+            10. When a transcript source lists a time range and link, cite that
+            moment as a link (e.g. [12:34](https://youtu.be/ID?t=754)) instead of
+            quoting the whole passage.
             """
         ),
 
@@ -1,43 +1,87 @@
 import asyncio
-import io
 import re
+import time
 import logging
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional, Tuple
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader
 from fastapi.concurrency import run_in_threadpool
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from global_modules.ocr_engine import OCR_AVAILABLE, OCR_BATCH_SIZE, TESSERACT_CONFIG, fitz, get_ocr_engine
+from global_modules.ocr_cache import get_ocr_cache, ocr_variant
+from global_modules.token_counter import llm_token_count
+from modules.pdf_handlers import sha256_file
+from modules.page_classifier import assess_page
+from modules.stream_pipeline import bounded, iterate_in_thread
+from modules.text_splitting import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SIZE_TOKENS,
+    StreamingTextSplitter,
+    TextSpan,
+)
 
 logger = logging.getLogger(__name__)
 
-# Optional OCR imports
-try:
-    import fitz  # PyMuPDF
-    from PIL import Image
-    import pytesseract
-    OCR_AVAILABLE = True
-except Exception:
-    fitz = None
-    Image = None
-    pytesseract = None
-    OCR_AVAILABLE = False
+# Pages read ahead of the splitter; sparse pages of a window are OCR'd together
+PAGE_WINDOW = OCR_BATCH_SIZE
+
 
 @dataclass
-class SimpleDoc:
-    page_content: str
-    metadata: Dict[str, Any]
+class OCRRunStats:
+    """
+    Pages that needed OCR in one run, how many of them came from the OCR cache,
+    and how many sparse pages the classifier decided not to OCR at all.
+    """
+    ocr_pages: int = 0
+    ocr_cache_hits: int = 0
+    ocr_skipped: int = 0
+
+
+@dataclass
+class ExtractionReport:
+    """
+    What went wrong while extracting one file: pages whose OCR failed (or could
+    not run) and whether reading the PDF aborted early. Only a complete
+    extraction may be remembered in the document store.
+    """
+    failed_pages: List[int] = field(default_factory=list)
+    aborted: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed_pages and not self.aborted
+
 
 class ProgressTracker:
     def __init__(self, total_pages: int):
         self.total = total_pages
         self.current = 0
+        self.started_at = time.monotonic()
+        self.ocr = OCRRunStats()
+
+    @property
+    def pages_per_sec(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.current / elapsed if elapsed > 0 else 0.0
 
-    def update(self):
-        self.current += 1
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pages_done": self.current,
+            "pages_total": self.total,
+            "pages_per_sec": round(self.pages_per_sec, 2),
+            "ocr_pages": self.ocr.ocr_pages,
+            "ocr_cache_hits": self.ocr.ocr_cache_hits,
+            "ocr_skipped": self.ocr.ocr_skipped,
+        }
+
+    def update(self, pages: int = 1):
+        self.current += pages
         percentage = (self.current / self.total) * 100 if self.total > 0 else 0
-        return f"Processing: {self.current}/{self.total} ({percentage:.1f}%)"
+        return (
+            f"Processing: {self.current}/{self.total} ({percentage:.1f}%)"
+            f" - {self.pages_per_sec:.2f} pages/sec"
+        )
 
 
 def clean_text_for_vector_db(text: str) -> str:
@@ -47,149 +91,302 @@ def clean_text_for_vector_db(text: str) -> str:
     return text.strip()
 
 
-async def _ocr_page(pdf_path: str, page_number: int, zoom: float = 1.5, lang: Optional[str] = None) -> str:
+async def _ocr_pages(
+    pdf_path: str,
+    page_numbers: List[int],
+    zoom: float = 1.5,
+    lang: Optional[str] = None,
+    on_pages_done: Optional[callable] = None,
+    content_hash: Optional[str] = None,
+    ocr_stats: Optional[OCRRunStats] = None,
+    report: Optional[ExtractionReport] = None,
+) -> Dict[int, str]:
+    """
+    OCR through the page cache: only pages never OCR'd with these settings are
+    rasterized. Pages whose OCR failed are left out and recorded in `report`.
+    """
+    if not page_numbers:
+        return {}
     if not OCR_AVAILABLE:
         logger.error("🔴 OCR requested but dependencies (fitz, PIL, or pytesseract) are missing.")
-        return ""
-    def blocking_ocr():
-        try:
-            with fitz.open(pdf_path) as doc:
-                page = doc.load_page(page_number)
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                img_bytes = pix.tobytes("png")
-
-            with Image.open(io.BytesIO(img_bytes)) as img:
-                img = img.convert("RGB")
-                custom_config = r'--oem 3 --psm 6' 
-                text = pytesseract.image_to_string(img, lang=lang, config=custom_config)
-                return (text or "").strip()
-        except Exception as e:
-            logger.exception("OCR failed for %s page %d: %s", pdf_path, page_number, e)
-            return ""
-    return await run_in_threadpool(blocking_ocr)
-
-
-async def _load_pdf(path: str) -> List[Any]:
-    def _load():
-        loader = PyPDFLoader(path)
-        return loader.load()
-    return await run_in_threadpool(_load)
-
-
-def _fixed_size_split_docs(docs: List[SimpleDoc], chunk_size: int, chunk_overlap: int, session_id: str) -> List[Document]:
-    """Uses LangChain's smart splitter to keep sentences and words intact."""
-    
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        # Separators order: Paragraphs -> Sentences -> Words -> Characters
-        separators=["\n\n", "\n", " ", ""] 
+        if report:
+            report.failed_pages.extend(page_numbers)
+        if on_pages_done:
+            await on_pages_done(len(page_numbers))
+        return {}
+
+    cache = get_ocr_cache()
+    variant = ocr_variant(zoom, lang, TESSERACT_CONFIG)
+    cached = await cache.get_many(content_hash, variant, page_numbers) if content_hash else {}
+    if ocr_stats:
+        ocr_stats.ocr_pages += len(page_numbers)
+        ocr_stats.ocr_cache_hits += len(cached)
+    if on_pages_done and cached:
+        await on_pages_done(len(cached))
+
+    missing = [p for p in page_numbers if p not in cached]
+    fresh = await get_ocr_engine().ocr_pages(
+        pdf_path, missing, zoom=zoom, lang=lang, on_pages_done=on_pages_done
     )
+    succeeded = {p: t for p, t in fresh.items() if t is not None}
+    failed = [p for p in missing if succeeded.get(p) is None]
+    if failed:
+        logger.warning("🔴 OCR failed for %d pages of %s", len(failed), pdf_path)
+        if report:
+            report.failed_pages.extend(failed)
+    elif content_hash:
+        # A batch with failures is not cached at all; it is OCR'd again next time
+        await cache.put_many(content_hash, variant, succeeded)
+
+    return {**cached, **succeeded}
+
+
+async def count_pdf_pages(paths: List[str]) -> int:
+    def get_total_pages():
+        count = 0
+        for p in paths:
+            try:
+                with fitz.open(p) as d:
+                    count += d.page_count
+            except Exception:
+                continue
+        return count
+    return await run_in_threadpool(get_total_pages)
+
+
+@dataclass
+class PageText:
+    index: int
+    text: str
+    needs_ocr: bool
+    ocr_zoom: float
+    # Sparse page the plain length check would have OCR'd, skipped by the classifier
+    ocr_skipped: bool = False
+
+
+def read_pdf_pages(
+    pdf_path: str,
+    ocr_min_chars_threshold: int = 40,
+    ocr_zoom: float = 1.2,
+) -> Iterator[PageText]:
+    """
+    Blocking: opens the PDF once with PyMuPDF and yields every page's text layer
+    together with the decision whether (and at which zoom) the page must be OCR'd.
+    """
+    if fitz is None:
+        raise RuntimeError("PyMuPDF (pymupdf) is required to read PDFs")
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text = (page.get_text("text") or "").strip()
+            verdict = assess_page(page, text, ocr_min_chars_threshold, ocr_zoom)
+            yield PageText(
+                page.number,
+                text,
+                verdict.needs_ocr,
+                verdict.zoom,
+                ocr_skipped=len(text) < ocr_min_chars_threshold and not verdict.needs_ocr,
+            )
+
+
+async def _resolve_window(
+    pdf_path: str,
+    window: List[PageText],
+    ocr_lang: Optional[str],
+    on_pages_done: Optional[callable],
+    content_hash: Optional[str] = None,
+    ocr_stats: Optional[OCRRunStats] = None,
+    report: Optional[ExtractionReport] = None,
+) -> List[Tuple[int, str]]:
+    """OCRs the pages of one window that need it and returns them all cleaned, in order."""
+    texts = {p.index: p.text for p in window}
+
+    # Pages rendered at the same zoom share OCR batches (and cache variants)
+    by_zoom: Dict[float, List[int]] = {}
+    for p in window:
+        if p.needs_ocr:
+            by_zoom.setdefault(p.ocr_zoom, []).append(p.index)
+    ocr_count = sum(len(pages) for pages in by_zoom.values())
+
+    if ocr_stats:
+        ocr_stats.ocr_skipped += sum(p.ocr_skipped for p in window)
+    if on_pages_done and len(window) > ocr_count:
+        await on_pages_done(len(window) - ocr_count)
+
+    results = await asyncio.gather(*(
+        _ocr_pages(
+            pdf_path, pages, zoom=zoom, lang=ocr_lang, on_pages_done=on_pages_done,
+            content_hash=content_hash, ocr_stats=ocr_stats, report=report,
+        )
+        for zoom, pages in by_zoom.items()
+    ))
+    for ocr_texts in results:
+        for page_index, ocr_text in ocr_texts.items():
+            if ocr_text and len(ocr_text) > len(texts[page_index]):
+                texts[page_index] = ocr_text
 
-    out: List[Document] = []
+    return [(p.index, clean_text_for_vector_db(texts[p.index])) for p in window]
 
-    for doc in docs:
-        if not doc.page_content:
+
+async def stream_pdf_pages(
+    pdf_path: str,
+    on_pages_done: Optional[callable] = None,
+    ocr_min_chars_threshold: int = 40,
+    ocr_zoom: float = 1.2,
+    ocr_lang: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    ocr_stats: Optional[OCRRunStats] = None,
+    report: Optional[ExtractionReport] = None,
+) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Yields (page_index, cleaned_text) in page order. Pages are read lazily in a
+    single pass and OCR'd a window at a time, so only PAGE_WINDOW pages are held
+    in memory. `content_hash` (sha256 of the file) keys the OCR cache; it is
+    computed if omitted. Failed OCR and an aborted read are recorded in `report`.
+    """
+    window: List[PageText] = []
+
+    if content_hash is None and OCR_AVAILABLE and get_ocr_cache().enabled:
+        content_hash = await run_in_threadpool(sha256_file, pdf_path)
+
+    pages = iterate_in_thread(
+        lambda: read_pdf_pages(pdf_path, ocr_min_chars_threshold, ocr_zoom)
+    )
+    try:
+        # Closed right away if our consumer stops early, not when collected
+        async with aclosing(pages):
+            async for page in pages:
+                window.append(page)
+                if len(window) >= PAGE_WINDOW:
+                    for resolved in await _resolve_window(
+                        pdf_path, window, ocr_lang, on_pages_done, content_hash, ocr_stats, report,
+                    ):
+                        yield resolved
+                    window = []
+    except Exception as e:
+        logger.exception("🔴 Failed to read %s: %s", pdf_path, e)
+        if report:
+            report.aborted = True
+
+    if window:
+        for resolved in await _resolve_window(
+            pdf_path, window, ocr_lang, on_pages_done, content_hash, ocr_stats, report,
+        ):
+            yield resolved
+
+
+async def stream_chunks(
+    pages: AsyncIterator[Tuple[int, str]],
+    source: str,
+    session_id: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> AsyncIterator[Document]:
+    """
+    Turns a page stream into chunk Documents as soon as each chunk is final.
+    Metadata: chunk_index (ordinal in the file), page / page_end (1-based),
+    char_start / char_end in the file's text and token_count (LLM tokens).
+    """
+    splitter = StreamingTextSplitter(chunk_size, chunk_overlap)
+    metadata = {"session_id": session_id, "source": source}
+
+    ordinal = 0
+
+    def counted(spans: List[TextSpan]) -> List[Tuple[TextSpan, int]]:
+        return [(span, llm_token_count(span.text)) for span in spans]
+
+    def to_document(span: TextSpan, token_count: int) -> Document:
+        return Document(
+            page_content=span.text,
+            metadata={
+                **metadata,
+                "chunk_index": ordinal,
+                "page": span.page + 1 if span.page is not None else None,
+                "page_end": span.page_end + 1 if span.page_end is not None else None,
+                "char_start": span.char_start,
+                "char_end": span.char_end,
+                "token_count": token_count,
+            },
+        )
+
+    # Splitting and token counting run tokenizers: keep them off the event loop
+    async for page_index, text in pages:
+        if not text:
             continue
-            
-        src = doc.metadata.get("source", "unknown")
-        
-        # This split_text method handles the sliding window logic for you
-        texts = splitter.split_text(doc.page_content)
-        
-        for t in texts:
-            out.append(Document(
-                page_content=t,
-                metadata={
-                    "session_id": session_id, 
-                    "source": src
-                }
-            ))
-            
-    return out
+        for span, token_count in await run_in_threadpool(
+            lambda: counted(splitter.feed(text, page_index))
+        ):
+            yield to_document(span, token_count)
+            ordinal += 1
+
+    for span, token_count in await run_in_threadpool(lambda: counted(splitter.flush())):
+        yield to_document(span, token_count)
+        ordinal += 1
+
+
+def stream_pdf_chunks(
+    pdf_path: str,
+    session_id: str,
+    on_pages_done: Optional[callable] = None,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+    ocr_min_chars_threshold: int = 40,
+    ocr_zoom: float = 1.2,
+    ocr_lang: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    ocr_stats: Optional[OCRRunStats] = None,
+    report: Optional[ExtractionReport] = None,
+) -> AsyncIterator[Document]:
+    """Extraction and splitting of one PDF as two overlapping, bounded stages."""
+    pages = bounded(
+        stream_pdf_pages(
+            pdf_path, on_pages_done, ocr_min_chars_threshold, ocr_zoom, ocr_lang,
+            content_hash, ocr_stats, report,
+        ),
+        maxsize=PAGE_WINDOW,
+    )
+    return stream_chunks(pages, Path(pdf_path).name, session_id, chunk_size, chunk_overlap)
+
 
 async def load_and_split_with_ocr(
     paths: List[str] | str,
     session_id: str,  
     progress_callback: Optional[callable] = None,
-    chunk_size: int = 1000,
-    chunk_overlap: int = 100,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
     ocr_min_chars_threshold: int = 40,
     ocr_zoom: float = 1.2,
     ocr_lang: Optional[str] = None,
 ) -> List[Document]:
+    """Collects the chunk streams of every PDF into one list (small inputs / scripts)."""
     
     if isinstance(paths, str):
         paths = [paths]
-    
-    def get_total_pages():
-        count = 0
-        for p in paths:
-            try:
-                with fitz.open(p) as d:
-                    count += d.page_count
-            except Exception:
-                continue
-        return count
 
-    total_pages = await run_in_threadpool(get_total_pages)
-    tracker = ProgressTracker(total_pages)
+    tracker = ProgressTracker(await count_pdf_pages(paths))
+
+    async def report_progress(pages: int = 1):
+        message = tracker.update(pages)
+        if progress_callback:
+            await progress_callback({**tracker.snapshot(), "message": message})
 
     async def process_single_pdf(p):
-        src_name = Path(p).name
-        pdf_full_text = []
-
-        try:
-            loaded = await _load_pdf(p)
-
-            # Normal Text extraction path
-            if loaded:
-                for page_index, doc in enumerate(loaded):
-                    page_text = (getattr(doc, "page_content", "") or "").strip()
-
-                    # Trigger OCR if text is sparse (scanned pages)
-                    if OCR_AVAILABLE and len(page_text) < ocr_min_chars_threshold:
-                        ocr_text = await _ocr_page(p, page_index, zoom=ocr_zoom, lang=ocr_lang)
-                        if ocr_text and len(ocr_text) > len(page_text):
-                            page_text = ocr_text
-                    
-                    pdf_full_text.append(clean_text_for_vector_db(page_text))
-                    if progress_callback:
-                        await progress_callback(tracker.update())
-
-            # Pure Scanned PDF path (loader failed or returned nothing)
-            elif OCR_AVAILABLE:
-                def get_count():
-                    with fitz.open(p) as d: return d.page_count
-                count = await run_in_threadpool(get_count)
-
-                for i in range(count):
-                    ocr_text = await _ocr_page(p, i, zoom=ocr_zoom, lang=ocr_lang)
-                    pdf_full_text.append(clean_text_for_vector_db(ocr_text))
-                    if progress_callback:
-                        await progress_callback(tracker.update())
-                        
-        except Exception as e:
-            logger.exception("🔴 Failed to process PDF %s: %s", p, e)
-
-        if pdf_full_text:
-            # Join all pages with a newline to prevent mid-page fragmentation
-            return [SimpleDoc(
-                page_content="\n".join(pdf_full_text), 
-                metadata={"source": src_name}
-            )]
-        return []
+        return [
+            chunk async for chunk in stream_pdf_chunks(
+                p, session_id, report_progress, chunk_size, chunk_overlap,
+                ocr_min_chars_threshold, ocr_zoom, ocr_lang, ocr_stats=tracker.ocr,
+            )
+        ]
 
     # EXECUTE: Run PDF tasks in parallel
     results = await asyncio.gather(*(process_single_pdf(p) for p in paths))
     
-    # Flatten results (results is a list of lists of SimpleDoc)
-    all_docs = [doc for sublist in results for doc in sublist]
+    logger.info(
+        "🟢 Extracted %d/%d pages at %.2f pages/sec (OCR cache hits: %d/%d, OCR skipped: %d)",
+        tracker.current, tracker.total, tracker.pages_per_sec,
+        tracker.ocr.ocr_cache_hits, tracker.ocr.ocr_pages, tracker.ocr.ocr_skipped,
+    )
 
-    # SPLIT: Perform the sliding window chunking on the long joined strings
-    return _fixed_size_split_docs(all_docs, chunk_size, chunk_overlap, session_id)
+    return [chunk for sublist in results for chunk in sublist]
 
 # chunks format:
 # { 
@@ -1,12 +1,16 @@
 
+import os
+import asyncio
 import logging
-from typing import Optional
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from global_modules.pg_pool import get_pg_pool
 
-from modules.get_transcript import transcrpition_extractor, get_video_title
-from mongodb.insert_chunks import insert_chunks
+from fastapi import HTTPException
+from modules.get_transcript import extract_video_id
+from modules.transcript_service import get_transcript_service
+from mongodb.document_store import copy_stored_document, stored_document_chunks
+from mongodb.insert_chunks import embed_chunks, insert_chunks
+from modules.text_splitting import CHUNK_OVERLAP_TOKENS, CHUNK_SIZE_TOKENS
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -15,98 +19,177 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Bulk loads: videos per request, and videos resolved at once per request
+TRANSCRIPT_BULK_MAX_VIDEOS = int(os.getenv("TRANSCRIPT_BULK_MAX_VIDEOS", "50"))
+TRANSCRIPT_BULK_CONCURRENCY = int(os.getenv("TRANSCRIPT_BULK_CONCURRENCY", "8"))
+
 import json
 
-async def append_link_to_db(session_id: str, url: str, title: str):
+async def append_links_to_db(session_id: str, links: List[Tuple[str, str]]):
     """
-    Appends a single {url, title} object to the url_links JSONB column in Postgres.
+    Appends {url, title} objects to the url_links JSONB column in Postgres,
+    all of them in a single statement.
     """
+    if not links:
+        return
+
     pool = await get_pg_pool()
     
-    # We wrap the single dict in a list [] so the || operator 
+    # A JSON array on both sides, so the || operator 
     # performs an array concatenation in Postgres.
-    new_link = {
-        "url": url, 
-        "title": title,
-        "added_at": datetime.now().isoformat()
-    }
-    
-    new_link_json = json.dumps(new_link)
+    added_at = datetime.now().isoformat()
+    new_links_json = json.dumps([
+        {"url": url, "title": title, "added_at": added_at}
+        for url, title in links
+    ])
 
     query = """
         INSERT INTO sessions (session_id, url_links, created_at, last_activity)
         VALUES (
             %s, 
-            jsonb_build_array(%s::jsonb), 
+            %s::jsonb, 
             NOW(), 
             NOW()
         )
         ON CONFLICT (session_id) 
         DO UPDATE SET 
-            url_links = COALESCE(sessions.url_links, '[]'::jsonb) || jsonb_build_array(%s::jsonb),
+            url_links = COALESCE(sessions.url_links, '[]'::jsonb) || EXCLUDED.url_links,
             last_activity = NOW();
     """
     
     try:
         async with pool.connection() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(query, (session_id, new_link_json, new_link_json))
+                await cur.execute(query, (session_id, new_links_json))
             await conn.commit()
             
-        logger.info(f"🟢 Successfully appended link to session {session_id}: {title}")
+        logger.info(f"🟢 Successfully appended {len(links)} link(s) to session {session_id}")
     except Exception as e:
-        logger.error(f"🔴 Failed to update sessions table for link: {e}", exc_info=True)
+        logger.error(f"🔴 Failed to update sessions table for links: {e}", exc_info=True)
+
+
+async def append_link_to_db(session_id: str, url: str, title: str):
+    """Appends a single {url, title} object to the url_links JSONB column."""
+    await append_links_to_db(session_id, [(url, title)])
 
 async def load_transcript(
     youtube_url: str,
     session_id: str,
-    chunk_size: int = 1000,
-    chunk_overlap: int = 100, 
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS, 
     raise_on_empty: bool = False,
 ) -> Optional[bool]:
     
     try:
-        # 1) Fetch data in threadpool to avoid blocking the event loop
-        # We run these together as a single blocking task or separately
-        text = await transcrpition_extractor(youtube_url)
-        title = await get_video_title(youtube_url)
-
-         
+        # 1) Transcript, title and chunk vectors, shared across sessions
+        stored = await get_transcript_service().get(youtube_url, chunk_size, chunk_overlap)
     except Exception as exc:
         logger.warning("Failed to fetch transcript for %s: %s", youtube_url, exc)
         if raise_on_empty:
             raise
         return None
 
-    if not text or not text.strip():
-        msg = f"Empty transcript for {youtube_url}"
-        logger.warning(msg)
-        if raise_on_empty:
-            raise ValueError(msg)
-        return None
+    title = stored["manifest"]["source"]
 
-    # 2) Wrap as a Document
-    doc = Document(
-        page_content=text,
-        metadata={
-            "source": title,
-            "session_id": session_id,
-        },
-    )
-
-    # 3) Split into chunks (CPU bound, usually fast enough to stay sync)
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    chunks = splitter.split_documents([doc])
-
-    # 4) Send chunks to MongoDB (IO bound)
-    logger.info("🔰 Calling insert_chunks function for transcript chunks")
-    await insert_chunks(chunks)
-    logger.info("🟢 insert_chunks function completed for transcript chunks")
+    # 2) Copy the chunks into the session, reusing their vectors
+    logger.info("🔰 Copying transcript chunks into session %s", session_id)
+    await copy_stored_document(stored, session_id, title)
+    logger.info("🟢 Transcript chunks stored for session %s", session_id)
 
     await append_link_to_db(session_id, youtube_url, title)
     
-    return title
\ No newline at end of file
+    return title
+
+
+async def load_transcripts_bulk(
+    youtube_urls: List[str],
+    session_id: str,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Loads many videos into a session. Yields a status event per video as soon
+    as it resolves ("fetched" or "failed"), "ready" once its chunks are written
+    to the session, then one summary event.
+
+    Videos are resolved concurrently (their embeddings share the embedding
+    service's micro-batches); the session's chunks go to MongoDB in one bulk
+    write and all links to Postgres in one statement.
+    """
+    videos = []
+    seen = set()
+    failed = 0
+    for url in youtube_urls:
+        video_id = extract_video_id(url)
+        if not video_id:
+            failed += 1
+            yield {"type": "video", "data": {"url": url, "status": "failed", "error": "Invalid YouTube URL"}}
+            continue
+        if video_id not in seen:
+            seen.add(video_id)
+            videos.append((url, video_id))
+
+    for url, video_id in videos:
+        yield {"type": "video", "data": {"url": url, "video_id": video_id, "status": "queued"}}
+
+    service = get_transcript_service()
+    slots = asyncio.Semaphore(TRANSCRIPT_BULK_CONCURRENCY)
+
+    async def resolve(position: int, url: str, video_id: str):
+        async with slots:
+            try:
+                return position, url, video_id, await service.get(url, chunk_size, chunk_overlap), None
+            except HTTPException as e:
+                return position, url, video_id, None, e.detail
+            except Exception as e:
+                logger.warning("Failed to fetch transcript for %s: %s", url, e)
+                return position, url, video_id, None, str(e)
+
+    tasks = [asyncio.create_task(resolve(i, url, vid)) for i, (url, vid) in enumerate(videos)]
+    loaded = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            position, url, video_id, stored, error = await next_done
+            status = {"url": url, "video_id": video_id}
+            if stored is None:
+                failed += 1
+                yield {"type": "video", "data": {**status, "status": "failed", "error": error}}
+                continue
+
+            title = stored["manifest"]["source"]
+            chunks, vectors = stored_document_chunks(stored, session_id, title)
+            loaded.append((position, url, video_id, title, chunks, vectors))
+            # Not "ready" yet: nothing is in the session until the bulk write below
+            yield {"type": "video", "data": {**status, "status": "fetched", "title": title, "chunks": len(chunks)}}
+    finally:
+        # Client went away: stop the fetches nobody will use
+        for task in tasks:
+            task.cancel()
+
+    # Playlist order, not completion order
+    loaded.sort(key=lambda v: v[0])
+    all_chunks = [c for v in loaded for c in v[4]]
+
+    try:
+        all_vectors = []
+        for _, _, _, _, chunks, vectors in loaded:
+            all_vectors.extend(vectors if vectors is not None else await embed_chunks(chunks))
+
+        if all_chunks:
+            logger.info("🔰 Writing %d transcript chunks of %d videos", len(all_chunks), len(loaded))
+            await insert_chunks(all_chunks, vectors=all_vectors)
+            await append_links_to_db(session_id, [(url, title) for _, url, _, title, _, _ in loaded])
+    except Exception as e:
+        logger.exception("Bulk write of %d transcript chunks failed", len(all_chunks))
+        for _, url, video_id, _, _, _ in loaded:
+            yield {"type": "video", "data": {"url": url, "video_id": video_id, "status": "failed", "error": str(e)}}
+        failed += len(loaded)
+        loaded, all_chunks = [], []
+
+    for _, url, video_id, title, chunks, _ in loaded:
+        yield {"type": "video", "data": {"url": url, "video_id": video_id, "status": "ready", "title": title, "chunks": len(chunks)}}
+
+    yield {
+        "type": "done",
+        "data": {"videos_loaded": len(loaded), "videos_failed": failed, "chunks": len(all_chunks)},
+    }
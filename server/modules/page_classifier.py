@@ -0,0 +1,108 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from global_modules.ocr_engine import fitz
+
+# A page mostly covered by images is OCR'd unless its text layer is substantial
+OCR_IMAGE_COVERAGE = float(os.getenv("OCR_IMAGE_COVERAGE", "0.6"))
+OCR_IMAGE_PAGE_MAX_CHARS = int(os.getenv("OCR_IMAGE_PAGE_MAX_CHARS", "200"))
+# Below this, images are decoration (logos, icons) rather than page content
+OCR_MIN_IMAGE_COVERAGE = float(os.getenv("OCR_MIN_IMAGE_COVERAGE", "0.1"))
+# Grayscale thumbnail entropy (bits): ~0 is blank, scanned text sits around 1.5-4,
+# photos and rendered figures are 6+ and OCR finds nothing useful in them
+OCR_BLANK_ENTROPY = float(os.getenv("OCR_BLANK_ENTROPY", "0.5"))
+OCR_MAX_ENTROPY = float(os.getenv("OCR_MAX_ENTROPY", "5.5"))
+# Zoom range for image pages, picked from the scan's native resolution
+OCR_MIN_ZOOM = float(os.getenv("OCR_MIN_ZOOM", "1.0"))
+OCR_MAX_ZOOM = float(os.getenv("OCR_MAX_ZOOM", "2.0"))
+
+THUMBNAIL_WIDTH = 128
+ZOOM_STEP = 0.25
+
+
+@dataclass
+class PageAssessment:
+    needs_ocr: bool
+    zoom: float
+    reason: str
+
+
+def image_coverage(page: Any) -> float:
+    """Fraction of the page area covered by placed images (overlaps capped at 1.0)."""
+    area = abs(page.rect)
+    if not area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page.rect)
+    return min(1.0, covered / area)
+
+
+def thumbnail_entropy(page: Any, clip: Optional[Any] = None) -> float:
+    """Shannon entropy of a ~128px wide grayscale rendering of the page (or `clip`)."""
+    rect = clip or page.rect
+    if rect.is_empty:
+        return 0.0
+    scale = THUMBNAIL_WIDTH / rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, clip=rect, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8)
+    if not pixels.size:
+        return 0.0
+    p = np.bincount(pixels, minlength=256) / pixels.size
+    p = p[p > 0]
+    return float(-(p * np.log2(p)).sum())
+
+
+def _largest_image(page: Any) -> Optional[dict]:
+    images = [i for i in page.get_image_info() if not (fitz.Rect(i["bbox"]) & page.rect).is_empty]
+    return max(images, key=lambda i: abs(fitz.Rect(i["bbox"]) & page.rect), default=None)
+
+
+def _native_zoom(image: dict, default_zoom: float) -> float:
+    """Zoom at which the rendering matches the image's own pixels: no blur, no wasted upscaling."""
+    width_pt = fitz.Rect(image["bbox"]).width
+    if not width_pt or not image.get("width"):
+        return default_zoom
+    zoom = min(max(image["width"] / width_pt, OCR_MIN_ZOOM), OCR_MAX_ZOOM)
+    return round(zoom / ZOOM_STEP) * ZOOM_STEP
+
+
+def assess_page(page: Any, text: str, ocr_min_chars_threshold: int, default_zoom: float) -> PageAssessment:
+    """
+    Predicts whether OCR will add text to a page, before rendering it at full size.
+
+    Uses, cheapest first: text-layer length, image area ratio, font presence, and
+    the entropy of a small grayscale thumbnail of the page's dominant image.
+    """
+    if len(text) >= OCR_IMAGE_PAGE_MAX_CHARS:
+        return PageAssessment(False, default_zoom, "text_layer")
+
+    coverage = image_coverage(page)
+    sparse = len(text) < ocr_min_chars_threshold
+
+    if coverage < OCR_MIN_IMAGE_COVERAGE:
+        if not sparse:
+            return PageAssessment(False, default_zoom, "text_layer")
+        if page.get_fonts():
+            # Real but short text layer: title page, section divider
+            return PageAssessment(False, default_zoom, "sparse_text_layer")
+        # No fonts, no images: blank, or text drawn as vector outlines
+        if thumbnail_entropy(page) <= OCR_BLANK_ENTROPY:
+            return PageAssessment(False, default_zoom, "blank")
+        return PageAssessment(True, default_zoom, "vector_page")
+
+    if not sparse and coverage < OCR_IMAGE_COVERAGE:
+        return PageAssessment(False, default_zoom, "text_layer")
+
+    image = _largest_image(page)
+    if image is None:
+        return PageAssessment(sparse, default_zoom, "scanned")
+    entropy = thumbnail_entropy(page, fitz.Rect(image["bbox"]) & page.rect)
+    if entropy <= OCR_BLANK_ENTROPY:
+        return PageAssessment(False, default_zoom, "blank")
+    if entropy > OCR_MAX_ENTROPY:
+        return PageAssessment(False, default_zoom, "photo")
+    return PageAssessment(True, _native_zoom(image, default_zoom), "scanned")
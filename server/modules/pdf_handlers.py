@@ -1,8 +1,12 @@
+import os
 import shutil
+import hashlib
 import aiofiles
 import aiofiles.os  # i don't need this right now.. may require it later 
+from dataclasses import dataclass
 from fastapi.concurrency import run_in_threadpool
-from fastapi import UploadFile,HTTPException
+from fastapi import Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
 from pathlib import Path
 from typing import List
 import logging
@@ -13,6 +17,30 @@ logger = logging.getLogger(__name__)
 
 BASE_UPLOAD_DIR = "./uploaded_pdfs"
 
+UPLOAD_BLOCK_SIZE = 1024 * 1024  # 1 MiB per read/write
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", 100 * 1024 * 1024))
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", 300 * 1024 * 1024))
+# Multipart boundaries, part headers and the form fields around the files
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_PATH = "/uploads/pdfs"
+
+
+def sha256_file(path: str) -> str:
+    """Blocking: hash a file on disk in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class SavedUpload:
+    path: str
+    filename: str
+    sha256: str
+    size: int
+
 
 async def ensure_dir(path: str) -> None:
     """Run directory creation in a threadpool."""
@@ -66,57 +94,151 @@ async def append_pdfs_to_db(session_id: str, filenames: List[str]):
         logger.error(f"🔴Failed to update sessions table: {e}", exc_info=True)
 
 
-async def save_uploaded_files(files: List[UploadFile], session_id: str) -> List[str]:
+async def remove_pdfs_from_db(session_id: str, filenames: List[str]):
+    """
+    Undoes append_pdfs_to_db: drops one entry per filename, newest first,
+    so an earlier upload of the same name stays listed.
+    """
+    pool = await get_pg_pool()
+
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT pdfs_uploaded FROM sessions WHERE session_id = %s FOR UPDATE;",
+                    (session_id,),
+                )
+                row = await cur.fetchone()
+                remaining = list(row[0] or []) if row else []
+
+                for name in filenames:
+                    if name in remaining:
+                        del remaining[len(remaining) - 1 - remaining[::-1].index(name)]
+
+                await cur.execute(
+                    "UPDATE sessions SET pdfs_uploaded = %s WHERE session_id = %s;",
+                    (remaining, session_id),
+                )
+
+            await conn.commit()
+        logger.info(f"🟢Removed {len(filenames)} rejected files from session {session_id}")
+    except Exception as e:
+        logger.error(f"🔴Failed to update sessions table: {e}", exc_info=True)
+
+
+async def discard_uploads(session_id: str, uploads: List[SavedUpload]) -> None:
+    """Rolls back save_uploaded_files for a request that was rejected afterwards."""
+    await delete_local_files([u.path for u in uploads])
+    await remove_pdfs_from_db(session_id, [u.filename for u in uploads])
+    await delete_session_directory_if_empty(session_id)
+
+
+async def _stream_to_disk(upload: UploadFile, dest_path: str, max_bytes: int) -> tuple[str, int]:
     """
-    Save UploadFile objects to disk (streamed), return list of saved file paths.
+    Copy an UploadFile to disk in fixed-size blocks, hashing as we go.
+    Never holds more than one block in memory. Returns (sha256, size).
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    async with aiofiles.open(dest_path, "wb") as out_f:
+        while True:
+            block = await upload.read(UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+
+            size += len(block)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Upload limit exceeded while receiving: {upload.filename}"
+                )
+
+            digest.update(block)
+            await out_f.write(block)
+
+    return digest.hexdigest(), size
+
+
+async def reject_oversized_upload(request: Request, call_next):
+    """
+    HTTP middleware: refuses an upload whose Content-Length already exceeds
+    the request limit, before Starlette spools the body to disk. Bodies sent
+    without a length are still cut off while streaming (_stream_to_disk).
+    """
+    if request.method == "POST" and request.url.path == UPLOAD_PATH:
+        length = request.headers.get("content-length")
+        if length is not None:
+            try:
+                size = int(length)
+            except ValueError:
+                return JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header."})
+            if size > MAX_UPLOAD_REQUEST_BYTES + UPLOAD_FORM_OVERHEAD_BYTES:
+                return JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Upload limit exceeded: at most {MAX_UPLOAD_REQUEST_BYTES} bytes per request"},
+                )
+    return await call_next(request)
+
+
+async def save_uploaded_files(files: List[UploadFile], session_id: str) -> List[SavedUpload]:
+    """
+    Save UploadFile objects to disk (streamed), return the saved uploads
+    with their sha256 digest and byte count.
     Supports multiple files.
     """
     await ensure_dir(BASE_UPLOAD_DIR)
-    saved_path: List[str] = []
-    filenames_to_db: List[str] = []
-
-    for upload in files:
-        # ensure pointer is at start
-        # await upload.seek(0)
-        if not upload.filename:
-            continue
-        
-
-        safe_path = await unique_filepath(BASE_UPLOAD_DIR, upload.filename, session_id=session_id)
-
-        contents = await upload.read()
-        if not contents:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Empty file received: {upload.filename}"
-            )
+    saved: List[SavedUpload] = []
+    request_bytes = 0
 
-        async with aiofiles.open(safe_path, "wb") as out_f: 
-            await out_f.write(contents)
-        
+    try:
+        for upload in files:
+            # ensure pointer is at start
+            # await upload.seek(0)
+            if not upload.filename:
+                continue
 
-        # await upload.seek(0)
+            safe_path = await unique_filepath(BASE_UPLOAD_DIR, upload.filename, session_id=session_id)
 
-        saved_path.append(safe_path)
-        filenames_to_db.append(upload.filename)
-        logger.info(
-            "🟢Saved upload to %s (%d bytes)",
-            safe_path,
-            len(contents)
-        )
+            # A file may use whatever is left of the per-request budget, up to the per-file limit
+            max_bytes = min(MAX_UPLOAD_FILE_BYTES, MAX_UPLOAD_REQUEST_BYTES - request_bytes)
+            try:
+                sha256, size = await _stream_to_disk(upload, safe_path, max_bytes)
+            except Exception:
+                await delete_local_files([safe_path])
+                raise
+            finally:
+                # close underlying file
+                try:
+                    await upload.close()
+                except Exception:
+                    pass
 
-        # close underlying file
-        try:
-            await upload.close()
-        except Exception:
-            pass
-        
-        logger.info("🟢Saved upload to %s", safe_path)
+            if size == 0:
+                await delete_local_files([safe_path])
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Empty file received: {upload.filename}"
+                )
+
+            request_bytes += size
+            saved.append(SavedUpload(path=safe_path, filename=upload.filename, sha256=sha256, size=size))
+            logger.info(
+                "🟢Saved upload to %s (%d bytes, sha256=%s)",
+                safe_path,
+                size,
+                sha256[:12]
+            )
+
+    except Exception:
+        # Never leave half of a rejected request on disk
+        await delete_local_files([s.path for s in saved])
+        raise
 
-    if filenames_to_db:
-        await append_pdfs_to_db(session_id, filenames_to_db)
+    if saved:
+        await append_pdfs_to_db(session_id, [s.filename for s in saved])
 
-    return saved_path
+    return saved
 
 
 async def delete_local_files(paths: List[str]) -> None:
@@ -139,4 +261,14 @@ async def delete_session_directory(session_id: str) -> None:
             await run_in_threadpool(shutil.rmtree, str(session_path))
             logger.info(f"🟢 Successfully cleaned up folder for session: {session_id}")
         except Exception as e:
-            logger.error(f"🔴 Failed to delete session folder {session_id}: {e}")
\ No newline at end of file
+            logger.error(f"🔴 Failed to delete session folder {session_id}: {e}")
+
+async def delete_session_directory_if_empty(session_id: str) -> None:
+    """Removes the session folder only once no other ingestion still has files in it."""
+    session_path = Path(BASE_UPLOAD_DIR) / session_id
+    try:
+        await aiofiles.os.rmdir(str(session_path))
+        logger.info(f"🟢 Removed empty folder for session: {session_id}")
+    except OSError:
+        # Missing, or still holds files of a concurrent upload
+        pass
@@ -0,0 +1,372 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from global_modules.pg_pool import get_pg_pool
+from global_modules.mongo_collections import collection
+from mongodb.document_store import DOCUMENT_STORE_TTL_DAYS, purge_unused_documents
+from mongodb.session_index import get_session_index_cache
+from modules.pdf_handlers import BASE_UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+SESSION_GC_ENABLED = os.getenv("SESSION_GC_ENABLED", "false").lower() == "true"
+# Report what would be reclaimed without deleting anything
+SESSION_GC_DRY_RUN = os.getenv("SESSION_GC_DRY_RUN", "false").lower() == "true"
+SESSION_GC_INTERVAL_SEC = float(os.getenv("SESSION_GC_INTERVAL_SEC", "3600"))
+# Idle time after which a session is collected; 0 keeps that kind of session forever
+GUEST_SESSION_TTL_HOURS = float(os.getenv("GUEST_SESSION_TTL_HOURS", "72"))
+REGISTERED_SESSION_TTL_DAYS = float(os.getenv("REGISTERED_SESSION_TTL_DAYS", "0"))
+# Sessions deleted per batch, and the pause between batches, so a large
+# backlog never holds locks or saturates Atlas / Postgres I/O for long
+SESSION_GC_BATCH_SIZE = int(os.getenv("SESSION_GC_BATCH_SIZE", "50"))
+SESSION_GC_BATCH_PAUSE_SEC = float(os.getenv("SESSION_GC_BATCH_PAUSE_SEC", "1.0"))
+SESSION_GC_MAX_SESSIONS_PER_RUN = int(os.getenv("SESSION_GC_MAX_SESSIONS_PER_RUN", "5000"))
+
+# LangGraph AsyncPostgresSaver tables, all keyed by thread_id (= session_id)
+CHECKPOINT_TABLES = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+
+STORES = ("mongo", "checkpoints", "uploads")
+
+# Same predicate for selection and deletion, so a session touched in
+# between is not deleted
+_EXPIRED = """
+    (
+        (s.oauth_id IS NULL AND %(guest_hours)s > 0
+            AND COALESCE(s.last_activity, s.created_at) < NOW() - %(guest_hours)s * INTERVAL '1 hour')
+        OR
+        (s.oauth_id IS NOT NULL AND %(registered_days)s > 0
+            AND COALESCE(s.last_activity, s.created_at) < NOW() - %(registered_days)s * INTERVAL '1 day')
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM ingestion_jobs j
+        WHERE j.session_id = s.session_id AND j.status IN ('queued', 'running')
+    )
+"""
+
+SELECT_EXPIRED = f"""
+    SELECT s.session_id FROM sessions s
+    WHERE {_EXPIRED}
+    ORDER BY COALESCE(s.last_activity, s.created_at)
+    LIMIT %(limit)s;
+"""
+
+# Locked until the batch commits: a session revived in between waits for the
+# batch instead of losing its data, one being touched right now is skipped
+LOCK_EXPIRED = f"""
+    SELECT s.session_id FROM sessions s
+    WHERE s.session_id = ANY(%(ids)s) AND {_EXPIRED}
+    FOR UPDATE OF s SKIP LOCKED;
+"""
+
+
+def _dir_size(path: Path) -> Tuple[int, int]:
+    """(files, bytes) under `path`; missing directories count as empty."""
+    files = size = 0
+    if not path.is_dir():
+        return 0, 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                files += 1
+                size += p.stat().st_size
+        except OSError:
+            pass
+    return files, size
+
+
+def _remove_dirs(paths: List[Path]) -> Tuple[int, int, List[Path]]:
+    """(files, bytes) removed, and the paths that could not be removed."""
+    files = size = 0
+    failed = []
+    for path in paths:
+        n, b = _dir_size(path)
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.error(f"🔴 Session GC could not remove {path}: {e}")
+            failed.append(path)
+            continue
+        files += n
+        size += b
+    return files, size, failed
+
+
+class SessionGarbageCollector:
+    """
+    Periodically deletes everything an idle session left behind: its vector
+    chunks in Mongo, its LangGraph checkpoints, its upload folder and its
+    `sessions` row. Guests and signed-in users get separate TTLs.
+
+    Each run also purges document store entries no session has reused within
+    DOCUMENT_STORE_TTL_DAYS.
+    """
+
+    def __init__(
+        self,
+        interval: float = SESSION_GC_INTERVAL_SEC,
+        guest_ttl_hours: float = GUEST_SESSION_TTL_HOURS,
+        registered_ttl_days: float = REGISTERED_SESSION_TTL_DAYS,
+        batch_size: int = SESSION_GC_BATCH_SIZE,
+        batch_pause: float = SESSION_GC_BATCH_PAUSE_SEC,
+        max_sessions: int = SESSION_GC_MAX_SESSIONS_PER_RUN,
+        dry_run: bool = SESSION_GC_DRY_RUN,
+        document_store_ttl_days: float = DOCUMENT_STORE_TTL_DAYS,
+    ):
+        self.interval = interval
+        self.guest_ttl_hours = guest_ttl_hours
+        self.registered_ttl_days = registered_ttl_days
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.max_sessions = max_sessions
+        self.dry_run = dry_run
+        self.document_store_ttl_days = document_store_ttl_days
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._runs = 0
+        self._sessions = 0
+        self._reclaimed_bytes = {store: 0 for store in STORES}
+        self._document_store_entries = 0
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    # =================================================
+    # LIFECYCLE
+    # =================================================
+
+    async def start(self):
+        if self.guest_ttl_hours <= 0 and self.registered_ttl_days <= 0 and self.document_store_ttl_days <= 0:
+            logger.info("Session GC disabled: no TTL configured")
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(
+            "✅ Session GC started (guest TTL %sh, registered TTL %sd, document store TTL %sd, every %ss%s)",
+            self.guest_ttl_hours, self.registered_ttl_days, self.document_store_ttl_days, self.interval,
+            ", dry run" if self.dry_run else "",
+        )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"🔴 Session GC run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    # =================================================
+    # ONE PASS
+    # =================================================
+
+    def _params(self) -> Dict[str, Any]:
+        return {
+            "guest_hours": self.guest_ttl_hours,
+            "registered_days": self.registered_ttl_days,
+        }
+
+    async def _expired_sessions(self) -> List[str]:
+        pool = await get_pg_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_EXPIRED, {**self._params(), "limit": self.max_sessions})
+                return [row[0] for row in await cur.fetchall()]
+
+    async def _mongo_usage(self, session_ids: List[str]) -> Tuple[int, int]:
+        cursor = collection.aggregate([
+            {"$match": {"session_id": {"$in": session_ids}}},
+            {"$group": {"_id": None, "docs": {"$sum": 1}, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}},
+        ])
+        async for row in cursor:
+            return row["docs"], row["bytes"]
+        return 0, 0
+
+    async def _checkpoint_usage(self, cur, session_ids: List[str], delete: bool) -> Tuple[int, int]:
+        rows = size = 0
+        for table in CHECKPOINT_TABLES:
+            if delete:
+                query = f"""
+                    WITH d AS (DELETE FROM {table} t WHERE t.thread_id = ANY(%s) RETURNING pg_column_size(t.*) AS b)
+                    SELECT count(*), COALESCE(sum(b), 0) FROM d;
+                """
+            else:
+                query = f"SELECT count(*), COALESCE(sum(pg_column_size(t.*)), 0) FROM {table} t WHERE t.thread_id = ANY(%s);"
+            await cur.execute(query, (session_ids,))
+            n, b = await cur.fetchone()
+            rows += n
+            size += int(b)
+        return rows, size
+
+    async def _collect_batch(self, session_ids: List[str], dry_run: bool) -> Dict[str, int]:
+        pool = await get_pg_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if dry_run:
+                    deleted = session_ids
+                else:
+                    await cur.execute(LOCK_EXPIRED, {**self._params(), "ids": session_ids})
+                    deleted = [row[0] for row in await cur.fetchall()]
+
+                if not deleted:
+                    return {"sessions": 0}
+
+                mongo_docs, mongo_bytes = await self._mongo_usage(deleted)
+                dirs = {sid: Path(BASE_UPLOAD_DIR) / sid for sid in deleted}
+                if dry_run:
+                    sizes = await run_in_threadpool(lambda: [_dir_size(d) for d in dirs.values()])
+                    upload_files, upload_bytes = sum(s[0] for s in sizes), sum(s[1] for s in sizes)
+                    checkpoint_rows, checkpoint_bytes = await self._checkpoint_usage(cur, deleted, delete=False)
+                else:
+                    # Chunks and folders first: deleting them again is harmless, so
+                    # if anything fails here the rows survive and the next run retries
+                    if mongo_docs:
+                        await collection.delete_many({"session_id": {"$in": deleted}})
+                    get_session_index_cache().evict(deleted)
+                    upload_files, upload_bytes, failed = await run_in_threadpool(_remove_dirs, list(dirs.values()))
+                    deleted = [sid for sid in deleted if dirs[sid] not in failed]
+
+                    checkpoint_rows, checkpoint_bytes = await self._checkpoint_usage(cur, deleted, delete=True)
+                    await cur.execute("DELETE FROM ingestion_jobs WHERE session_id = ANY(%s);", (deleted,))
+                    await cur.execute("DELETE FROM sessions WHERE session_id = ANY(%s);", (deleted,))
+            await conn.commit()
+
+        return {
+            "sessions": len(deleted),
+            "mongo_docs": mongo_docs,
+            "mongo_bytes": mongo_bytes,
+            "checkpoint_rows": checkpoint_rows,
+            "checkpoint_bytes": checkpoint_bytes,
+            "upload_files": upload_files,
+            "upload_bytes": upload_bytes,
+        }
+
+    async def run_once(self, dry_run: Optional[bool] = None) -> Dict[str, Any]:
+        """Collect every expired session once. Returns what was (or would be) reclaimed."""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        async with self._lock:
+            started = time.perf_counter()
+            report: Dict[str, Any] = {
+                "dry_run": dry_run,
+                "sessions": 0,
+                "mongo_docs": 0,
+                "mongo_bytes": 0,
+                "checkpoint_rows": 0,
+                "checkpoint_bytes": 0,
+                "upload_files": 0,
+                "upload_bytes": 0,
+                "document_store_entries": 0,
+                "document_store_chunks": 0,
+            }
+
+            session_ids = await self._expired_sessions()
+            for i in range(0, len(session_ids), self.batch_size):
+                if i:
+                    await asyncio.sleep(self.batch_pause)
+                batch = await self._collect_batch(session_ids[i:i + self.batch_size], dry_run)
+                for key, value in batch.items():
+                    report[key] += value
+
+            # Shared across sessions, so collected by age rather than with a session
+            try:
+                purged = await purge_unused_documents(self.document_store_ttl_days, dry_run=dry_run)
+                report["document_store_entries"] = purged["entries"]
+                report["document_store_chunks"] = purged["chunks"]
+            except Exception as e:
+                logger.error(f"🔴 Session GC could not purge the document store: {e}")
+
+            report["reclaimed_bytes"] = report["mongo_bytes"] + report["checkpoint_bytes"] + report["upload_bytes"]
+            report["seconds"] = round(time.perf_counter() - started, 3)
+            report["finished_at"] = time.time()
+
+            self._runs += 1
+            self._last_run = report
+            if not dry_run:
+                self._sessions += report["sessions"]
+                self._reclaimed_bytes["mongo"] += report["mongo_bytes"]
+                self._reclaimed_bytes["checkpoints"] += report["checkpoint_bytes"]
+                self._reclaimed_bytes["uploads"] += report["upload_bytes"]
+                self._document_store_entries += report["document_store_entries"]
+
+        if report["document_store_entries"] or report["document_store_chunks"]:
+            logger.info(
+                "🟢 Session GC %s %d unused document store entries (%d chunks)",
+                "would delete" if dry_run else "deleted",
+                report["document_store_entries"], report["document_store_chunks"],
+            )
+        if report["sessions"]:
+            logger.info(
+                "🟢 Session GC %s %d sessions: %d chunks (%d B), %d checkpoint rows (%d B), %d files (%d B) in %.1fs",
+                "would delete" if dry_run else "deleted",
+                report["sessions"], report["mongo_docs"], report["mongo_bytes"],
+                report["checkpoint_rows"], report["checkpoint_bytes"],
+                report["upload_files"], report["upload_bytes"], report["seconds"],
+            )
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "dry_run": self.dry_run,
+            "runs": self._runs,
+            "sessions_deleted": self._sessions,
+            "document_store_entries_deleted": self._document_store_entries,
+            "reclaimed_bytes": dict(self._reclaimed_bytes, total=sum(self._reclaimed_bytes.values())),
+            "last_run": self._last_run,
+        }
+
+
+_session_gc: Optional[SessionGarbageCollector] = None
+
+
+def get_session_gc() -> SessionGarbageCollector:
+    global _session_gc
+    if _session_gc is None:
+        _session_gc = SessionGarbageCollector()
+    return _session_gc
+
+
+# =====================================================
+# ONE-OFF RUN: python -m modules.session_gc [--dry-run]
+# =====================================================
+
+async def _main(args):
+    from global_modules.pg_pool import close_pg_pool
+
+    gc = SessionGarbageCollector(
+        guest_ttl_hours=args.guest_ttl_hours,
+        registered_ttl_days=args.registered_ttl_days,
+        batch_size=args.batch_size,
+        batch_pause=args.batch_pause,
+        document_store_ttl_days=args.document_store_ttl_days,
+    )
+    try:
+        report = await gc.run_once(dry_run=args.dry_run)
+    finally:
+        await close_pg_pool()
+    for key, value in report.items():
+        print(f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete the data of idle sessions.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be reclaimed")
+    parser.add_argument("--guest-ttl-hours", type=float, default=GUEST_SESSION_TTL_HOURS)
+    parser.add_argument("--registered-ttl-days", type=float, default=REGISTERED_SESSION_TTL_DAYS)
+    parser.add_argument("--batch-size", type=int, default=SESSION_GC_BATCH_SIZE)
+    parser.add_argument("--batch-pause", type=float, default=SESSION_GC_BATCH_PAUSE_SEC)
+    parser.add_argument("--document-store-ttl-days", type=float, default=DOCUMENT_STORE_TTL_DAYS)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _StageFailure:
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+
+async def bounded(source: AsyncIterator[T], maxsize: int) -> AsyncIterator[T]:
+    """
+    Runs `source` in its own task, at most `maxsize` items ahead of the consumer.
+    This is what lets two pipeline stages overlap while keeping memory constant.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put(item)
+            await queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_StageFailure(e))
+        finally:
+            aclose = getattr(source, "aclose", None)
+            if aclose:
+                await aclose()
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageFailure):
+                raise item.exc
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def batched(source: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    """Groups a stream into lists of `size` items (the last one may be shorter)."""
+    batch: List[T] = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def iterate_in_thread(factory: Callable[[], Iterator[T]]) -> AsyncIterator[T]:
+    """
+    Pulls a blocking iterator one item at a time from a dedicated thread.
+    Libraries such as PyMuPDF are not thread-safe, so the iterator is created,
+    advanced and closed on that one thread; it is closed even when the consumer
+    stops early, which releases what it holds open (e.g. the file).
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iterate")
+    iterator = None
+    try:
+        iterator = await loop.run_in_executor(executor, lambda: iter(factory()))
+        while True:
+            item = await loop.run_in_executor(executor, next, iterator, _DONE)
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            await loop.run_in_executor(executor, close)
+        executor.shutdown(wait=False)
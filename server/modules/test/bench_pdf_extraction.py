@@ -0,0 +1,109 @@
+# Text-layer extraction benchmark: the previous PyPDFLoader path vs the
+# single-pass PyMuPDF reader, on a text-only and a scanned (image-only) corpus.
+# OCR itself is not run; the "ocr" column is how many pages each path would
+# hand to tesseract, "skipped" how many sparse pages the classifier ruled out.
+#
+#   cd server
+#   python -m modules.test.bench_pdf_extraction --pages 200
+#   python -m modules.test.bench_pdf_extraction --text-dir ./pdfs/text --scanned-dir ./pdfs/scanned
+#
+# The PyPDFLoader side needs `pip install pypdf` (no longer a server dependency).
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import fitz
+
+from modules.load_and_split_with_ocr import read_pdf_pages
+
+LOREM = (
+    "Retrieval augmented generation grounds a language model in documents. "
+    "Each page is split into chunks, embedded and stored for vector search. "
+) * 12
+
+
+def make_corpus(folder: Path, pages: int):
+    """Writes text.pdf (real text layer) and scanned.pdf (the same pages as images)."""
+    text_pdf = folder / "text.pdf"
+    with fitz.open() as doc:
+        for i in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 790), f"Page {i + 1}. {LOREM}", fontsize=10)
+        doc.save(text_pdf)
+
+    scanned_pdf = folder / "scanned.pdf"
+    with fitz.open(text_pdf) as src, fitz.open() as out:
+        for page in src:
+            pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+            new = out.new_page(width=page.rect.width, height=page.rect.height)
+            new.insert_image(new.rect, pixmap=pix)
+        out.save(scanned_pdf)
+
+    return [text_pdf], [scanned_pdf]
+
+
+def previous_loader(path: Path, threshold: int):
+    """Old path: fitz to count pages, PyPDFLoader for the text layer."""
+    from langchain_community.document_loaders import PyPDFLoader
+
+    with fitz.open(path) as d:
+        _ = d.page_count
+    ocr = 0
+    pages = 0
+    for doc in PyPDFLoader(str(path)).lazy_load():
+        pages += 1
+        if len((doc.page_content or "").strip()) < threshold:
+            ocr += 1
+    return pages, ocr, 0
+
+
+def single_pass(path: Path, threshold: int):
+    pages = 0
+    ocr = 0
+    skipped = 0
+    for page in read_pdf_pages(str(path), threshold):
+        pages += 1
+        ocr += page.needs_ocr
+        skipped += page.ocr_skipped
+    return pages, ocr, skipped
+
+
+def run(name, fn, files, threshold):
+    started = time.perf_counter()
+    pages = ocr = skipped = 0
+    for f in files:
+        p, o, s = fn(f, threshold)
+        pages += p
+        ocr += o
+        skipped += s
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<16} {pages:>6} pages  {pages / elapsed:>9.1f} pages/sec  ocr: {ocr}  skipped: {skipped}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100, help="Pages per generated corpus")
+    parser.add_argument("--text-dir", type=Path)
+    parser.add_argument("--scanned-dir", type=Path)
+    parser.add_argument("--threshold", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_files, scanned_files = make_corpus(Path(tmp), args.pages)
+        if args.text_dir:
+            text_files = sorted(args.text_dir.glob("*.pdf"))
+        if args.scanned_dir:
+            scanned_files = sorted(args.scanned_dir.glob("*.pdf"))
+
+        for label, files in (("text-only", text_files), ("scanned", scanned_files)):
+            print(f"{label} corpus ({len(files)} files)")
+            try:
+                run("PyPDFLoader", previous_loader, files, args.threshold)
+            except ImportError:
+                print("  PyPDFLoader      skipped (pypdf not installed)")
+            run("PyMuPDF", single_pass, files, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
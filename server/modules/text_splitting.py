@@ -0,0 +1,100 @@
+import os
+import bisect
+from dataclasses import dataclass
+from typing import List, Optional
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from global_modules.token_counter import CHARS_PER_TOKEN, embedding_token_count
+
+# Chunk sizes are in embedding-model tokens (all-MiniLM-L6-v2 truncates at 256)
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "220"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "25"))
+
+
+@dataclass
+class TextSpan:
+    text: str
+    char_start: int   # offsets in the whole document text (pages joined by "\n")
+    char_end: int
+    page: Optional[int]
+    page_end: Optional[int]
+
+
+def make_text_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    add_start_index: bool = False,
+) -> RecursiveCharacterTextSplitter:
+    """Splitter whose sizes are measured in embedding-model tokens."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=embedding_token_count,
+        add_start_index=add_start_index,
+        # Separators order: Paragraphs -> Sentences -> Words -> Characters
+        separators=["\n\n", "\n", " ", ""],
+    )
+
+
+class StreamingTextSplitter:
+    """
+    Incremental version of the RecursiveCharacterTextSplitter pass over a whole file.
+    Text is buffered until a few chunks' worth is available; every chunk except the
+    still-growing last one is emitted, and the last one (which already starts with the
+    overlap) becomes the head of the buffer.
+
+    Every chunk is located in the document, so it carries its character offsets
+    and the pages it starts and ends on.
+    """
+
+    FLUSH_FACTOR = 4
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.splitter = make_text_splitter(chunk_size, chunk_overlap)
+        self.buffer = ""
+        self.buffer_start = 0
+        self._page_starts: List[int] = []
+        self._page_numbers: List[int] = []
+
+    def _page_at(self, offset: int) -> Optional[int]:
+        i = bisect.bisect_right(self._page_starts, offset) - 1
+        return self._page_numbers[i] if i >= 0 else None
+
+    def _split(self) -> List[TextSpan]:
+        spans: List[TextSpan] = []
+        cursor = 0
+        for piece in self.splitter.split_text(self.buffer):
+            pos = self.buffer.find(piece, cursor)
+            if pos < 0:
+                pos = cursor
+            start = self.buffer_start + pos
+            end = start + len(piece)
+            spans.append(TextSpan(piece, start, end, self._page_at(start), self._page_at(max(start, end - 1))))
+            # The next chunk starts inside (or after) this one
+            cursor = pos + 1
+        return spans
+
+    def feed(self, text: str, page: Optional[int] = None) -> List[TextSpan]:
+        # Join pages with a newline to prevent mid-page fragmentation
+        separator = 1 if self.buffer else 0
+        if page is not None:
+            self._page_starts.append(self.buffer_start + len(self.buffer) + separator)
+            self._page_numbers.append(page)
+        self.buffer = f"{self.buffer}\n{text}" if self.buffer else text
+        # Cheap character estimate; the splitter itself measures real tokens
+        if len(self.buffer) < self.chunk_size * CHARS_PER_TOKEN * self.FLUSH_FACTOR:
+            return []
+
+        spans = self._split()
+        if len(spans) < 2:
+            return []
+        self.buffer = spans[-1].text
+        self.buffer_start = spans[-1].char_start
+        return spans[:-1]
+
+    def flush(self) -> List[TextSpan]:
+        spans = self._split() if self.buffer else []
+        self.buffer = ""
+        return spans
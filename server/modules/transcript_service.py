@@ -0,0 +1,208 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+
+from modules.get_transcript import extract_video_id, fetch_transcript
+from mongodb.insert_chunks import embed_chunks
+from mongodb.document_store import (
+    document_store_key,
+    load_stored_document,
+    save_stored_chunks,
+    finalize_stored_document,
+)
+from global_modules.token_counter import embedding_token_counts, llm_token_count
+
+logger = logging.getLogger(__name__)
+
+# Captions get edited and titles renamed; after this a video is fetched again
+TRANSCRIPT_CACHE_TTL_HOURS = float(os.getenv("TRANSCRIPT_CACHE_TTL_HOURS", "168"))
+
+
+def transcript_content_hash(video_id: str) -> str:
+    """Document store identity of a video, in place of a file hash."""
+    # "segments": chunks follow caption boundaries and carry timestamps
+    return f"youtube:{video_id}:segments"
+
+
+def chunk_segments(
+    segments: List[Dict[str, Any]],
+    title: str,
+    video_id: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> List[Document]:
+    """
+    Groups consecutive caption segments into chunks of at most `chunk_size`
+    embedding tokens, never cutting inside a segment. The next chunk starts on
+    the trailing segments that fit in `chunk_overlap`. Each chunk carries the
+    start/end time of its segments and its offsets in the space-joined transcript.
+    Blocking (tokenizers): call it from the threadpool.
+    """
+    texts = [seg["text"] for seg in segments]
+    tokens = embedding_token_counts(texts)
+    offsets = []
+    offset = 0
+    for text in texts:
+        offsets.append(offset)
+        offset += len(text) + 1
+
+    chunks = []
+    i = 0
+    while i < len(segments):
+        # A single segment longer than chunk_size becomes its own chunk
+        j, size = i + 1, tokens[i]
+        while j < len(segments) and size + tokens[j] <= chunk_size:
+            size += tokens[j]
+            j += 1
+
+        text = " ".join(texts[i:j])
+        last = segments[j - 1]
+        chunks.append(Document(
+            page_content=text,
+            metadata={
+                "source": title,
+                "chunk_index": len(chunks),
+                "video_id": video_id,
+                "start_time": round(segments[i]["start"], 2),
+                "end_time": round(last["start"] + last["duration"], 2),
+                "char_start": offsets[i],
+                "char_end": offsets[i] + len(text),
+                "token_count": llm_token_count(text),
+            },
+        ))
+        if j == len(segments):
+            break
+
+        k, carried = j, 0
+        while k - 1 > i and carried + tokens[k - 1] <= chunk_overlap:
+            k -= 1
+            carried += tokens[k]
+        i = k
+    return chunks
+
+
+class TranscriptService:
+    """
+    Transcript + title + chunk vectors of a video, shared by every session.
+
+    Entries live in the document store under `youtube:<video_id>`. Concurrent
+    requests for a video that is not stored yet wait on the same build, so a
+    video is fetched and embedded once no matter how many sessions load it.
+    The build runs as its own task and finishes even if its callers cancel.
+    """
+
+    def __init__(self, ttl_hours: float = TRANSCRIPT_CACHE_TTL_HOURS):
+        self.ttl = timedelta(hours=ttl_hours)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.joined = 0
+        self.fetches = 0
+        self.expired = 0
+
+    def _fresh(self, manifest: Dict[str, Any]) -> bool:
+        created = manifest.get("created_at")
+        if created is None:
+            return False
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - created < self.ttl
+
+    async def get(self, url: str, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+        """
+        Returns the stored entry {"manifest": ..., "chunks": [...]} for the video,
+        fetching, splitting and embedding it first when needed.
+        """
+        video_id = extract_video_id(url)
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+
+        key = document_store_key(transcript_content_hash(video_id), chunk_size, chunk_overlap)
+
+        build = self._inflight.get(key)
+        if build is not None:
+            self.joined += 1
+        else:
+            # Detached from this caller: a disconnecting client must not cancel
+            # the build other sessions are waiting on
+            build = asyncio.create_task(self._load_or_build(key, url, video_id, chunk_size, chunk_overlap))
+            self._inflight[key] = build
+            build.add_done_callback(lambda task: self._build_done(key, task))
+        return await asyncio.shield(build)
+
+    def _build_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Every caller may have gone away; mark the exception as retrieved
+            task.exception()
+
+    async def _load_or_build(self, key: str, url: str, video_id: str, chunk_size: int, chunk_overlap: int):
+        stored = await load_stored_document(key)
+        if stored is not None:
+            if self._fresh(stored["manifest"]):
+                self.hits += 1
+                logger.info("♻️ Reused stored transcript of %s", video_id)
+                return stored
+            self.expired += 1
+
+        self.fetches += 1
+        transcript = await fetch_transcript(url)
+        if not transcript.segments:
+            raise ValueError(f"Empty transcript for {url}")
+
+        chunks = await run_in_threadpool(
+            chunk_segments, transcript.segments, transcript.title, video_id, chunk_size, chunk_overlap
+        )
+        vectors = await embed_chunks(chunks)
+        metadatas = [c.metadata for c in chunks]
+
+        if not transcript.title_known:
+            # Served once; the next request retries the title instead of reusing this name
+            logger.warning("Title of video %s unavailable, not storing its transcript", video_id)
+        else:
+            try:
+                await save_stored_chunks(key, 0, [c.page_content for c in chunks], vectors, metadatas=metadatas)
+                await finalize_stored_document(
+                    key,
+                    content_hash=transcript_content_hash(video_id),
+                    source=transcript.title,
+                    chunk_count=len(chunks),
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                )
+            except Exception as e:
+                # This session still gets its chunks; the store is only an optimization
+                logger.error(f"🔴 Failed to update document store for video {video_id}: {e}")
+
+        return {
+            "manifest": {"source": transcript.title},
+            "chunks": [
+                {"ordinal": i, "text": c.page_content, "embedding": v, **metadatas[i]}
+                for i, (c, v) in enumerate(zip(chunks, vectors))
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "joined_inflight": self.joined,
+            "fetches": self.fetches,
+            "expired": self.expired,
+            "inflight": len(self._inflight),
+        }
+
+
+_transcript_service: Optional[TranscriptService] = None
+
+
+def get_transcript_service() -> TranscriptService:
+    global _transcript_service
+    if _transcript_service is None:
+        _transcript_service = TranscriptService()
+    return _transcript_service
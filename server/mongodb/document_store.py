@@ -0,0 +1,193 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReplaceOne
+from global_modules.embeddings import EMBEDDING_MODEL
+from global_modules.mongo_collections import (
+    document_store_collection,
+    document_store_chunks_collection,
+)
+from langchain_core.documents import Document
+from mongodb.insert_chunks import CHUNK_METADATA_FIELDS, insert_chunks
+
+logger = logging.getLogger(__name__)
+
+# Entries not reused for this long are deleted by the session GC (0 keeps them forever)
+DOCUMENT_STORE_TTL_DAYS = float(os.getenv("DOCUMENT_STORE_TTL_DAYS", "30"))
+
+
+def document_store_key(
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model: str = EMBEDDING_MODEL,
+) -> str:
+    """Identical content + chunking + model always maps to the same key."""
+    # Chunk sizes are in tokens; the unit keeps older character-sized entries from matching
+    raw = f"{content_hash}|{chunk_size}|{chunk_overlap}|tokens|{embedding_model}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def load_stored_document(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"manifest": ..., "chunks": [{"ordinal", "text", "embedding", <metadata>}, ...]}
+    or None when the key is unknown or only partially written.
+    """
+    manifest = await document_store_collection.find_one({"_id": key})
+    if not manifest:
+        return None
+
+    # A failed earlier attempt may have left extra ordinals behind
+    cursor = document_store_chunks_collection.find(
+        {"key": key, "ordinal": {"$lt": manifest.get("chunk_count", 0)}},
+        {"_id": 0, "ordinal": 1, "text": 1, "embedding": 1, **{f: 1 for f in CHUNK_METADATA_FIELDS}},
+    ).sort("ordinal", 1)
+    chunks = await cursor.to_list(length=None)
+
+    if len(chunks) != manifest.get("chunk_count"):
+        logger.warning("Document store entry %s is incomplete, ignoring it", key)
+        return None
+
+    await document_store_collection.update_one(
+        {"_id": key},
+        {"$set": {"last_used_at": datetime.now(timezone.utc)}},
+    )
+    return {"manifest": manifest, "chunks": chunks}
+
+
+async def save_stored_chunks(
+    key: str,
+    start_ordinal: int,
+    texts: List[str],
+    vectors: List[List[float]],
+    metadatas: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """
+    Writes one batch of chunks of a document that is still being ingested.
+    `metadatas` holds each chunk's page / offset / token count metadata.
+    """
+    if not texts:
+        return
+
+    metadatas = metadatas or [{} for _ in texts]
+    # Dates the chunks of ingests that never reach finalize_stored_document
+    now = datetime.now(timezone.utc)
+    ops = []
+    for offset, (text, vector, metadata) in enumerate(zip(texts, vectors, metadatas)):
+        ordinal = start_ordinal + offset
+        ops.append(ReplaceOne(
+            {"_id": f"{key}:{ordinal}"},
+            {
+                "_id": f"{key}:{ordinal}", "key": key, "ordinal": ordinal, "text": text, "embedding": vector,
+                **{f: metadata.get(f) for f in CHUNK_METADATA_FIELDS},
+                "written_at": now,
+            },
+            upsert=True,
+        ))
+    await document_store_chunks_collection.bulk_write(ops, ordered=False)
+
+
+async def finalize_stored_document(
+    key: str,
+    content_hash: str,
+    source: str,
+    chunk_count: int,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> None:
+    """Chunks are written first; the manifest marks the entry as complete."""
+    if not chunk_count:
+        return
+
+    now = datetime.now(timezone.utc)
+    await document_store_collection.replace_one(
+        {"_id": key},
+        {
+            "_id": key,
+            "content_hash": content_hash,
+            "source": source,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "embedding_model": EMBEDDING_MODEL,
+            "chunk_count": chunk_count,
+            "created_at": now,
+            "last_used_at": now,
+        },
+        upsert=True,
+    )
+    logger.info("🟢 Stored %d chunks for %s in document store", chunk_count, source)
+
+
+async def purge_unused_documents(
+    ttl_days: float = DOCUMENT_STORE_TTL_DAYS,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Deletes entries whose last_used_at is older than `ttl_days`, and the
+    chunks of ingests that failed before writing a manifest once they are as
+    old. Returns the entries and chunks deleted (or that would be).
+    """
+    if ttl_days <= 0:
+        return {"entries": 0, "chunks": 0}
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+    unused = {"last_used_at": {"$lt": cutoff}}
+    # Chunks saved before written_at existed count as old
+    old_chunks = {"$or": [{"written_at": {"$lt": cutoff}}, {"written_at": {"$exists": False}}]}
+
+    keys = [m["_id"] async for m in document_store_collection.find(unused, {"_id": 1})]
+    chunk_keys = await document_store_chunks_collection.distinct("key", old_chunks)
+    manifests = {
+        m["_id"] async for m in document_store_collection.find({"_id": {"$in": chunk_keys}}, {"_id": 1})
+    }
+    orphans = [k for k in chunk_keys if k not in manifests]
+
+    if dry_run:
+        chunks = await document_store_chunks_collection.count_documents(
+            {"key": {"$in": keys + orphans}, **old_chunks}
+        )
+        return {"entries": len(keys), "chunks": chunks}
+
+    # Same predicate again: an entry reused in between keeps its manifest
+    result = await document_store_collection.delete_many({"_id": {"$in": keys}, **unused})
+    kept = {m["_id"] async for m in document_store_collection.find({"_id": {"$in": keys}}, {"_id": 1})}
+    gone = [k for k in keys if k not in kept]
+    # Old chunks only, so a re-ingest of the same content writing right now is untouched
+    chunks = await document_store_chunks_collection.delete_many(
+        {"key": {"$in": gone + orphans}, **old_chunks}
+    )
+    return {"entries": result.deleted_count, "chunks": chunks.deleted_count}
+
+
+def stored_document_chunks(stored: Dict[str, Any], session_id: str, source: str):
+    """
+    (chunks, vectors) of a stored document as it will appear in the session.
+    Vectors are reused as-is when `source` matches the one they were embedded
+    with (the name is part of the embedded text); otherwise they are None and
+    only the OCR/split work is skipped.
+    """
+    chunks = [
+        Document(
+            page_content=c["text"],
+            metadata={
+                "session_id": session_id,
+                "source": source,
+                "chunk_index": c["ordinal"],
+                **{f: c.get(f) for f in CHUNK_METADATA_FIELDS},
+            },
+        )
+        for c in stored["chunks"]
+    ]
+    same_source = stored["manifest"].get("source") == source
+    vectors = [c["embedding"] for c in stored["chunks"]] if same_source else None
+    return chunks, vectors
+
+
+async def copy_stored_document(stored: Dict[str, Any], session_id: str, source: str) -> int:
+    """Copies a stored document into the session."""
+    chunks, vectors = stored_document_chunks(stored, session_id, source)
+    await insert_chunks(chunks, vectors=vectors)
+    return len(chunks)
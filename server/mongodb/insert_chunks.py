@@ -1,40 +1,157 @@
-from pymongo import ReplaceOne
+import asyncio
+import hashlib
 import logging
-from uuid import uuid4
-from global_modules.embeddings import embeddings
+from pymongo.errors import AutoReconnect, BulkWriteError, NetworkTimeout
+from global_modules.embedding_service import get_embedding_service
 from global_modules.mongo_collections import collection
+from mongodb.vector_codec import VECTOR_STORAGE_FORMAT, encode_vector
+from mongodb.session_index import LOCAL_VECTOR_INDEX_ENABLED, get_session_index_cache
 
 logger = logging.getLogger(__name__)
 
-async def insert_chunks(chunks):
-    if not chunks:
-        return
+DUPLICATE_KEY_ERROR = 11000
+WRITE_RETRIES = 3
+
+# Where a chunk sits in its source (for neighbor lookups and citations) and its LLM token count.
+# Transcript chunks carry their video and time range instead of pages.
+CHUNK_METADATA_FIELDS = (
+    "page", "page_end", "char_start", "char_end", "token_count",
+    "video_id", "start_time", "end_time",
+)
+
+
+def source_prefix(source_name):
+    return f"SOURCE: {source_name}\n\n"
+
+
+def chunk_id(session_id, source, ordinal, text):
+    """
+    Deterministic _id of a chunk: the same file re-ingested into the same session
+    produces the same ids, so the second write is a no-op instead of duplicates.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    raw = f"{session_id}\x00{source}\x00{ordinal}\x00{content_hash}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 
-    # 1. Prepend title to content for every chunk before embedding
+def _chunk_ids(chunks):
+    # `chunk_index` is the ordinal within the source; position is only a fallback
+    return [
+        chunk_id(
+            c.metadata.get("session_id"),
+            c.metadata.get("source"),
+            c.metadata.get("chunk_index", i),
+            c.page_content,
+        )
+        for i, c in enumerate(chunks)
+    ]
+
+
+def _processed_texts(chunks):
+    # Prepend title to content for every chunk before embedding
     processed_texts = []
     for c in chunks:
         source_name = c.metadata.get("source", "Unknown Source")
         # Every chunk gets its source prepended so the Vector 'knows' the file name
-        enhanced_text = f"SOURCE: {source_name}\n\n{c.page_content}"
+        enhanced_text = f"{source_prefix(source_name)}{c.page_content}"
         processed_texts.append(enhanced_text)
+    return processed_texts
+
+
+async def embed_chunks(chunks):
+    """Embeds one batch of chunks. Returns the vectors as float lists, in chunk order."""
+    if not chunks:
+        return []
+
+    # Batched on the embedding service's own thread, never on the event loop
+    return await get_embedding_service().aembed_documents(_processed_texts(chunks))
+
 
-    # 2. Batch Embedding (Embedding models are usually sync, but run fast)
-    vectors = embeddings.embed_documents(processed_texts) 
+async def _insert_ignoring_duplicates(docs):
+    """
+    insert_many(ordered=False) fast path. Duplicate-key errors mean the chunk is
+    already stored, so they are ignored; that also makes retries safe.
+    Returns the number of newly inserted documents.
+    """
+    for attempt in range(1, WRITE_RETRIES + 1):
+        try:
+            result = await collection.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            return e.details.get("nInserted", 0)
+        except (AutoReconnect, NetworkTimeout) as e:
+            if attempt == WRITE_RETRIES:
+                raise
+            logger.warning("🔴 Chunk write attempt %d failed (%s), retrying", attempt, e)
+            await asyncio.sleep(0.5 * attempt)
 
-    ops = []
+
+async def existing_chunk_ids(ids):
+    """Subset of `ids` already present in the collection."""
+    if not ids:
+        return set()
+    cursor = collection.find({"_id": {"$in": list(ids)}}, {"_id": 1})
+    return {doc["_id"] async for doc in cursor}
+
+
+async def write_chunks(chunks, vectors):
+    """Writes one batch of already-embedded chunks to MongoDB."""
+    if not chunks:
+        return
+
+    processed_texts = _processed_texts(chunks)
+    ids = _chunk_ids(chunks)
+
+    docs = []
     for i, (chunk, vector_of_text) in enumerate(zip(chunks, vectors)):     
         metadata = chunk.metadata 
         
-        doc = {
-            "_id": str(uuid4()),
+        docs.append({
+            "_id": ids[i],
             "session_id": metadata.get("session_id"),
             "source": metadata.get("source"),
+            "chunk_index": metadata.get("chunk_index", i),
+            **{f: metadata[f] for f in CHUNK_METADATA_FIELDS if metadata.get(f) is not None},
             "text": processed_texts[i], # Save text with the title
-            "embedding": vector_of_text.tolist() if hasattr(vector_of_text, "tolist") else vector_of_text
-        }
-        ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
-
-    if ops:
-        # 3. Async Bulk Write
-        await collection.bulk_write(ops, ordered=False)
-        logger.info("🟢 Bulk write completed successfully")
\ No newline at end of file
+            "embedding": encode_vector(vector_of_text),
+            "embedding_format": VECTOR_STORAGE_FORMAT,
+        })
+
+    if docs:
+        inserted = await _insert_ignoring_duplicates(docs)
+        logger.info(
+            "🟢 Wrote %d chunks (%d already stored)", inserted, len(docs) - inserted
+        )
+
+        # Keep loaded local indexes in step with what was just written
+        if LOCAL_VECTOR_INDEX_ENABLED:
+            by_session = {}
+            for doc in docs:
+                by_session.setdefault(doc["session_id"], []).append(doc)
+            for session_id, session_docs in by_session.items():
+                get_session_index_cache().add(session_id, session_docs)
+
+
+async def insert_chunks(chunks, vectors=None):
+    """
+    Embeds (unless `vectors` is given) and writes chunks to MongoDB.
+    Returns the vectors that were written, in order of the chunks written.
+    """
+    if not chunks:
+        return []
+
+    if vectors is None:
+        # Chunks already stored for this session need neither embedding nor writing
+        ids = _chunk_ids(chunks)
+        present = await existing_chunk_ids(ids)
+        chunks = [c for c, i in zip(chunks, ids) if i not in present]
+        if not chunks:
+            logger.info("🟢 All %d chunks already stored, nothing to write", len(ids))
+            return []
+        vectors = await embed_chunks(chunks)
+
+    await write_chunks(chunks, vectors)
+    return vectors
@@ -0,0 +1,97 @@
+"""
+Re-encodes the `embedding` field of existing chunks in rag_db.documents.
+
+    cd server
+    python -m mongodb.migrate_vector_format --to int8
+    python -m mongodb.migrate_vector_format --to float32 --batch-size 1000 --dry-run
+
+Documents written before VECTOR_STORAGE_FORMAT existed have no
+`embedding_format` field and are treated as float_list. Converting int8 back
+to a float format keeps the quantized values, it cannot restore precision.
+Set VECTOR_STORAGE_FORMAT to the same target before restarting the server,
+otherwise new chunks and queries will use a different representation.
+"""
+import os
+import time
+import argparse
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from mongodb.vector_codec import VECTOR_FORMATS, decode_vector, encode_vector, stored_format
+
+load_dotenv()
+
+
+def migrate(coll, target: str, batch_size: int, dry_run: bool) -> dict:
+    query = {"embedding_format": {"$ne": target}}
+    pending = coll.count_documents(query)
+    print(f"{pending} documents to convert to {target}")
+
+    converted = 0
+    skipped = 0
+    started = time.perf_counter()
+    last_id = None
+
+    while True:
+        # Page by _id so converted documents never shift the cursor
+        page_query = dict(query)
+        if last_id is not None:
+            page_query["_id"] = {"$gt": last_id}
+        batch = list(
+            coll.find(page_query, {"embedding": 1}).sort("_id", 1).limit(batch_size)
+        )
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            embedding = doc.get("embedding")
+            if embedding is None:
+                skipped += 1
+                continue
+            if stored_format(embedding) == target:
+                update = {"$set": {"embedding_format": target}}
+            else:
+                update = {"$set": {
+                    "embedding": encode_vector(decode_vector(embedding), target),
+                    "embedding_format": target,
+                }}
+            ops.append(UpdateOne({"_id": doc["_id"]}, update))
+
+        if ops and not dry_run:
+            coll.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        print(f"  {converted}/{pending} converted")
+
+    elapsed = time.perf_counter() - started
+    return {"converted": converted, "skipped": skipped, "seconds": round(elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored chunk embeddings to another format.")
+    parser.add_argument("--to", dest="target", choices=VECTOR_FORMATS, required=True)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Read and encode, but write nothing")
+    args = parser.parse_args()
+
+    uri = os.environ.get("MONGODB_URI_STRING")
+    if not uri:
+        print("ERROR: MONGODB_URI_STRING env var not set.")
+        raise SystemExit(1)
+
+    coll = MongoClient(uri)["rag_db"]["documents"]
+    before = coll.database.command("collStats", coll.name).get("size", 0)
+
+    result = migrate(coll, args.target, max(1, args.batch_size), args.dry_run)
+
+    after = coll.database.command("collStats", coll.name).get("size", 0)
+    print(f"Done: {result}")
+    print(f"Collection data size: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+    if not args.dry_run:
+        print("Remember to set VECTOR_STORAGE_FORMAT=" + args.target + " and let the Atlas index rebuild.")
+
+
+if __name__ == "__main__":
+    main()
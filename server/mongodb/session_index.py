@@ -0,0 +1,284 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from global_modules.mongo_collections import collection
+from mongodb.vector_codec import decode_vector
+
+try:
+    import hnswlib
+except Exception:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+LOCAL_VECTOR_INDEX_ENABLED = os.getenv("LOCAL_VECTOR_INDEX_ENABLED", "true").lower() == "true"
+# Vectors + chunk text of all cached sessions, evicted least recently used first
+LOCAL_VECTOR_INDEX_MEMORY_MB = float(os.getenv("LOCAL_VECTOR_INDEX_MEMORY_MB", "256"))
+# Sessions at least this large get an HNSW graph (when hnswlib is installed);
+# below it an exact dot product over all chunks is faster anyway
+LOCAL_VECTOR_INDEX_HNSW_MIN = int(os.getenv("LOCAL_VECTOR_INDEX_HNSW_MIN", "5000"))
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 100
+HNSW_EF_SEARCH = 64
+
+# Chunk fields a search hit does not carry
+NON_HIT_FIELDS = ("_id", "session_id", "embedding", "embedding_format")
+
+# Rough per-chunk overhead of the payload dict on top of its text
+PAYLOAD_OVERHEAD_BYTES = 400
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+@dataclass
+class SessionIndex:
+    """Unit-length vectors of one session's chunks plus what a hit returns."""
+
+    ids: List[Any] = field(default_factory=list)
+    payloads: List[Dict[str, Any]] = field(default_factory=list)
+    matrix: Optional[np.ndarray] = None
+    hnsw: Any = None
+    nbytes: int = 0
+
+    @classmethod
+    def build(cls, docs: List[Dict[str, Any]], hnsw_min: int) -> "SessionIndex":
+        index = cls()
+        index.add(docs, hnsw_min)
+        return index
+
+    def add(self, docs: List[Dict[str, Any]], hnsw_min: int) -> None:
+        known = set(self.ids)
+        docs = [d for d in docs if d["_id"] not in known and d.get("embedding") is not None]
+        if not docs:
+            return
+
+        vectors = _normalize(np.asarray([decode_vector(d["embedding"]) for d in docs], dtype=np.float32))
+        start = len(self.ids)
+        self.ids.extend(d["_id"] for d in docs)
+        self.payloads.extend(
+            {k: v for k, v in d.items() if k not in NON_HIT_FIELDS and v is not None} for d in docs
+        )
+
+        if self.hnsw is None and hnswlib is not None and len(self.ids) >= hnsw_min:
+            # Crossing the threshold: move everything into a graph
+            existing = self.matrix if self.matrix is not None else np.empty((0, vectors.shape[1]), np.float32)
+            vectors, start = np.vstack([existing, vectors]), 0
+            self.hnsw = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            self.hnsw.init_index(max_elements=max(len(self.ids) * 2, 1024), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            self.hnsw.set_ef(HNSW_EF_SEARCH)
+            self.matrix = None
+
+        if self.hnsw is not None:
+            if len(self.ids) > self.hnsw.get_max_elements():
+                self.hnsw.resize_index(len(self.ids) * 2)
+            self.hnsw.add_items(vectors, np.arange(start, start + len(vectors)))
+        else:
+            self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+
+        self.nbytes += vectors[-len(docs):].nbytes + sum(
+            len(p.get("text", "")) + PAYLOAD_OVERHEAD_BYTES for p in self.payloads[-len(docs):]
+        )
+
+    def search(self, query: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """Top `limit` hits, scored like Atlas cosine: (1 + cos) / 2."""
+        if not self.ids:
+            return []
+        limit = min(limit, len(self.ids))
+
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(query, k=limit)
+            ranked = zip(labels[0].tolist(), (1.0 - distances[0]).tolist())
+        else:
+            cosines = self.matrix @ query
+            top = np.argpartition(-cosines, limit - 1)[:limit]
+            top = top[np.argsort(-cosines[top])]
+            ranked = zip(top.tolist(), cosines[top].tolist())
+
+        return [{**self.payloads[i], "score": (1.0 + cos) / 2.0} for i, cos in ranked]
+
+
+class SessionIndexCache:
+    """
+    Per-session in-memory vector indexes, a hot cache in front of Atlas
+    $vectorSearch (and the only vector search when Atlas is unavailable).
+
+    A session's index is loaded from rag_db.documents on its first query,
+    extended by every chunk write of that session, and evicted least recently
+    used first once all indexes together exceed the memory budget.
+    """
+
+    def __init__(
+        self,
+        memory_mb: float = LOCAL_VECTOR_INDEX_MEMORY_MB,
+        hnsw_min: int = LOCAL_VECTOR_INDEX_HNSW_MIN,
+    ):
+        self.budget = int(memory_mb * 1024 * 1024)
+        self.hnsw_min = hnsw_min
+        self._indexes: "OrderedDict[str, SessionIndex]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Sessions written to while their index was being loaded
+        self._stale: set = set()
+        # Sessions whose index alone exceeds the budget; never loaded in the background
+        self._too_large: set = set()
+        self._background: set = set()
+
+        self.searches = 0
+        self.loads = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    # =================================================
+    # PUBLIC API
+    # =================================================
+
+    async def search(
+        self,
+        session_id: str,
+        query_vector: Sequence[float],
+        limit: int,
+        min_score: float = 0.0,
+        wait: bool = True,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Best `limit` chunks of the session with score >= `min_score`, best first.
+        With wait=False a session that is not loaded returns None right away and
+        is loaded in the background (unless it is too large to keep).
+        """
+        if wait:
+            index = await self._get(session_id)
+        else:
+            index = self._indexes.get(session_id)
+            if index is None:
+                if session_id not in self._loading and session_id not in self._too_large:
+                    self._start_background_load(session_id)
+                return None
+            self._indexes.move_to_end(session_id)
+        self.searches += 1
+        query = _normalize(np.asarray([query_vector], dtype=np.float32))[0]
+        return [hit for hit in index.search(query, limit) if hit["score"] >= min_score]
+
+    def add(self, session_id: str, docs: List[Dict[str, Any]]) -> None:
+        """Extends a loaded index with freshly written chunk documents."""
+        if session_id in self._loading:
+            self._stale.add(session_id)
+            return
+        index = self._indexes.get(session_id)
+        if index is None:
+            # Not loaded yet: the lazy load will read these from Mongo
+            return
+        index.add(docs, self.hnsw_min)
+        self._evict()
+
+    def evict(self, session_ids: Iterable[str]) -> None:
+        for session_id in session_ids:
+            if session_id in self._loading:
+                self._stale.add(session_id)
+            self._indexes.pop(session_id, None)
+            self._too_large.discard(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": LOCAL_VECTOR_INDEX_ENABLED,
+            "hnsw_available": hnswlib is not None,
+            "sessions": len(self._indexes),
+            "chunks": sum(len(i.ids) for i in self._indexes.values()),
+            "memory_bytes": self._memory(),
+            "memory_budget_bytes": self.budget,
+            "searches": self.searches,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "uncacheable_sessions": self.uncacheable,
+            "loading": len(self._loading),
+        }
+
+    # =================================================
+    # INTERNALS
+    # =================================================
+
+    def _memory(self) -> int:
+        return sum(i.nbytes for i in self._indexes.values())
+
+    def _evict(self):
+        while self._indexes and self._memory() > self.budget:
+            self._indexes.popitem(last=False)
+            self.evictions += 1
+
+    async def _get(self, session_id: str) -> SessionIndex:
+        index = self._indexes.get(session_id)
+        if index is not None:
+            self._indexes.move_to_end(session_id)
+            return index
+
+        pending = self._loading.get(session_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[session_id] = future
+        self._stale.discard(session_id)
+        try:
+            index = await self._load(session_id)
+            future.set_result(index)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._loading[session_id]
+
+        if session_id in self._stale:
+            # Chunks were written mid-load; serve this result, reload next time
+            self._stale.discard(session_id)
+        elif index.nbytes > self.budget:
+            self.uncacheable += 1
+            self._too_large.add(session_id)
+        else:
+            self._indexes[session_id] = index
+            self._evict()
+        return index
+
+    def _start_background_load(self, session_id: str):
+        async def load():
+            try:
+                await self._get(session_id)
+            except Exception as e:
+                logger.error(f"🔴 Could not load local vector index of session {session_id}: {e}")
+
+        task = asyncio.create_task(load())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _load(self, session_id: str) -> SessionIndex:
+        cursor = collection.find({"session_id": session_id}, {"session_id": 0, "embedding_format": 0})
+        docs = await cursor.to_list(length=None)
+        index = await run_in_threadpool(SessionIndex.build, docs, self.hnsw_min)
+        self.loads += 1
+        logger.info(
+            "🟢 Loaded local vector index of session %s (%d chunks, %s)",
+            session_id, len(index.ids), "hnsw" if index.hnsw is not None else "exact",
+        )
+        return index
+
+
+_session_index_cache: Optional[SessionIndexCache] = None
+
+
+def get_session_index_cache() -> SessionIndexCache:
+    global _session_index_cache
+    if _session_index_cache is None:
+        _session_index_cache = SessionIndexCache()
+    return _session_index_cache
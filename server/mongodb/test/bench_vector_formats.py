@@ -0,0 +1,111 @@
+# Compares embedding storage formats: bytes per chunk, encode throughput and
+# recall@k of int8 / float32 against exact float search.
+#
+#   cd server
+#   python -m mongodb.test.bench_vector_formats --chunks 20000 --queries 200
+#   python -m mongodb.test.bench_vector_formats --mongo   # also measures real collection size / insert rate
+import os
+import time
+import argparse
+
+import bson
+import numpy as np
+from dotenv import load_dotenv
+
+from mongodb.vector_codec import VECTOR_FORMATS, decode_vector, encode_vector
+
+load_dotenv()
+
+DIM = 384
+
+
+def unit_vectors(n, dim, rng):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def cosine_top_k(matrix, queries, k):
+    m = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.argsort(-(queries @ m.T), axis=1)[:, :k]
+
+
+def sample_doc(i, embedding, fmt):
+    return {
+        "_id": f"bench-{i}",
+        "session_id": "bench-session",
+        "source": "bench.pdf",
+        "text": "x" * 1000,
+        "embedding": embedding,
+        "embedding_format": fmt,
+    }
+
+
+def bench_format(fmt, corpus, queries, exact, k):
+    started = time.perf_counter()
+    encoded = [encode_vector(v, fmt) for v in corpus]
+    encode_secs = time.perf_counter() - started
+
+    vector_bytes = len(bson.encode({"embedding": encoded[0]}))
+    doc_bytes = len(bson.encode(sample_doc(0, encoded[0], fmt)))
+
+    decoded = np.array([decode_vector(e) for e in encoded], dtype=np.float32)
+    approx = cosine_top_k(decoded, queries, k)
+    recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+
+    return encoded, {
+        "format": fmt,
+        "vector_bytes": vector_bytes,
+        "doc_bytes": doc_bytes,
+        "encode_per_sec": round(len(corpus) / encode_secs),
+        f"recall@{k}": round(float(recall), 4),
+    }
+
+
+def bench_mongo(fmt, encoded):
+    from pymongo import MongoClient
+
+    uri = os.environ.get("MONGODB_URI_STRING")
+    if not uri:
+        print("ERROR: MONGODB_URI_STRING env var not set.")
+        raise SystemExit(1)
+
+    coll = MongoClient(uri)["rag_db"][f"bench_vectors_{fmt}"]
+    coll.drop()
+    docs = [sample_doc(i, e, fmt) for i, e in enumerate(encoded)]
+    started = time.perf_counter()
+    for i in range(0, len(docs), 500):
+        coll.insert_many(docs[i:i + 500], ordered=False)
+    insert_secs = time.perf_counter() - started
+    stats = coll.database.command("collStats", coll.name)
+    coll.drop()
+    return {
+        "insert_per_sec": round(len(docs) / insert_secs),
+        "collection_mb": round(stats.get("size", 0) / 1e6, 2),
+        "storage_mb": round(stats.get("storageSize", 0) / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--mongo", action="store_true", help="Insert into scratch collections too")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    corpus = unit_vectors(args.chunks, DIM, rng)
+    # Queries near existing chunks, like real questions about the document
+    queries = corpus[rng.integers(0, args.chunks, args.queries)] + 0.5 * unit_vectors(args.queries, DIM, rng)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = cosine_top_k(corpus, queries, args.k)
+
+    for fmt in VECTOR_FORMATS:
+        encoded, row = bench_format(fmt, corpus, queries, exact, args.k)
+        if args.mongo:
+            row.update(bench_mongo(fmt, encoded))
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+from typing import Any, List, Sequence
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+# How chunk embeddings are stored in rag_db.documents:
+#   float_list - BSON array of doubles (legacy, 8 bytes/dim + per-element overhead)
+#   float32    - packed float32 BinData vector (subtype 9), 4 bytes/dim
+#   int8       - scalar-quantized int8 BinData vector, 1 byte/dim
+# int8 vectors are scaled per vector, so the Atlas index must use cosine similarity.
+VECTOR_FORMATS = ("float_list", "float32", "int8")
+VECTOR_STORAGE_FORMAT = os.getenv("VECTOR_STORAGE_FORMAT", "float_list")
+
+if VECTOR_STORAGE_FORMAT not in VECTOR_FORMATS:
+    raise ValueError(f"VECTOR_STORAGE_FORMAT must be one of {VECTOR_FORMATS}")
+
+INT8_MAX = 127
+
+
+def quantize_int8(vector: Sequence[float]) -> List[int]:
+    """Maps the largest component to +/-127. Cosine similarity is scale invariant."""
+    arr = np.asarray(vector, dtype=np.float32)
+    peak = float(np.max(np.abs(arr))) if arr.size else 0.0
+    if peak == 0.0:
+        return [0] * arr.size
+    quantized = np.clip(np.rint(arr * (INT8_MAX / peak)), -INT8_MAX, INT8_MAX)
+    return quantized.astype(np.int8).tolist()
+
+
+def encode_vector(vector: Sequence[float], fmt: str = VECTOR_STORAGE_FORMAT) -> Any:
+    """Converts a float vector into the value stored in the `embedding` field."""
+    if fmt == "float32":
+        return Binary.from_vector(np.asarray(vector, dtype=np.float32).tolist(), BinaryVectorDtype.FLOAT32)
+    if fmt == "int8":
+        return Binary.from_vector(quantize_int8(vector), BinaryVectorDtype.INT8)
+    return [float(x) for x in vector]
+
+
+def encode_query_vector(vector: Sequence[float], fmt: str = VECTOR_STORAGE_FORMAT) -> Any:
+    """$vectorSearch expects the query in the same representation as the indexed field."""
+    return encode_vector(vector, fmt)
+
+
+def decode_vector(value: Any) -> List[float]:
+    """Any stored representation back to a float list (int8 keeps its own scale)."""
+    if isinstance(value, Binary):
+        return [float(x) for x in value.as_vector().data]
+    return [float(x) for x in value]
+
+
+def stored_format(value: Any) -> str:
+    if isinstance(value, Binary):
+        return "int8" if value.as_vector().dtype == BinaryVectorDtype.INT8 else "float32"
+    return "float_list"
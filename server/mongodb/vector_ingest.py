@@ -1,56 +1,199 @@
-from typing import List, Optional, Dict, Any
+import os
+import asyncio
+from typing import List, Optional, Dict, Any, Awaitable, Callable
+from pathlib import Path
 from dotenv import load_dotenv
 import logging
-from mongodb.insert_chunks import insert_chunks
-from modules.pdf_handlers import delete_local_files, delete_session_directory
-from modules.load_and_split_with_ocr import load_and_split_with_ocr
+from fastapi.concurrency import run_in_threadpool
+from mongodb.insert_chunks import embed_chunks, write_chunks
+from mongodb.document_store import (
+    document_store_key,
+    load_stored_document,
+    save_stored_chunks,
+    finalize_stored_document,
+    copy_stored_document,
+)
+from modules.pdf_handlers import delete_local_files, delete_session_directory_if_empty, sha256_file
+from modules.load_and_split_with_ocr import (
+    ExtractionReport,
+    OCRRunStats,
+    ProgressTracker,
+    count_pdf_pages,
+    stream_pdf_chunks,
+)
+from modules.stream_pipeline import bounded, batched
+from modules.text_splitting import CHUNK_OVERLAP_TOKENS, CHUNK_SIZE_TOKENS
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Chunks embedded and written together
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# Batches buffered between two pipeline stages (bounds memory per file)
+PIPELINE_DEPTH = 2
+
+
+async def _embed_batches(batches):
+    async for batch in batches:
+        yield batch, await embed_chunks(batch)
+
+
+async def _ingest_pdf_stream(
+    path: str,
+    session_id: str,
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    on_pages_done: Optional[Callable[[int], Awaitable[None]]],
+    ocr_stats: Optional[OCRRunStats] = None,
+) -> int:
+    """
+    extract -> chunk -> embed -> write for one PDF, as bounded overlapping stages.
+    Each batch reaches Mongo (and the document store) as soon as it is embedded.
+    The store entry is only finalized when every page was extracted.
+    """
+    source = Path(path).name
+    key = document_store_key(content_hash, chunk_size, chunk_overlap)
+    report = ExtractionReport()
+
+    chunks = stream_pdf_chunks(
+        path, session_id, on_pages_done, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+        content_hash=content_hash, ocr_stats=ocr_stats, report=report,
+    )
+    batches = bounded(batched(chunks, INGEST_BATCH_SIZE), PIPELINE_DEPTH)
+    embedded = bounded(_embed_batches(batches), PIPELINE_DEPTH)
+
+    written = 0
+    store_ok = True
+    async for batch, vectors in embedded:
+        await write_chunks(batch, vectors)
+
+        if store_ok:
+            try:
+                await save_stored_chunks(
+                    key, written, [c.page_content for c in batch], vectors,
+                    metadatas=[c.metadata for c in batch],
+                )
+            except Exception as e:
+                # The session still gets its chunks; the store is only an optimization
+                logger.error(f"🔴 Failed to update document store for {source}: {e}")
+                store_ok = False
+
+        written += len(batch)
+
+    if not report.complete:
+        # Unfinalized entries are ignored, so the next upload extracts (and OCRs) again
+        logger.warning(
+            "🔴 %s extracted incompletely (OCR failed on %d pages%s); not stored for reuse",
+            source, len(report.failed_pages), ", read aborted" if report.aborted else "",
+        )
+
+    # Remember the results for the next upload of the same content
+    elif store_ok and written:
+        try:
+            await finalize_stored_document(
+                key,
+                content_hash=content_hash,
+                source=source,
+                chunk_count=written,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+            )
+        except Exception as e:
+            logger.error(f"🔴 Failed to update document store for {source}: {e}")
+
+    logger.info("🟢 Streamed %d chunks of %s into MongoDB", written, source)
+    return written
+
+
 async def ingest_files_to_mongo(
     file_paths: List[str],
     session_id: str,
     user_id: Optional[str] = None,
     keep_local: bool = False,
+    file_hashes: Optional[Dict[str, str]] = None,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+    progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
 ) -> Dict[str, Any]:
     """
     Ingest multiple files into MongoDB Atlas Vector Search.
-    Fix: Directly await insert_chunks instead of using run_in_threadpool.
+
+    `file_hashes` maps path -> sha256 (as computed while saving the upload).
+    Files already present in the document store are copied instead of re-processed.
+    `progress_callback` receives ProgressTracker snapshots while pages are extracted.
+    Unless `keep_local`, the files are deleted afterwards, whether ingestion succeeded or not.
     """
     if not file_paths:
         return {"status": "no_files", "files": []}
 
-    # 1) Load and split into chunks
-    logger.info("Loading and splitting %d files...", len(file_paths))
-    chunks = await load_and_split_with_ocr(file_paths, session_id=session_id)
+    try:
+        hashes = dict(file_hashes or {})
+        for p in file_paths:
+            if p not in hashes:
+                hashes[p] = await run_in_threadpool(sha256_file, p)
 
-    if not chunks:
-        logger.warning("No chunks generated from files.")
-        return {"status": "no_chunks", "chunks_inserted": 0}
+        # 1) Content-addressed dedupe
+        fresh_paths: List[str] = []
+        reused_chunks = 0
+        for p in file_paths:
+            key = document_store_key(hashes[p], chunk_size, chunk_overlap)
+            stored = await load_stored_document(key)
+            if stored is None:
+                fresh_paths.append(p)
+                continue
+            reused_chunks += await copy_stored_document(stored, session_id, Path(p).name)
+            logger.info("♻️ Reused stored chunks for %s", Path(p).name)
+
+        # 2) Stream the new files through the extract -> chunk -> embed -> write pipeline
+        new_chunks = 0
+        ocr_stats = OCRRunStats()
+        if fresh_paths:
+            logger.info("Streaming %d files into MongoDB...", len(fresh_paths))
+            tracker = ProgressTracker(await count_pdf_pages(fresh_paths))
+            ocr_stats = tracker.ocr
+
+            async def report_progress(pages: int = 1):
+                message = tracker.update(pages)
+                if progress_callback:
+                    await progress_callback({**tracker.snapshot(), "message": message})
+
+            counts = await asyncio.gather(*(
+                _ingest_pdf_stream(
+                    p, session_id, hashes[p], chunk_size, chunk_overlap, report_progress, ocr_stats
+                )
+                for p in fresh_paths
+            ))
+            new_chunks = sum(counts)
+
+            logger.info(
+                "🟢 Extracted %d/%d pages at %.2f pages/sec (OCR cache hits: %d/%d, OCR skipped: %d)",
+                tracker.current, tracker.total, tracker.pages_per_sec,
+                ocr_stats.ocr_cache_hits, ocr_stats.ocr_pages, ocr_stats.ocr_skipped,
+            )
+
+        if not new_chunks and not reused_chunks:
+            logger.warning("No chunks generated from files.")
+            return {"status": "no_chunks", "chunks_inserted": 0}
 
-    # 2) Insert chunks into MongoDB
-    try:
-        logger.info("Calling async insert_chunks function for %d chunks", len(chunks))
-        
-        # FIX: await the async function directly. Do NOT use run_in_threadpool for Motor.
-        await insert_chunks(chunks) 
-        
-        logger.info("insert_chunks function completed successfully")
-
-        # 3) Cleanup local files
-        if not keep_local:
-            # We await these as they are defined as async in your pdf_handlers
-            await delete_local_files(file_paths)
-            await delete_session_directory(session_id)
-            logger.info("🟢🗑️ Deleted local files and session directory after ingestion.")
-        
         return {
             "status": "ingest_complete",
-            "chunk_count": len(chunks),
+            "chunk_count": new_chunks + reused_chunks,
+            "reused_chunk_count": reused_chunks,
+            "ocr_pages": ocr_stats.ocr_pages,
+            "ocr_cache_hits": ocr_stats.ocr_cache_hits,
+            "ocr_skipped": ocr_stats.ocr_skipped,
             "session_id": session_id
         }
 
     except Exception as e:
         logger.exception("🔴 Ingestion failed: %s", e)
-        return {"status": "ingest_failed", "error": str(e)}
\ No newline at end of file
+        return {"status": "ingest_failed", "error": str(e)}
+
+    finally:
+        # 3) Cleanup local files; nothing retries from them, so failed uploads go too
+        if not keep_local:
+            await delete_local_files(file_paths)
+            # Other uploads for this session may still be queued, so only drop an empty folder
+            await delete_session_directory_if_empty(session_id)
+            logger.info("🟢🗑️ Deleted local files and session directory after ingestion.")
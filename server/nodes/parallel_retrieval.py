@@ -0,0 +1,449 @@
+import os
+import re
+import asyncio
+import logging
+from typing import Any, Dict, List, Union
+
+from langchain_core.messages import HumanMessage
+from langgraph.types import Send
+
+from state.state import State
+
+from nodes.vector_search_node import (
+    vector_search_node,
+)
+
+from nodes.tavily_search_node import (
+    internet_search_node,
+)
+
+from nodes.web_scraper_node import (
+    web_scraper_node,
+)
+
+logger = logging.getLogger(__name__)
+
+# true: the planner picks a set of tools per round and they run concurrently
+PARALLEL_RETRIEVAL = os.getenv("PARALLEL_RETRIEVAL", "false").lower() == "true"
+
+# A branch still running after this is dropped; the others are not held up
+RETRIEVAL_TOOL_TIMEOUT_SEC = float(os.getenv("RETRIEVAL_TOOL_TIMEOUT_SEC", "8"))
+
+MAX_PLANNER_ROUNDS = 4
+
+RETRIEVAL_NODES = {
+    "vector_search": vector_search_node,
+    "internet_search": internet_search_node,
+    "web_scraper": web_scraper_node,
+}
+
+# Bookkeeping lists a tool node appends to; branches hand them back as a report
+REPORT_KEYS = (
+    "used_tools",
+    "tool_outputs",
+    "agent_scratchpad",
+    "sources_used",
+)
+
+
+# =====================================================
+# PLANNER
+# =====================================================
+
+async def retrieval_planner_node(
+    state: State,
+    tool_llm_factory,
+):
+    """
+    Retrieval planning node of the parallel mode.
+
+    Responsibilities:
+    - pick EVERY retrieval tool worth running this round in one decision
+    - skip tools already used
+    - route to the fan-out, or to fallback
+    """
+
+    try:
+
+        # =================================================
+        # LOOP PROTECTION
+        # =================================================
+
+        state["tool_steps"] = (
+            state.get("tool_steps", 0) + 1
+        )
+
+        if state["tool_steps"] > MAX_PLANNER_ROUNDS:
+
+            logger.warning(
+                "Tool loop limit exceeded."
+            )
+
+            state["route"] = "fallback"
+
+            return state
+
+        # =================================================
+        # QUERY
+        # =================================================
+
+        last_human = next(
+            m for m in reversed(state["messages"])
+            if isinstance(m, HumanMessage)
+        )
+
+        query = last_human.content
+
+        used_tools = state.get(
+            "used_tools",
+            [],
+        )
+
+        scratchpad = "\n".join(
+            state.get(
+                "agent_scratchpad",
+                [],
+            )
+        )
+
+        url_match = re.search(
+            r"https?://\S+",
+            query,
+        )
+
+        # =================================================
+        # PLANNER PROMPT
+        # =================================================
+
+        llm = tool_llm_factory()
+
+        response = await llm.ainvoke([
+            {
+                "role": "system",
+                "content": f"""
+                            You are a retrieval planner.
+
+                            Your job is to pick ALL retrieval tools that should run
+                            NOW. The selected tools run at the same time.
+
+                            AVAILABLE RETRIEVAL NODES:
+                            - vector_search
+                            - internet_search
+                            - web_scraper
+                            - fallback
+
+                            TOOLS DESCRIPTION:
+
+                            vector_search:
+                            - uploaded PDFs
+                            - private docs
+                            - transcripts
+                            - user-uploaded knowledge
+
+                            internet_search:
+                            - latest/current information
+                            - external verification
+                            - public web search
+
+                            web_scraper:
+                            - reading a specific URL/webpage
+
+                            fallback:
+                            - retrieval unnecessary
+                            - cannot retrieve anything useful
+
+                            ALREADY USED TOOLS:
+                            {used_tools}
+
+                            SCRATCHPAD:
+                            {scratchpad}
+
+                            IMPORTANT RULES:
+                            1. Do NOT select a tool that was already used.
+                            2. Include vector_search for uploaded/private knowledge.
+                            3. Add internet_search when the answer may need current
+                               or external information.
+                            4. Add web_scraper ONLY if a URL is explicitly present.
+                            5. Return fallback alone if retrieval is unnecessary.
+                            6. Return ONLY the tool names, comma separated.
+
+                            EXAMPLES:
+                            vector_search
+                            vector_search, internet_search
+                            web_scraper, vector_search
+                            fallback
+                            """
+            },
+            {
+                "role": "user",
+                "content": query,
+            },
+        ])
+
+        # =================================================
+        # CLEAN RESPONSE
+        # =================================================
+
+        decision = response.content.strip().lower()
+
+        decision = re.sub(
+            r"<think>.*?</think>",
+            "",
+            decision,
+            flags=re.DOTALL,
+        ).strip()
+
+        # =================================================
+        # NORMALIZATION
+        # =================================================
+
+        planned = [
+            tool for tool in RETRIEVAL_NODES
+            if tool in decision
+        ]
+
+        if "web_scraper" in planned:
+
+            if url_match:
+
+                state["next_tool_hint"] = (
+                    url_match.group(0)
+                )
+
+            else:
+
+                logger.warning(
+                    "Planner selected "
+                    "web_scraper but "
+                    "no URL found."
+                )
+
+                planned.remove("web_scraper")
+
+                if "internet_search" not in planned:
+                    planned.append("internet_search")
+
+        # =================================================
+        # PREVENT SAME TOOL LOOPS
+        # =================================================
+
+        repeated = [
+            tool for tool in planned
+            if tool in used_tools
+        ]
+
+        if repeated:
+
+            logger.warning(
+                f"Planner attempted "
+                f"repeated tools: "
+                f"{repeated}"
+            )
+
+            planned = [
+                tool for tool in planned
+                if tool not in used_tools
+            ]
+
+            if not planned:
+
+                # Same fallback order as the serial planner
+                planned = [
+                    tool for tool in RETRIEVAL_NODES
+                    if tool not in used_tools
+                    and (tool != "web_scraper" or url_match)
+                ][:1]
+
+        # =================================================
+        # SAVE ROUTE
+        # =================================================
+
+        state["planned_tools"] = planned
+
+        if planned:
+
+            state["route"] = "retrieve"
+
+        elif state.get("retrieved_chunks"):
+
+            # Nothing left to run: answer from the evidence already
+            # gathered, as the serial evaluator does
+            state["retrieval_complete"] = True
+
+            state["route"] = "rag"
+
+        else:
+
+            state["route"] = "fallback"
+
+        logger.info(
+            f"Planner selected tools: "
+            f"{planned or state['route']}"
+        )
+
+        return state
+
+    except Exception as e:
+
+        logger.error(
+            f"Tool planner error: {str(e)}",
+            exc_info=True,
+        )
+
+        state["route"] = "fallback"
+
+        return state
+
+
+# =====================================================
+# FAN-OUT
+# =====================================================
+
+def fan_out_retrieval(
+    state: State,
+) -> Union[str, List[Send]]:
+    """Conditional edge of the planner: one `retrieve` branch per planned tool."""
+
+    route = state.get(
+        "route",
+        "fallback",
+    )
+
+    if route == "retrieve":
+
+        return [
+            Send(
+                "retrieve",
+                {
+                    "tool": tool,
+                    "query": state["query"],
+                    "next_tool_hint": state.get(
+                        "next_tool_hint",
+                        "",
+                    ),
+                },
+            )
+            for tool in state.get(
+                "planned_tools",
+                [],
+            )
+        ]
+
+    if route == "rag":
+        return "rag_chatbot"
+
+    return "simple_chat"
+
+
+async def retrieval_branch_node(
+    task: Dict[str, Any],
+    config,
+):
+    """
+    Runs one retrieval tool node on a private state.
+
+    Returns only what the tool produced: its chunks (merged by the
+    retrieved_chunks reducer) and one report for merge_retrieval.
+    """
+
+    tool = task["tool"]
+
+    branch = {
+        "query": task["query"],
+        "next_tool_hint": task.get(
+            "next_tool_hint",
+            "",
+        ),
+        "retrieved_chunks": [],
+        **{key: [] for key in REPORT_KEYS},
+    }
+
+    try:
+
+        branch = await asyncio.wait_for(
+            RETRIEVAL_NODES[tool](
+                branch,
+                config,
+            ),
+            timeout=RETRIEVAL_TOOL_TIMEOUT_SEC,
+        )
+
+    except asyncio.TimeoutError:
+
+        logger.warning(
+            f"⏱️ {tool} timed out after "
+            f"{RETRIEVAL_TOOL_TIMEOUT_SEC}s"
+        )
+
+        branch["retrieved_chunks"] = []
+
+        if tool not in branch["used_tools"]:
+            branch["used_tools"].append(tool)
+
+        branch["tool_outputs"].append({
+            "tool": tool,
+            "success": False,
+            "summary": (
+                f"{tool} timed out."
+            ),
+        })
+
+        branch["agent_scratchpad"].append(
+            f"{tool} was too slow and "
+            "returned nothing."
+        )
+
+    return {
+        "retrieved_chunks": branch["retrieved_chunks"],
+        "tool_reports": [{
+            "tool": tool,
+            **{key: branch[key] for key in REPORT_KEYS},
+        }],
+    }
+
+
+# =====================================================
+# FAN-IN
+# =====================================================
+
+async def merge_retrieval_node(
+    state: State,
+):
+    """
+    Folds the reports of all branches into the shared bookkeeping lists,
+    in planner order, before the single rerank of this round.
+    """
+
+    reports = state.get(
+        "tool_reports",
+        [],
+    )
+
+    order = state.get(
+        "planned_tools",
+        [],
+    )
+
+    reports = sorted(
+        reports,
+        key=lambda r: (
+            order.index(r["tool"])
+            if r["tool"] in order
+            else len(order)
+        ),
+    )
+
+    update = {
+        key: list(state.get(key, []))
+        for key in REPORT_KEYS
+    }
+
+    for report in reports:
+
+        for key in REPORT_KEYS:
+            update[key].extend(report[key])
+
+    # Consumed: the next round starts with no reports
+    update["tool_reports"] = None
+
+    return update
@@ -21,10 +21,12 @@ async def prune_state_node(
     state["tool_steps"] = 0
     state["retrieval_complete"] = False
     state["next_tool_hint"] = ""
+    state["planned_tools"] = []
     # -----------------------------------------
     # Retrieval memory
     # -----------------------------------------
-    state["retrieved_chunks"] = []
+    # None: the reducer of retrieved_chunks resets instead of merging
+    state["retrieved_chunks"] = None
     state["reranked_chunks"] = []
     state["selected_chunks"] = []
     # -----------------------------------------
@@ -34,4 +36,5 @@ async def prune_state_node(
     state["agent_scratchpad"] = []
     state["tool_outputs"] = []
     state["sources_used"] = []
+    state["tool_reports"] = None
     return state
\ No newline at end of file
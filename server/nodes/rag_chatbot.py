@@ -7,6 +7,15 @@ from langchain_core.messages import (
 
 from state.state import State
 from modules.llm import get_chatbot_prompt
+from global_modules.token_counter import (
+    llm_token_count,
+    truncate_to_tokens,
+)
+from modules.text_splitting import CHUNK_SIZE_TOKENS
+from tools.vector_search import (
+    VECTOR_SEARCH_LIMIT,
+    VECTOR_SEARCH_NEIGHBORS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +24,10 @@ logger = logging.getLogger(__name__)
 # CONTEXT LIMITS
 # =====================================================
 
-MAX_CHUNKS = 3
+MAX_CHUNKS = 8
 
-MAX_TOTAL_CONTEXT = 3000
+# Below this, a truncated tail is not worth including
+MIN_CHUNK_TOKENS = 50
 
 MAX_MESSAGE_HISTORY = 4
 
@@ -25,13 +35,134 @@ MAX_MESSAGE_SIZE = 500
 
 MAX_OUTPUT_TOKENS = 2000
 
-SOURCE_LIMITS = {
-    "vector_db": 1000,
-    "internet": 700,
-    "webpage": 800,
-    "unknown": 500,
+# Room for every vector hit with its neighbors: up to (2N + 1) chunks per hit
+VECTOR_CONTEXT_TOKENS = (
+    VECTOR_SEARCH_LIMIT
+    * (2 * VECTOR_SEARCH_NEIGHBORS + 1)
+    * CHUNK_SIZE_TOKENS
+)
+
+# Total tokens per source type, shared by all chunks of that type
+SOURCE_TOKEN_LIMITS = {
+    "vector_db": VECTOR_CONTEXT_TOKENS,
+    "internet": 250,
+    "webpage": 300,
+    "unknown": 150,
 }
 
+# Budgets are in LLM tokens; chunks carry precomputed token counts
+MAX_CONTEXT_TOKENS = sum(SOURCE_TOKEN_LIMITS.values())
+
+
+def build_rag_context(
+    selected_chunks,
+):
+    """
+    Formats the reranked chunks as numbered SOURCE blocks, best first,
+    within the per-source and global token budgets.
+
+    Returns the blocks and the number of tokens they use.
+    """
+
+    rag_context = []
+
+    current_context_tokens = 0
+
+    source_tokens = {}
+
+    for chunk in selected_chunks:
+
+        source_type = chunk.get(
+            "source_type",
+            "unknown",
+        )
+
+        source_name = chunk.get(
+            "source_name",
+            "unknown",
+        )
+
+        location = chunk.get(
+            "location",
+        )
+
+        text = chunk.get(
+            "content",
+            "",
+        )
+
+        # Records arrive with their token count; count legacy ones here
+        tokens = chunk.get(
+            "token_count",
+        ) or llm_token_count(text)
+
+        # ---------------------------------------------
+        # SOURCE LIMITS
+        # ---------------------------------------------
+
+        token_limit = SOURCE_TOKEN_LIMITS.get(
+            source_type,
+            SOURCE_TOKEN_LIMITS["unknown"],
+        ) - source_tokens.get(source_type, 0)
+
+        # ---------------------------------------------
+        # GLOBAL CONTEXT BUDGET
+        # ---------------------------------------------
+
+        token_limit = min(
+            token_limit,
+            MAX_CONTEXT_TOKENS - current_context_tokens,
+        )
+
+        if tokens > token_limit and chunk.get("match_content"):
+
+            # Drop the neighbors before cutting into the matched text
+            text = chunk["match_content"]
+
+            tokens = chunk.get(
+                "match_token_count",
+            ) or llm_token_count(text)
+
+        if tokens > token_limit:
+
+            # A smaller, lower-ranked chunk may still fit
+            if token_limit < MIN_CHUNK_TOKENS:
+                continue
+
+            # Cut on a sentence boundary, not mid-word
+            text = truncate_to_tokens(
+                text,
+                token_limit,
+                token_count=tokens,
+            )
+
+            tokens = llm_token_count(text)
+
+        current_context_tokens += tokens
+
+        source_tokens[source_type] = (
+            source_tokens.get(source_type, 0) + tokens
+        )
+
+        location_line = (
+            f"LOCATION: {location}\n"
+            if location
+            else ""
+        )
+
+        rag_context.append(
+            f"""
+SOURCE {len(rag_context) + 1}
+TYPE: {source_type}
+NAME: {source_name}
+{location_line}
+CONTENT:
+{text}
+"""
+        )
+
+    return rag_context, current_context_tokens
+
 
 async def rag_chatbot_node(
     state: State,
@@ -119,64 +250,10 @@ async def rag_chatbot_node(
         # BUILD COMPRESSED RAG CONTEXT
         # =================================================
 
-        rag_context = []
-
-        current_context_size = 0
-
-        for idx, chunk in enumerate(
-            selected_chunks
-        ):
-
-            source_type = chunk.get(
-                "source_type",
-                "unknown",
-            )
-
-            source_name = chunk.get(
-                "source_name",
-                "unknown",
-            )
-
-            text = chunk.get(
-                "content",
-                "",
-            )
-
-            # ---------------------------------------------
-            # SOURCE LIMITS
-            # ---------------------------------------------
-
-            char_limit = SOURCE_LIMITS.get(
-                source_type,
-                SOURCE_LIMITS["unknown"],
-            )
-
-            text = text[:char_limit]
-
-            # ---------------------------------------------
-            # GLOBAL CONTEXT BUDGET
-            # ---------------------------------------------
-
-            if (
-                current_context_size + len(text)
-                > MAX_TOTAL_CONTEXT
-            ):
-                break
-
-            current_context_size += len(
-                text
-            )
-
-            rag_context.append(
-                f"""
-SOURCE {idx + 1}
-TYPE: {source_type}
-NAME: {source_name}
+        rag_context, current_context_tokens = build_rag_context(
+            selected_chunks,
+        )
 
-CONTENT:
-{text}
-"""
-            )
 
         final_context = "\n\n".join(
             rag_context
@@ -264,6 +341,10 @@ Answer the user's question using the retrieved evidence.
             f"Total prompt chars: {total_chars}"
         )
 
+        logger.info(
+            f"Context tokens: {current_context_tokens}"
+        )
+
         # =================================================
         # GENERATE RESPONSE
         # =================================================
@@ -1,13 +1,13 @@
 from state.state import State
-import asyncio
-from global_modules.reranker import (
-    get_reranker,
+from global_modules.reranker_service import (
+    get_reranker_service,
 )
 
+# Chunks handed to synthesis; the chatbot packs them by token budget
+RERANK_TOP_K = 8
 
-async def reranker_node(state: State):
 
-    reranker = get_reranker()
+async def reranker_node(state: State):
 
     query = state["query"]
 
@@ -22,15 +22,27 @@ async def reranker_node(state: State):
 
         return state
 
+    # The same passage can come back from repeated tool calls
+    unique = {}
+
+    for chunk in chunks:
+
+        unique.setdefault(
+            chunk.get("chunk_id") or chunk.get("content", ""),
+            chunk,
+        )
+
+    chunks = list(unique.values())
+
     pairs = [
         (query, chunk.get("content", ""))
         for chunk in chunks
     ]
 
-    scores = await asyncio.to_thread(
-                reranker.predict,
-                pairs,
-            )
+    # Batched with the pairs of concurrent graph runs
+    scores = await get_reranker_service().ascore(
+        pairs,
+    )
 
     ranked = []
 
@@ -47,6 +59,6 @@ async def reranker_node(state: State):
 
     state["reranked_chunks"] = ranked
 
-    state["selected_chunks"] = ranked[:4]
+    state["selected_chunks"] = ranked[:RERANK_TOP_K]
 
-    return state
\ No newline at end of file
+    return state
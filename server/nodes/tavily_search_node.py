@@ -29,7 +29,7 @@ async def internet_search_node(
 
         logger.info(f"🌐 Internet search: "f"{query}")
 
-        context = await run_tavily_search(
+        records = await run_tavily_search(
             client,
             query,
         )
@@ -38,7 +38,7 @@ async def internet_search_node(
             "internet_search"
         )
 
-        if not context:
+        if not records:
 
             state["tool_outputs"].append({
                 "tool": "internet_search",
@@ -56,21 +56,15 @@ async def internet_search_node(
 
             return state
 
-        chunk = {
-            "source_type": "internet",
-            "source_name": "tavily",
-            "content": context,
-        }
-
-        state["retrieved_chunks"].append(
-            chunk
+        state["retrieved_chunks"].extend(
+            records
         )
 
         state["tool_outputs"].append({
             "tool": "internet_search",
             "success": True,
             "summary": (
-                "Retrieved internet "
+                f"Retrieved {len(records)} internet "
                 "search results."
             ),
         })
@@ -3,7 +3,8 @@ import logging
 from state.state import State
 
 from tools.vector_search import (
-    run_vector_search,
+    search_vector_chunks,
+    vector_chunk_records,
 )
 
 logger = logging.getLogger(__name__)
@@ -32,16 +33,21 @@ async def vector_search_node(
             f"for session: {session_id}"
         )
 
-        context = await run_vector_search(
+        hits = await search_vector_chunks(
             query,
             session_id,
         )
 
+        # One record per hit; packing happens after reranking
+        records = vector_chunk_records(
+            hits
+        )
+
         state["used_tools"].append(
             "vector_search"
         )
 
-        if not context:
+        if not records:
 
             state["tool_outputs"].append({
                 "tool": "vector_search",
@@ -59,22 +65,16 @@ async def vector_search_node(
 
             return state
 
-        chunk = {
-            "source_type": "vector_db",
-            "source_name": "user_documents",
-            "content": context,
-        }
-
-        state["retrieved_chunks"].append(
-            chunk
+        state["retrieved_chunks"].extend(
+            records
         )
 
         state["tool_outputs"].append({
             "tool": "vector_search",
             "success": True,
             "summary": (
-                "Retrieved vector "
-                "database context."
+                f"Retrieved {len(records)} vector "
+                "database chunks."
             ),
         })
 
@@ -69,7 +69,7 @@ async def web_scraper_node(
             f"🕸️ Scraping URL: {url}"
         )
 
-        content = await run_web_scrape(
+        records = await run_web_scrape(
             url,
             http_client,
         )
@@ -82,7 +82,7 @@ async def web_scraper_node(
         # EMPTY CONTENT
         # =================================================
 
-        if not content:
+        if not records:
 
             state["tool_outputs"].append({
                 "tool": "web_scraper",
@@ -101,17 +101,11 @@ async def web_scraper_node(
             return state
 
         # =================================================
-        # STRUCTURED CHUNK
+        # STRUCTURED CHUNKS
         # =================================================
 
-        chunk = {
-            "source_type": "webpage",
-            "source_name": url,
-            "content": content,
-        }
-
-        state["retrieved_chunks"].append(
-            chunk
+        state["retrieved_chunks"].extend(
+            records
         )
 
         # =================================================
@@ -122,7 +116,8 @@ async def web_scraper_node(
             "tool": "web_scraper",
             "success": True,
             "summary": (
-                "Retrieved webpage content."
+                f"Retrieved {len(records)} webpage "
+                "passages."
             ),
         })
 
@@ -5,12 +5,88 @@ from typing import (
     List,
     Dict,
     Any,
+    Optional,
 )
 
 from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage
 
 
+class RetrievedChunk(TypedDict, total=False):
+    """One piece of evidence, as returned by every retrieval tool."""
+
+    # Stable id: the same passage retrieved twice has the same id
+    chunk_id: str
+
+    # vector_db | internet | webpage
+    source_type: str
+
+    # File / video title, page title, or URL
+    source_name: str
+
+    content: str
+
+    # The tool's own relevance score (vector similarity, Tavily score)
+    score: Optional[float]
+
+    # Page range, video time range + link, or URL to cite
+    location: Optional[str]
+
+    # LLM tokens of `content`, counted once when the record is built
+    token_count: int
+
+    # The matched chunks alone when `content` includes their neighbors
+    match_content: str
+
+    match_token_count: int
+
+    # Cross-encoder score, set by the reranker
+    rerank_score: float
+
+
+def merge_retrieved_chunks(
+    left: Optional[List[RetrievedChunk]],
+    right: Optional[List[RetrievedChunk]],
+) -> List[RetrievedChunk]:
+    """
+    Reducer of retrieved_chunks: appends chunks not seen yet (by chunk_id),
+    so parallel retrieval branches merge and a node returning the whole list
+    again changes nothing. None resets the list.
+    """
+
+    if right is None:
+        return []
+
+    merged = list(left or [])
+
+    seen = {
+        c.get("chunk_id") or c.get("content")
+        for c in merged
+    }
+
+    for chunk in right:
+
+        key = chunk.get("chunk_id") or chunk.get("content")
+
+        if key not in seen:
+            seen.add(key)
+            merged.append(chunk)
+
+    return merged
+
+
+def merge_tool_reports(
+    left: Optional[List[Dict[str, Any]]],
+    right: Optional[List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """Reducer of tool_reports: appends; None resets the list."""
+
+    if right is None:
+        return []
+
+    return list(left or []) + list(right)
+
+
 class State(TypedDict):
 
     # Conversation memory
@@ -36,17 +112,29 @@ class State(TypedDict):
 
     next_tool_hint: str
 
+    # Tools the planner runs together in parallel retrieval mode
+    planned_tools: List[str]
+
+    # Per-tool bookkeeping of parallel branches, folded in by merge_retrieval
+    tool_reports: Annotated[
+        List[Dict[str, Any]],
+        merge_tool_reports,
+    ]
+
     # Agent reasoning memory
     agent_scratchpad: List[str]
 
-    # Raw retrievals
-    retrieved_chunks: List[Dict[str, Any]]
+    # Raw retrievals (merged across parallel retrieval branches)
+    retrieved_chunks: Annotated[
+        List[RetrievedChunk],
+        merge_retrieved_chunks,
+    ]
 
     # Reranked retrievals
-    reranked_chunks: List[Dict[str, Any]]
+    reranked_chunks: List[RetrievedChunk]
 
     # Final chunks for synthesis
-    selected_chunks: List[Dict[str, Any]]
+    selected_chunks: List[RetrievedChunk]
 
     # Tool execution summaries
     tool_outputs: List[Dict[str, Any]]
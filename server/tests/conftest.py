@@ -0,0 +1,40 @@
+import os
+import sys
+import types
+import hashlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# global_modules.embeddings loads a Hugging Face model at import time; the tests
+# never embed for real, so they get a deterministic stand-in instead.
+EMBEDDING_DIM = 384
+
+
+class HashEmbeddings:
+    """Same text -> same unit vector, different texts -> unrelated vectors."""
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        v = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+_embeddings = types.ModuleType("global_modules.embeddings")
+_embeddings.EMBEDDING_MODEL = "test/hash-embeddings"
+_embeddings.embeddings = HashEmbeddings()
+sys.modules.setdefault("global_modules.embeddings", _embeddings)
+
+# Loading the real tokenizers downloads them; token counts fall back to the
+# length estimate (tests that need a tokenizer patch one in).
+import global_modules.token_counter as _token_counter  # noqa: E402
+
+_token_counter._llm_encoding = lambda: None
+_token_counter._embedding_tokenizer = lambda: None
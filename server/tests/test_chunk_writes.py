@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import mongodb.insert_chunks as insert_chunks_module
+from mongodb.insert_chunks import DUPLICATE_KEY_ERROR, chunk_id, insert_chunks
+
+
+class FakeCollection:
+    """insert_many / find over a dict keyed by _id, with Mongo's duplicate-key behaviour."""
+
+    def __init__(self, fail_first=None):
+        self.docs = {}
+        self.fail_first = list(fail_first or [])
+        self.insert_calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.insert_calls += 1
+        if self.fail_first:
+            raise self.fail_first.pop(0)
+        errors = []
+        inserted = []
+        for i, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": i, "code": DUPLICATE_KEY_ERROR})
+            else:
+                self.docs[doc["_id"]] = doc
+                inserted.append(doc["_id"])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+
+        class Result:
+            inserted_ids = inserted
+        return Result()
+
+    def find(self, query, projection):
+        wanted = set(query["_id"]["$in"])
+
+        async def found():
+            for _id in list(self.docs):
+                if _id in wanted:
+                    yield {"_id": _id}
+        return found()
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeCollection()
+    embedded = []
+
+    async def embed_chunks(chunks):
+        embedded.extend(chunks)
+        return [[1.0, 0.0] for _ in chunks]
+
+    monkeypatch.setattr(insert_chunks_module, "collection", fake)
+    monkeypatch.setattr(insert_chunks_module, "embed_chunks", embed_chunks)
+    monkeypatch.setattr(insert_chunks_module, "LOCAL_VECTOR_INDEX_ENABLED", False)
+    return fake, embedded
+
+
+def chunks(session_id="s1", texts=("alpha", "beta", "gamma")):
+    return [
+        Document(page_content=t, metadata={"session_id": session_id, "source": "a.pdf", "chunk_index": i})
+        for i, t in enumerate(texts)
+    ]
+
+
+def test_chunk_id_is_deterministic_and_scoped():
+    base = chunk_id("s1", "a.pdf", 0, "text")
+
+    assert chunk_id("s1", "a.pdf", 0, "text") == base
+    assert len({
+        base,
+        chunk_id("s2", "a.pdf", 0, "text"),
+        chunk_id("s1", "b.pdf", 0, "text"),
+        chunk_id("s1", "a.pdf", 1, "text"),
+        chunk_id("s1", "a.pdf", 0, "other"),
+    }) == 5
+
+
+def test_reingesting_the_same_file_writes_and_embeds_nothing(store):
+    fake, embedded = store
+
+    asyncio.run(insert_chunks(chunks()))
+    written = asyncio.run(insert_chunks(chunks()))
+
+    assert written == []
+    assert len(fake.docs) == 3
+    assert len(embedded) == 3
+    assert fake.insert_calls == 1
+
+
+def test_partially_stored_batches_insert_only_the_new_chunks(store):
+    fake, _ = store
+    asyncio.run(insert_chunks(chunks(texts=("alpha", "beta"))))
+
+    # Precomputed vectors skip the existence check; duplicates are ignored by insert_many
+    asyncio.run(insert_chunks(chunks(texts=("alpha", "beta", "gamma")), vectors=[[1.0, 0.0]] * 3))
+
+    assert len(fake.docs) == 3
+    assert sorted(d["chunk_index"] for d in fake.docs.values()) == [0, 1, 2]
+
+
+def test_other_write_errors_are_raised(store):
+    fake, _ = store
+    fake.fail_first = [BulkWriteError({"writeErrors": [{"index": 0, "code": 121}], "nInserted": 0})]
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(insert_chunks(chunks()))
+
+
+def test_transient_errors_are_retried(store, monkeypatch):
+    fake, _ = store
+    fake.fail_first = [AutoReconnect("primary stepped down")]
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda seconds: sleep(0))
+
+    asyncio.run(insert_chunks(chunks()))
+
+    assert fake.insert_calls == 2
+    assert len(fake.docs) == 3
@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+from modules.load_and_split_with_ocr import stream_chunks
+from modules.text_splitting import StreamingTextSplitter
+
+WORDS = "retrieval page chunk vector index session token overlap boundary transcript".split()
+
+
+def make_pages(count=12, sentences_per_page=18, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))) + "."
+            for _ in range(sentences_per_page)
+        ]
+        # Paragraph breaks inside a page, too
+        pages.append("\n\n".join(" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)))
+    return pages
+
+
+def split(pages, chunk_size=60, chunk_overlap=10):
+    splitter = StreamingTextSplitter(chunk_size, chunk_overlap)
+    spans = []
+    for page, text in enumerate(pages):
+        spans.extend(splitter.feed(text, page))
+    return spans + splitter.flush()
+
+
+def page_of(pages, offset):
+    start = 0
+    for page, text in enumerate(pages):
+        if offset < start + len(text) + 1:
+            return page
+        start += len(text) + 1
+    raise AssertionError(offset)
+
+
+def test_offsets_locate_every_chunk_in_the_document():
+    pages = make_pages()
+    document = "\n".join(pages)
+
+    spans = split(pages)
+
+    assert len(spans) > 10
+    for span in spans:
+        assert document[span.char_start:span.char_end] == span.text
+    assert spans[0].char_start == 0
+    assert spans[-1].char_end == len(document.rstrip())
+
+
+def test_chunks_follow_each_other_without_gaps():
+    spans = split(make_pages())
+
+    for prev, span in zip(spans, spans[1:]):
+        assert prev.char_start < span.char_start
+        # Overlapping, or separated by at most the whitespace the splitter drops
+        assert span.char_start <= prev.char_end + 2
+
+
+def test_pages_are_where_chunks_start_and_end():
+    # Pages shorter than a chunk, so chunks have to span them
+    pages = make_pages(count=30, sentences_per_page=2)
+
+    spans = split(pages)
+
+    covered = {page for span in spans for page in range(span.page, span.page_end + 1)}
+    assert covered == set(range(len(pages)))
+    for span in spans:
+        assert span.page == page_of(pages, span.char_start)
+        assert span.page_end == page_of(pages, span.char_end - 1)
+    assert any(span.page != span.page_end for span in spans)
+
+
+def test_stream_chunks_metadata():
+    pages = make_pages(count=4)
+
+    async def page_stream():
+        for page, text in enumerate(pages):
+            yield page, text
+
+    async def run():
+        return [d async for d in stream_chunks(page_stream(), "doc.pdf", "s1", 60, 10)]
+
+    docs = asyncio.run(run())
+
+    assert [d.metadata["chunk_index"] for d in docs] == list(range(len(docs)))
+    assert docs[0].metadata["page"] == 1
+    assert docs[-1].metadata["page_end"] == len(pages)
+    assert all(d.metadata["token_count"] > 0 for d in docs)
+    assert all(d.metadata["source"] == "doc.pdf" and d.metadata["session_id"] == "s1" for d in docs)
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import mongodb.document_store as document_store
+from mongodb.document_store import purge_unused_documents
+
+NOW = datetime.now(timezone.utc)
+OLD = NOW - timedelta(days=60)
+
+
+def matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+            continue
+        if not isinstance(cond, dict):
+            if doc.get(field) != cond:
+                return False
+            continue
+        for op, value in cond.items():
+            if op == "$in" and doc.get(field) not in value:
+                return False
+            if op == "$lt" and not (field in doc and doc[field] < value):
+                return False
+            if op == "$exists" and (field in doc) != value:
+                return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def find(self, query, projection=None):
+        async def found():
+            for doc in [d for d in self.docs if matches(d, query)]:
+                yield doc
+        return found()
+
+    async def distinct(self, field, query):
+        return list(dict.fromkeys(d[field] for d in self.docs if matches(d, query)))
+
+    async def count_documents(self, query):
+        return sum(matches(d, query) for d in self.docs)
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+        class Result:
+            deleted_count = before - len(self.docs)
+        return Result()
+
+
+def chunk(key, ordinal, written_at=OLD):
+    doc = {"_id": f"{key}:{ordinal}", "key": key, "ordinal": ordinal}
+    if written_at is not None:
+        doc["written_at"] = written_at
+    return doc
+
+
+def stores(monkeypatch):
+    manifests = FakeCollection([
+        {"_id": "used", "last_used_at": NOW},
+        {"_id": "unused", "last_used_at": OLD},
+    ])
+    chunks = FakeCollection([
+        chunk("used", 0), chunk("used", 1, written_at=None),
+        chunk("unused", 0), chunk("unused", 1),
+        # A failed ingest long ago, and one still writing
+        chunk("failed", 0),
+        chunk("ingesting", 0, written_at=NOW),
+    ])
+    monkeypatch.setattr(document_store, "document_store_collection", manifests)
+    monkeypatch.setattr(document_store, "document_store_chunks_collection", chunks)
+    return manifests, chunks
+
+
+def test_unused_entries_and_abandoned_chunks_are_purged(monkeypatch):
+    manifests, chunks = stores(monkeypatch)
+
+    purged = asyncio.run(purge_unused_documents(ttl_days=30))
+
+    assert purged == {"entries": 1, "chunks": 3}
+    assert [m["_id"] for m in manifests.docs] == ["used"]
+    assert sorted(c["_id"] for c in chunks.docs) == ["ingesting:0", "used:0", "used:1"]
+
+
+def test_dry_run_only_counts(monkeypatch):
+    manifests, chunks = stores(monkeypatch)
+
+    purged = asyncio.run(purge_unused_documents(ttl_days=30, dry_run=True))
+
+    assert purged == {"entries": 1, "chunks": 3}
+    assert len(manifests.docs) == 2
+    assert len(chunks.docs) == 6
+
+
+def test_zero_ttl_keeps_everything(monkeypatch):
+    manifests, chunks = stores(monkeypatch)
+
+    assert asyncio.run(purge_unused_documents(ttl_days=0)) == {"entries": 0, "chunks": 0}
+    assert len(chunks.docs) == 6
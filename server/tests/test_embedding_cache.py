@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+from global_modules.embedding_cache import EmbeddingCache, embedding_cache_key
+from global_modules.embedding_service import EmbeddingService
+
+
+class CountingModel:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def service(memory_ttl=3600, model_name="model-a"):
+    model = CountingModel()
+    cache = EmbeddingCache(model_name, persist=False, memory_ttl=memory_ttl)
+    return EmbeddingService(model=model, max_wait_ms=0, cache=cache), model
+
+
+def run(service, scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+def test_repeated_query_is_answered_from_memory():
+    svc, model = service()
+
+    async def scenario():
+        return await svc.aembed_query("what is RAG?"), await svc.aembed_query("what  is RAG? ")
+
+    first, again = run(svc, scenario)
+
+    assert first == again == [12.0, 1.0]
+    assert model.texts == ["what is RAG?"]
+    assert svc.stats()["queries"]["hits"] == 1
+    assert svc.stats()["queries"]["misses"] == 1
+
+
+def test_concurrent_identical_queries_share_one_embedding():
+    svc, model = service()
+
+    async def scenario():
+        return await asyncio.gather(*(svc.aembed_query("same question") for _ in range(5)))
+
+    vectors = run(svc, scenario)
+
+    assert vectors == [[13.0, 1.0]] * 5
+    assert model.texts == ["same question"]
+    assert svc.stats()["queries"]["joined_inflight"] == 4
+
+
+def test_cancelled_first_caller_does_not_fail_joiners():
+    svc, model = service()
+    release = threading.Event()
+    embed_documents = model.embed_documents
+
+    def gated(texts):
+        release.wait(5)
+        return embed_documents(texts)
+
+    model.embed_documents = gated
+
+    async def scenario():
+        first = asyncio.create_task(svc.aembed_query("same question"))
+        await asyncio.sleep(0.05)
+        joiner = asyncio.create_task(svc.aembed_query("same question"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        return await joiner, await asyncio.gather(first, return_exceptions=True)
+
+    vector, (first_result,) = run(svc, scenario)
+
+    assert vector == [13.0, 1.0]
+    assert isinstance(first_result, asyncio.CancelledError)
+    assert model.texts == ["same question"]
+
+
+def test_expired_memory_entries_are_embedded_again():
+    svc, model = service(memory_ttl=1e-9)
+
+    async def scenario():
+        await svc.aembed_query("q")
+        await svc.aembed_query("q")
+
+    run(svc, scenario)
+
+    assert model.texts == ["q", "q"]
+    assert svc.cache.stats()["memory_expired"] == 1
+
+
+def test_keys_include_the_model():
+    assert embedding_cache_key("model-a", "q") != embedding_cache_key("model-b", "q")
+    assert embedding_cache_key("model-a", " q ") == embedding_cache_key("model-a", "q")
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import tools.vector_search as vector_search
+from tools.vector_search import rrf_fuse, text_search_query
+
+
+def hit(index, score, source="doc.pdf"):
+    return {"source": source, "chunk_index": index, "text": f"chunk {index}", "score": score}
+
+
+def test_rrf_rewards_hits_found_by_both_searches():
+    vector = [hit(1, 0.9), hit(2, 0.8), hit(3, 0.7)]
+    lexical = [hit(3, 4.0), hit(4, 3.0)]
+
+    fused = rrf_fuse([vector, lexical], limit=3, k=60)
+
+    # 2 and 4 tie at 1 / 62; the first list wins ties
+    assert [h["chunk_index"] for h in fused] == [3, 1, 2]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 63)
+    assert fused[1]["score"] == pytest.approx(1 / 61)
+
+
+def test_rrf_keys_by_source_and_position():
+    fused = rrf_fuse([[hit(0, 0.9, "a.pdf")], [hit(0, 2.0, "b.pdf")]], limit=5)
+
+    assert {h["source"] for h in fused} == {"a.pdf", "b.pdf"}
+
+
+def test_text_query_has_no_negations_or_phrases():
+    assert text_search_query('-v flag "exit code" --verbose') == "v flag exit code verbose"
+    assert text_search_query(' - "" ') == ""
+
+
+def hybrid(monkeypatch, vector, lexical):
+    async def vector_hits(query, session_id, num_chunks):
+        if isinstance(vector, Exception):
+            raise vector
+        return vector
+
+    async def lexical_hits(query, session_id, limit):
+        return lexical
+
+    monkeypatch.setattr(vector_search, "_vector_hits", vector_hits)
+    monkeypatch.setattr(vector_search, "lexical_search", lexical_hits)
+    monkeypatch.setattr(vector_search, "LEXICAL_MIN_SCORE", 1.0)
+    return asyncio.run(vector_search._hybrid_hits("query", "s1", 4))
+
+
+def test_weak_lexical_only_hits_are_dropped(monkeypatch):
+    results = hybrid(monkeypatch, [hit(1, 0.9)], [hit(1, 0.6), hit(7, 0.6), hit(8, 1.5)])
+
+    assert sorted(h["chunk_index"] for h in results) == [1, 8]
+
+
+def test_failed_vector_search_is_counted_as_degraded(monkeypatch):
+    before = vector_search.hybrid_search_stats()["lexical_only"]
+
+    results = hybrid(monkeypatch, RuntimeError("embedding down"), [hit(7, 0.6), hit(8, 1.5)])
+
+    assert [h["chunk_index"] for h in results] == [8]
+    assert vector_search.hybrid_search_stats()["lexical_only"] == before + 1
+
+
+def test_late_search_is_unwound_before_returning(monkeypatch):
+    unwound = []
+
+    async def vector_hits(query, session_id, num_chunks):
+        return [hit(1, 0.9)]
+
+    async def lexical_hits(query, session_id, limit):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            await asyncio.sleep(0)
+            unwound.append(True)
+
+    monkeypatch.setattr(vector_search, "_vector_hits", vector_hits)
+    monkeypatch.setattr(vector_search, "lexical_search", lexical_hits)
+    monkeypatch.setattr(vector_search, "HYBRID_SEARCH_TIMEOUT_MS", 20)
+
+    async def run():
+        results = await vector_search._hybrid_hits("query", "s1", 4)
+        return results, list(unwound)
+
+    results, unwound_by_then = asyncio.run(run())
+
+    assert [h["chunk_index"] for h in results] == [1]
+    assert unwound_by_then == [True]
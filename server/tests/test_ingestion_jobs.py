@@ -0,0 +1,82 @@
+import asyncio
+import contextlib
+
+from fastapi import HTTPException
+
+import modules.ingestion_jobs as ingestion_jobs
+from modules.ingestion_jobs import IngestionJobQueue
+from modules.pdf_handlers import SavedUpload
+
+
+class SlowPool:
+    """Postgres stand-in whose writes yield to the loop, like a real round trip."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.rows = []
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        pool = self
+
+        class Cursor:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, params=None):
+                await asyncio.sleep(0.01)
+                if pool.fail:
+                    raise RuntimeError("pg down")
+                pool.rows.append(params)
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+
+            async def commit(self):
+                pass
+
+        yield Conn()
+
+
+def uploads():
+    return [SavedUpload(path="/tmp/a.pdf", filename="a.pdf", sha256="0" * 64, size=1)]
+
+
+def submit_concurrently(monkeypatch, pool, count, maxsize):
+    monkeypatch.setattr(ingestion_jobs, "get_pg_pool", lambda: asyncio.sleep(0, pool))
+    queue = IngestionJobQueue(workers=0, maxsize=maxsize)
+
+    async def run():
+        return await asyncio.gather(
+            *(queue.submit("s1", None, uploads()) for _ in range(count)),
+            return_exceptions=True,
+        )
+
+    return queue, asyncio.run(run())
+
+
+def test_concurrent_submits_never_overfill_the_queue(monkeypatch):
+    pool = SlowPool()
+    queue, results = submit_concurrently(monkeypatch, pool, count=3, maxsize=2)
+
+    accepted = [r for r in results if isinstance(r, str)]
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(accepted) == 2
+    assert [r.status_code for r in rejected] == [503]
+    # Rejected before its row was written: no stuck "queued" job
+    assert len(pool.rows) == 2
+    assert set(queue._jobs) == set(accepted)
+    assert queue._queue.qsize() == 2
+    assert queue.has_capacity() is False
+
+
+def test_failed_insert_releases_the_slot(monkeypatch):
+    queue, results = submit_concurrently(monkeypatch, SlowPool(fail=True), count=1, maxsize=1)
+
+    assert isinstance(results[0], RuntimeError)
+    assert queue._jobs == {}
+    assert queue.has_capacity() is True
@@ -0,0 +1,73 @@
+import asyncio
+
+import tools.vector_search as vector_search
+from tools.vector_search import expand_neighbors
+
+# "aaaa bbbb cccc dddd eeee" cut into 9-char chunks overlapping by 4 chars
+TEXT = "aaaa bbbb cccc dddd eeee"
+CHUNKS = [
+    {"source": "a.pdf", "chunk_index": i, "text": TEXT[start:start + 9], "char_start": start,
+     "char_end": start + 9, "page": i + 1, "page_end": i + 1, "token_count": 2}
+    for i, start in enumerate(range(0, 20, 5))
+]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def find(self, query, projection):
+        self.queries += 1
+        clauses = query["$or"]
+
+        async def matching():
+            for doc in self.docs:
+                if any(
+                    doc["source"] == c["source"]
+                    and c["chunk_index"]["$gte"] <= doc["chunk_index"] <= c["chunk_index"]["$lte"]
+                    for c in clauses
+                ):
+                    yield doc
+
+        return matching()
+
+
+def expand(monkeypatch, hits, neighbors=1):
+    fake = FakeCollection(CHUNKS)
+    monkeypatch.setattr(vector_search, "collection", fake)
+    return asyncio.run(expand_neighbors(hits, "s1", neighbors)), fake
+
+
+def test_overlapping_windows_merge_into_one_group(monkeypatch):
+    hits = [{**CHUNKS[1], "score": 0.9}, {**CHUNKS[3], "score": 0.7}]
+
+    groups, fake = expand(monkeypatch, hits)
+
+    assert fake.queries == 1
+    assert len(groups) == 1
+    group = groups[0]
+    assert group["text"] == TEXT
+    assert (group["chunk_index"], group["chunk_index_end"]) == (0, 3)
+    assert (group["page"], group["page_end"]) == (1, 4)
+    assert group["score"] == 0.9
+    assert group["token_count"] == 8
+    # Only the matched chunks 1..3, without neighbor 0
+    assert group["match_text"] == TEXT[5:]
+    assert group["match_token_count"] == 6
+
+
+def test_separate_windows_stay_separate_and_best_first(monkeypatch):
+    hits = [{**CHUNKS[0], "score": 0.5}, {**CHUNKS[3], "score": 0.8}]
+
+    groups, _ = expand(monkeypatch, hits, neighbors=0)
+
+    assert [(g["chunk_index"], g["score"]) for g in groups] == [(3, 0.8), (0, 0.5)]
+    assert groups[0]["text"] == CHUNKS[3]["text"]
+
+
+def test_legacy_hits_without_positions_pass_through(monkeypatch):
+    groups, fake = expand(monkeypatch, [{"source": "old.pdf", "text": "legacy", "score": 0.6}])
+
+    assert groups == [{"source": "old.pdf", "text": "legacy", "score": 0.6}]
+    assert fake.queries == 0
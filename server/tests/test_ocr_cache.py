@@ -0,0 +1,47 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from global_modules.ocr_cache import OCRCache
+
+
+def test_concurrent_writes_of_the_same_page_leave_one_whole_file(tmp_path):
+    cache = OCRCache(base_dir=str(tmp_path), enabled=True)
+    folder = cache._dir("ab" * 32, "variant")
+    texts = [f"text {i} " * 1000 for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda t: cache._write(folder, {0: t}), texts))
+
+    assert [p.name for p in folder.iterdir()] == ["0.txt"]
+    assert (folder / "0.txt").read_text(encoding="utf-8") in texts
+
+
+def test_round_trip(tmp_path):
+    cache = OCRCache(base_dir=str(tmp_path), enabled=True)
+
+    async def run():
+        await cache.put_many("cd" * 32, "v", {0: "first", 3: ""})
+        return await cache.get_many("cd" * 32, "v", [0, 1, 3])
+
+    assert asyncio.run(run()) == {0: "first", 3: ""}
+
+
+def test_oldest_documents_are_evicted_past_the_limit(tmp_path):
+    page = "x" * 30 * 1024
+    cache = OCRCache(base_dir=str(tmp_path), enabled=True, max_mb=100 / 1024)
+    docs = {name: name * 32 for name in ("aa", "bb", "cc", "dd")}
+
+    async def run():
+        for i, name in enumerate(("aa", "bb", "cc")):
+            await cache.put_many(docs[name], "v", {0: page})
+            os.utime(cache._dir(docs[name], "v"), (1000 + i, 1000 + i))
+        # A hit makes "aa" the most recently used
+        assert await cache.get_many(docs["aa"], "v", [0]) == {0: page}
+        await cache.put_many(docs["dd"], "v", {0: page})
+
+    asyncio.run(run())
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["aa", "cc", "dd"]
+    assert cache.stats()["evicted_documents"] == 1
+    assert cache.stats()["size_bytes"] <= cache.max_bytes
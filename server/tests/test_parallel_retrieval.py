@@ -0,0 +1,138 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import nodes.parallel_retrieval as parallel_retrieval
+import nodes.reranker_node as reranker_node
+from graph.graph_builder import RAGGraphBuilder
+from state.state import merge_retrieved_chunks
+
+
+class FakeReranker:
+    def __init__(self, score):
+        self.score = score
+
+    async def ascore(self, pairs):
+        return [self.score for _ in pairs]
+
+
+def fake_tool(tool, chunk_ids, delay=0.0):
+    async def node(state, config):
+        await asyncio.sleep(delay)
+        state["used_tools"].append(tool)
+        state["retrieved_chunks"].extend(
+            {"chunk_id": cid, "source_type": tool, "content": f"text of {cid}", "token_count": 3}
+            for cid in chunk_ids
+        )
+        state["tool_outputs"].append({"tool": tool, "success": True, "summary": "ok"})
+        state["sources_used"].append(tool)
+        return state
+    return node
+
+
+def chat(*answers):
+    return lambda: FakeListChatModel(responses=list(answers))
+
+
+def initial_state(query):
+    return {
+        "messages": [HumanMessage(content=query)],
+        "query": query,
+        "route": "",
+        "tool_steps": 0,
+        "retrieval_complete": False,
+        "used_tools": [],
+        "next_tool_hint": "",
+        "planned_tools": [],
+        "tool_reports": None,
+        "agent_scratchpad": [],
+        "retrieved_chunks": None,
+        "reranked_chunks": [],
+        "selected_chunks": [],
+        "tool_outputs": [],
+        "sources_used": [],
+    }
+
+
+def run_graph(monkeypatch, planner_answers, rerank_score, tools):
+    monkeypatch.setattr(parallel_retrieval, "RETRIEVAL_NODES", tools)
+    monkeypatch.setattr(reranker_node, "get_reranker_service", lambda: FakeReranker(rerank_score))
+
+    graph = RAGGraphBuilder(
+        router_llm_factory=chat("tools"),
+        simple_chat_llm_factory=chat("simple answer"),
+        tool_llm_factory=chat(*planner_answers),
+        rag_llm_factory=chat("rag answer"),
+        parallel_retrieval=True,
+    ).compile(checkpointer=MemorySaver())
+
+    async def run():
+        visited = []
+        config = {"configurable": {"thread_id": "t", "session_id": "s"}}
+        async for event in graph.astream(initial_state("what does the report say?"), config, stream_mode="updates"):
+            visited.extend(event)
+        return visited
+
+    return asyncio.run(run())
+
+
+def test_weak_evidence_with_nothing_left_to_plan_goes_to_rag(monkeypatch):
+    # Round 1 runs both searches; their evidence is weak, so the evaluator asks
+    # for more tools, but web_scraper has no URL and nothing else is left.
+    visited = run_graph(
+        monkeypatch,
+        planner_answers=["vector_search, internet_search", "web_scraper"],
+        rerank_score=0.1,
+        tools={
+            "vector_search": fake_tool("vector_search", ["v1", "shared"]),
+            "internet_search": fake_tool("internet_search", ["i1", "shared"]),
+            "web_scraper": fake_tool("web_scraper", ["w1"]),
+        },
+    )
+
+    assert visited.count("retrieve") == 2
+    assert visited.count("tool_call") == 2
+    assert "rag_chatbot" in visited
+    assert "simple_chat" not in visited
+
+
+def test_branches_run_concurrently_and_slow_tool_times_out(monkeypatch):
+    monkeypatch.setattr(parallel_retrieval, "RETRIEVAL_TOOL_TIMEOUT_SEC", 0.3)
+
+    seen = {}
+
+    async def spy_merge(state):
+        update = await merge_node(state)
+        seen["chunks"] = [c["chunk_id"] for c in state["retrieved_chunks"]]
+        seen["outputs"] = update["tool_outputs"]
+        return update
+
+    merge_node = parallel_retrieval.merge_retrieval_node
+    import graph.graph_builder as graph_builder
+    monkeypatch.setattr(graph_builder, "merge_retrieval_node", spy_merge)
+
+    visited = run_graph(
+        monkeypatch,
+        planner_answers=["vector_search, internet_search"],
+        rerank_score=0.9,
+        tools={
+            "vector_search": fake_tool("vector_search", ["v1", "shared"], delay=0.1),
+            "internet_search": fake_tool("internet_search", ["i1", "shared"], delay=5),
+            "web_scraper": fake_tool("web_scraper", ["w1"]),
+        },
+    )
+
+    assert visited.count("reranker") == 1
+    assert seen["chunks"] == ["v1", "shared"]
+    assert [o["success"] for o in seen["outputs"]] == [True, False]
+    assert "rag_chatbot" in visited
+
+
+def test_merge_retrieved_chunks_dedupes_and_resets():
+    left = [{"chunk_id": "a"}, {"chunk_id": "b"}]
+
+    assert merge_retrieved_chunks(left, left + [{"chunk_id": "c"}]) == left + [{"chunk_id": "c"}]
+    assert merge_retrieved_chunks(left, [{"chunk_id": "b"}, {"chunk_id": "d"}]) == left + [{"chunk_id": "d"}]
+    assert merge_retrieved_chunks(left, None) == []
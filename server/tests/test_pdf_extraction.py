@@ -0,0 +1,131 @@
+import asyncio
+
+import modules.load_and_split_with_ocr as extraction
+from global_modules.ocr_cache import OCRCache
+from modules.load_and_split_with_ocr import ExtractionReport, PageText
+
+
+class FakeOCREngine:
+    def __init__(self, failing):
+        self.failing = set(failing)
+
+    async def ocr_pages(self, pdf_path, pages, zoom, lang, on_pages_done=None):
+        return {p: None if p in self.failing else f"ocr text of page {p}" for p in pages}
+
+
+def scanned_pages(count, explode_after=None):
+    def read(*args):
+        for i in range(count):
+            if explode_after is not None and i == explode_after:
+                raise ValueError("broken xref")
+            yield PageText(i, "", needs_ocr=True, ocr_zoom=1.5)
+    return read
+
+
+def extract(monkeypatch, tmp_path, failing=(), pages=3, explode_after=None):
+    cache = OCRCache(base_dir=str(tmp_path), enabled=True)
+    monkeypatch.setattr(extraction, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(extraction, "get_ocr_cache", lambda: cache)
+    monkeypatch.setattr(extraction, "get_ocr_engine", lambda: FakeOCREngine(failing))
+    monkeypatch.setattr(extraction, "read_pdf_pages", scanned_pages(pages, explode_after))
+
+    report = ExtractionReport()
+
+    async def run():
+        return [p async for p in extraction.stream_pdf_pages("doc.pdf", content_hash="ab" * 32, report=report)]
+
+    return asyncio.run(run()), report, cache
+
+
+def test_complete_extraction_is_cached(monkeypatch, tmp_path):
+    pages, report, cache = extract(monkeypatch, tmp_path)
+
+    assert [text for _, text in pages] == [f"ocr text of page {i}" for i in range(3)]
+    assert report.complete
+    assert cache.writes == 3
+
+
+def test_failed_ocr_pages_are_reported_and_not_cached(monkeypatch, tmp_path):
+    pages, report, cache = extract(monkeypatch, tmp_path, failing={1})
+
+    assert dict(pages)[1] == ""
+    assert report.failed_pages == [1]
+    assert not report.complete
+    assert cache.writes == 0
+
+
+def test_aborted_read_is_reported(monkeypatch, tmp_path):
+    pages, report, _ = extract(monkeypatch, tmp_path, pages=5, explode_after=2)
+
+    assert [i for i, _ in pages] == [0, 1]
+    assert report.aborted
+    assert not report.complete
+
+
+def test_incomplete_file_is_not_finalized_in_document_store(monkeypatch):
+    import mongodb.vector_ingest as vector_ingest
+    from langchain_core.documents import Document
+
+    calls = {"saved": 0, "finalized": 0}
+
+    def fake_chunks(*args, report=None, **kwargs):
+        async def gen():
+            yield Document(page_content="text", metadata={"chunk_index": 0})
+            report.failed_pages.append(4)
+        return gen()
+
+    async def embed(batch):
+        return [[0.0] for _ in batch]
+
+    async def noop(*args, **kwargs):
+        pass
+
+    async def save(*args, **kwargs):
+        calls["saved"] += 1
+
+    async def finalize(*args, **kwargs):
+        calls["finalized"] += 1
+
+    monkeypatch.setattr(vector_ingest, "stream_pdf_chunks", fake_chunks)
+    monkeypatch.setattr(vector_ingest, "embed_chunks", embed)
+    monkeypatch.setattr(vector_ingest, "write_chunks", noop)
+    monkeypatch.setattr(vector_ingest, "save_stored_chunks", save)
+    monkeypatch.setattr(vector_ingest, "finalize_stored_document", finalize)
+
+    written = asyncio.run(vector_ingest._ingest_pdf_stream("doc.pdf", "s", "ab" * 32, 220, 25, None))
+
+    assert written == 1
+    assert calls == {"saved": 1, "finalized": 0}
+
+
+def test_uploads_are_deleted_when_ingestion_fails_or_yields_nothing(monkeypatch, tmp_path):
+    import mongodb.vector_ingest as vector_ingest
+
+    async def unavailable(key):
+        raise RuntimeError("mongo down")
+
+    async def not_stored(key):
+        return None
+
+    async def no_pages(paths):
+        return 0
+
+    async def no_chunks(*args, **kwargs):
+        return 0
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(vector_ingest, "count_pdf_pages", no_pages)
+    monkeypatch.setattr(vector_ingest, "_ingest_pdf_stream", no_chunks)
+    monkeypatch.setattr(vector_ingest, "delete_session_directory_if_empty", noop)
+
+    for lookup, status in ((unavailable, "ingest_failed"), (not_stored, "no_chunks")):
+        upload = tmp_path / f"{status}.pdf"
+        upload.write_bytes(b"%PDF")
+        monkeypatch.setattr(vector_ingest, "load_stored_document", lookup)
+
+        result = asyncio.run(vector_ingest.ingest_files_to_mongo([str(upload)], "s", file_hashes={str(upload): "ab" * 32}))
+
+        assert result["status"] == status
+        assert not upload.exists()
@@ -0,0 +1,76 @@
+import asyncio
+
+import nodes.rag_chatbot as rag_chatbot
+import tools.vector_search as vector_search
+from global_modules.token_counter import CHARS_PER_TOKEN
+from modules.text_splitting import CHUNK_SIZE_TOKENS
+from nodes.rag_chatbot import MAX_CONTEXT_TOKENS, build_rag_context
+from tools.chunk_records import make_chunk_record
+from tools.vector_search import expand_neighbors, vector_chunk_records
+
+SOURCES = [f"doc{n}.pdf" for n in range(vector_search.VECTOR_SEARCH_LIMIT)]
+
+
+def chunk_text(source, index):
+    # Full-size chunks; the matched one (index 1) carries a marker to look for
+    words = (f"{source}-{index}-filler. " * CHUNK_SIZE_TOKENS * CHARS_PER_TOKEN)
+    words = words[:CHUNK_SIZE_TOKENS * CHARS_PER_TOKEN - 20]
+    return f"MATCH {source}. {words}" if index == 1 else words
+
+
+CHUNKS = [
+    {"source": source, "chunk_index": i, "text": chunk_text(source, i), "token_count": CHUNK_SIZE_TOKENS}
+    for source in SOURCES
+    for i in range(3)
+]
+
+
+class FakeCollection:
+    def find(self, query, projection):
+        clauses = query["$or"]
+
+        async def matching():
+            for doc in CHUNKS:
+                if any(
+                    doc["source"] == c["source"]
+                    and c["chunk_index"]["$gte"] <= doc["chunk_index"] <= c["chunk_index"]["$lte"]
+                    for c in clauses
+                ):
+                    yield doc
+
+        return matching()
+
+
+def expanded_records(monkeypatch):
+    monkeypatch.setattr(vector_search, "collection", FakeCollection())
+    hits = [
+        {**CHUNKS[3 * n + 1], "score": 0.9 - 0.1 * n}
+        for n in range(len(SOURCES))
+    ]
+    groups = asyncio.run(expand_neighbors(hits, "s1", 1))
+    return vector_chunk_records(groups)
+
+
+def test_every_expanded_hit_keeps_its_match(monkeypatch):
+    selected_chunks = expanded_records(monkeypatch) + [
+        make_chunk_record("web", "internet", "example.com", "web result " * 40),
+    ]
+
+    rag_context, tokens = build_rag_context(selected_chunks)
+
+    assert len(rag_context) == len(selected_chunks)
+    for source in SOURCES:
+        assert any(f"MATCH {source}." in block for block in rag_context)
+    assert tokens <= MAX_CONTEXT_TOKENS
+
+
+def test_over_budget_group_drops_neighbors_not_the_match(monkeypatch):
+    # Room for one chunk, not a hit with its two neighbors
+    monkeypatch.setitem(rag_chatbot.SOURCE_TOKEN_LIMITS, "vector_db", CHUNK_SIZE_TOKENS + 10)
+
+    rag_context, _ = build_rag_context(expanded_records(monkeypatch))
+
+    assert len(rag_context) == 1
+    assert f"MATCH {SOURCES[0]}." in rag_context[0]
+    assert f"{SOURCES[0]}-0-filler" not in rag_context[0]
+    assert f"{SOURCES[0]}-2-filler" not in rag_context[0]
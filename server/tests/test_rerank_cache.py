@@ -0,0 +1,77 @@
+import asyncio
+
+from global_modules.rerank_cache import RerankScoreCache, rerank_model_id
+from global_modules.reranker_service import RerankerService
+
+
+class CountingModel:
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=None):
+        self.pairs.extend(pairs)
+        return [float(len(q) + len(p)) for q, p in pairs]
+
+
+def score(service, *requests):
+    async def main():
+        try:
+            return [await service.ascore(pairs) for pairs in requests]
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+def test_scores_are_reused_per_query_and_chunk():
+    model = CountingModel()
+    service = RerankerService(model=model, max_wait_ms=0, cache=RerankScoreCache("m1"))
+
+    scores, again = score(
+        service,
+        [("q1", "alpha"), ("q1", "beta")],
+        [("q1 ", "alpha"), ("q2", "alpha"), ("q1", "beta")],
+    )
+
+    assert again == [scores[0], 7.0, scores[1]]
+    # Only the new (query, chunk) pair reached the model
+    assert model.pairs == [("q1", "alpha"), ("q1", "beta"), ("q2", "alpha")]
+    assert service.cache.stats()["hits"] == 2
+    assert service.cache.stats()["misses"] == 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RerankScoreCache("m1", max_entries=2)
+    a, b, c = cache.keys([("q", "a"), ("q", "b"), ("q", "c")])
+
+    cache.put_many([a, b], [1.0, 2.0])
+    cache.get_many([a])
+    cache.put_many([c], [3.0])
+
+    assert cache.get_many([a, b, c]) == [1.0, None, 3.0]
+    assert cache.stats()["evicted"] == 1
+
+
+def test_expired_entries_miss():
+    cache = RerankScoreCache("m1", ttl=-1)
+    keys = cache.keys([("q", "a")])
+
+    cache.put_many(keys, [1.0])
+
+    assert cache.get_many(keys) == [None]
+    assert cache.stats()["expired"] == 1
+
+
+def test_changing_the_model_invalidates_its_scores():
+    cache = RerankScoreCache(rerank_model_id("cross-encoder/a", "torch"))
+    pairs = [("q", "a"), ("q", "b")]
+    cache.put_many(cache.keys(pairs), [1.0, 2.0])
+
+    # Another backend of the same checkpoint scores differently: different keys
+    other = RerankScoreCache(rerank_model_id("cross-encoder/a", "onnx-int8"))
+    assert not set(other.keys(pairs)) & set(cache.keys(pairs))
+
+    cache.use_model(rerank_model_id("cross-encoder/b", "torch"))
+
+    assert cache.get_many(cache.keys(pairs)) == [None, None]
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidated"] == 2
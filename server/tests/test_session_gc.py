@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+
+import pytest
+
+import modules.session_gc as session_gc
+from modules.session_gc import SessionGarbageCollector
+
+
+class RecordingPool:
+    """Postgres stand-in: records statements, commits and rollbacks."""
+
+    def __init__(self, locked):
+        self.locked = locked
+        self.log = []
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        pool = self
+
+        class Cursor:
+            result = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, params=None):
+                statement = " ".join(query.split())
+                pool.log.append(("pg", statement))
+                if "FOR UPDATE" in query:
+                    self.result = [(sid,) for sid in pool.locked]
+                else:
+                    self.result = [(0, 0)]
+
+            async def fetchall(self):
+                return self.result
+
+            async def fetchone(self):
+                return self.result[0]
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+
+            async def commit(self):
+                pool.log.append(("pg", "COMMIT"))
+
+        try:
+            yield Conn()
+        except Exception:
+            pool.log.append(("pg", "ROLLBACK"))
+            raise
+
+
+class FakeCollection:
+    def __init__(self, log, fail=False):
+        self.log = log
+        self.fail = fail
+
+    def aggregate(self, pipeline):
+        async def rows():
+            yield {"docs": 3, "bytes": 300}
+        return rows()
+
+    async def delete_many(self, query):
+        if self.fail:
+            raise RuntimeError("mongo down")
+        self.log.append(("mongo", "delete_many"))
+
+
+class FakeIndexCache:
+    def evict(self, session_ids):
+        pass
+
+
+def collector(monkeypatch, tmp_path, mongo_fails=False):
+    pool = RecordingPool(locked=["s1"])
+    (tmp_path / "s1").mkdir()
+    (tmp_path / "s1" / "a.pdf").write_bytes(b"x" * 10)
+    monkeypatch.setattr(session_gc, "get_pg_pool", lambda: asyncio.sleep(0, pool))
+    monkeypatch.setattr(session_gc, "collection", FakeCollection(pool.log, fail=mongo_fails))
+    monkeypatch.setattr(session_gc, "get_session_index_cache", FakeIndexCache)
+    monkeypatch.setattr(session_gc, "BASE_UPLOAD_DIR", str(tmp_path))
+    return SessionGarbageCollector(batch_size=10), pool.log
+
+
+def position(log, prefix):
+    return next((i for i, (_, statement) in enumerate(log) if statement.startswith(prefix)), None)
+
+
+def test_external_stores_go_before_the_session_rows(monkeypatch, tmp_path):
+    gc, log = collector(monkeypatch, tmp_path)
+
+    report = asyncio.run(gc._collect_batch(["s1", "s2"], dry_run=False))
+
+    assert position(log, "delete_many") < position(log, "DELETE FROM sessions")
+    assert log[-1] == ("pg", "COMMIT")
+    assert not (tmp_path / "s1").exists()
+    assert report["sessions"] == 1
+    assert report["upload_files"] == 1
+
+
+def test_failed_mongo_delete_keeps_the_session_for_the_next_run(monkeypatch, tmp_path):
+    gc, log = collector(monkeypatch, tmp_path, mongo_fails=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(gc._collect_batch(["s1", "s2"], dry_run=False))
+
+    assert position(log, "DELETE FROM sessions") is None
+    assert log[-1] == ("pg", "ROLLBACK")
+    assert (tmp_path / "s1" / "a.pdf").exists()
@@ -0,0 +1,157 @@
+import asyncio
+
+import numpy as np
+from langchain_core.documents import Document
+
+import mongodb.insert_chunks as insert_chunks_module
+import mongodb.session_index as session_index
+import tools.vector_search as vector_search
+from mongodb.insert_chunks import insert_chunks
+from mongodb.session_index import PAYLOAD_OVERHEAD_BYTES, SessionIndex, SessionIndexCache
+
+DIM = 16
+NO_HNSW = 10 ** 9
+
+
+def random_docs(session_id, count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"_id": f"{session_id}-{i}", "session_id": session_id, "source": "a.pdf", "chunk_index": i,
+         "text": "", "embedding": rng.standard_normal(DIM).tolist()}
+        for i in range(count)
+    ]
+
+
+class FakeCollection:
+    """find().to_list() by session for the index loads, insert_many for chunk writes."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.gate = None
+
+    def find(self, query, projection):
+        # Snapshot at query time: a gated load misses writes made while it waits
+        found = [dict(d) for d in self.docs if d["session_id"] == query["session_id"]]
+        gate = self.gate
+
+        class Cursor:
+            async def to_list(self, length=None):
+                if gate is not None:
+                    await gate.wait()
+                return found
+
+        return Cursor()
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+        class Result:
+            inserted_ids = [d["_id"] for d in docs]
+        return Result()
+
+
+def use_collection(monkeypatch, fake):
+    monkeypatch.setattr(session_index, "collection", fake)
+    return fake
+
+
+def test_exact_search_matches_brute_force():
+    docs = random_docs("s1", 300)
+    index = SessionIndex.build(docs, hnsw_min=NO_HNSW)
+    query = np.random.default_rng(1).standard_normal(DIM).astype(np.float32)
+    query /= np.linalg.norm(query)
+
+    hits = index.search(query, 10)
+
+    vectors = np.asarray([d["embedding"] for d in docs], dtype=np.float32)
+    cosines = vectors @ query / np.linalg.norm(vectors, axis=1)
+    expected = np.argsort(-cosines)[:10]
+    assert index.hnsw is None
+    assert [h["chunk_index"] for h in hits] == expected.tolist()
+    assert np.allclose([h["score"] for h in hits], (1 + cosines[expected]) / 2, atol=1e-5)
+    assert "embedding" not in hits[0] and "_id" not in hits[0]
+
+
+def test_least_recently_used_session_is_evicted_over_budget(monkeypatch):
+    use_collection(monkeypatch, FakeCollection(
+        random_docs("s1", 10) + random_docs("s2", 10) + random_docs("s3", 10)
+    ))
+    per_session = 10 * (DIM * 4 + PAYLOAD_OVERHEAD_BYTES)
+    cache = SessionIndexCache(memory_mb=2.5 * per_session / (1024 * 1024), hnsw_min=NO_HNSW)
+    query = [1.0] * DIM
+
+    async def scenario():
+        await cache.search("s1", query, 3)
+        await cache.search("s2", query, 3)
+        # s1 is now the more recently used of the two
+        await cache.search("s1", query, 3)
+        await cache.search("s3", query, 3)
+
+    asyncio.run(scenario())
+
+    assert list(cache._indexes) == ["s1", "s3"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["memory_bytes"] <= cache.budget
+
+
+def test_chunks_written_during_a_load_mark_it_stale(monkeypatch):
+    fake = use_collection(monkeypatch, FakeCollection(random_docs("s1", 5)))
+    cache = SessionIndexCache(hnsw_min=NO_HNSW)
+    monkeypatch.setattr(insert_chunks_module, "collection", fake)
+    monkeypatch.setattr(insert_chunks_module, "LOCAL_VECTOR_INDEX_ENABLED", True)
+    monkeypatch.setattr(insert_chunks_module, "get_session_index_cache", lambda: cache)
+    new_chunk = Document(page_content="fresh", metadata={"session_id": "s1", "source": "b.pdf", "chunk_index": 0})
+    query = [1.0] + [0.0] * (DIM - 1)
+
+    async def scenario():
+        fake.gate = asyncio.Event()
+        loading = asyncio.create_task(cache.search("s1", query, 10))
+        await asyncio.sleep(0)
+        await insert_chunks([new_chunk], vectors=[query])
+        fake.gate.set()
+        during = await loading
+        after = await cache.search("s1", query, 10)
+        return during, after
+
+    during, after = asyncio.run(scenario())
+
+    # The load began before the write, so it is served once but not kept
+    assert len(during) == 5
+    assert len(after) == 6
+    assert after[0]["source"] == "b.pdf"
+    assert cache.stats()["loads"] == 2
+
+
+def test_atlas_answers_while_the_session_loads_in_the_background(monkeypatch):
+    fake = use_collection(monkeypatch, FakeCollection(random_docs("s1", 5)))
+    cache = SessionIndexCache(hnsw_min=NO_HNSW)
+
+    class Embedder:
+        async def aembed_query(self, text):
+            return [1.0] * DIM
+
+    async def atlas_search(query_vector, session_id, num_chunks, min_score):
+        return [{"text": "from atlas", "score": 0.9}]
+
+    monkeypatch.setattr(vector_search, "get_embedding_service", lambda: Embedder())
+    monkeypatch.setattr(vector_search, "get_session_index_cache", lambda: cache)
+    monkeypatch.setattr(vector_search, "LOCAL_VECTOR_INDEX_ENABLED", True)
+    monkeypatch.setattr(vector_search, "ATLAS_VECTOR_SEARCH", True)
+    monkeypatch.setattr(vector_search, "_atlas_search", atlas_search)
+
+    async def scenario():
+        fake.gate = asyncio.Event()
+        cold = await vector_search._vector_hits("question", "s1", 3)
+        await asyncio.sleep(0)
+        loading = cache.stats()["loading"]
+        fake.gate.set()
+        await asyncio.gather(*cache._background)
+        warm = await vector_search._vector_hits("question", "s1", 3)
+        return cold, loading, warm
+
+    cold, loading, warm = asyncio.run(scenario())
+
+    assert cold == [{"text": "from atlas", "score": 0.9}]
+    assert loading == 1
+    assert len(warm) == 3
+    assert all(hit["source"] == "a.pdf" for hit in warm)
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from modules.stream_pipeline import iterate_in_thread
+
+
+class Pages:
+    """Stands in for read_pdf_pages: records the thread of every step and the close."""
+
+    def __init__(self, count):
+        self.count = count
+        self.threads = set()
+        self.closed = False
+
+    def __call__(self):
+        self.threads.add(threading.get_ident())
+        try:
+            for i in range(self.count):
+                self.threads.add(threading.get_ident())
+                yield i
+        finally:
+            self.threads.add(threading.get_ident())
+            self.closed = True
+
+
+def test_iterator_stays_on_one_thread():
+    pages = Pages(20)
+
+    async def consume():
+        return [page async for page in iterate_in_thread(pages)]
+
+    assert asyncio.run(consume()) == list(range(20))
+    assert len(pages.threads) == 1
+    assert threading.get_ident() not in pages.threads
+    assert pages.closed
+
+
+def test_early_stop_closes_the_iterator_on_its_thread():
+    pages = Pages(20)
+
+    async def consume():
+        stream = iterate_in_thread(pages)
+        async for page in stream:
+            if page == 2:
+                break
+        await stream.aclose()
+
+    asyncio.run(consume())
+
+    assert pages.closed
+    assert len(pages.threads) == 1
@@ -0,0 +1,51 @@
+import pytest
+
+import global_modules.token_counter as token_counter
+from global_modules.token_counter import embedding_token_count, embedding_token_counts
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word; counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        return text.split()
+
+    def __call__(self, texts, add_special_tokens=False):
+        self.calls += 1
+        return {"input_ids": [t.split() for t in texts]}
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    fake = WordTokenizer()
+    monkeypatch.setattr(token_counter, "_embedding_tokenizer", lambda: fake)
+    token_counter._short_embedding_token_count.cache_clear()
+    yield fake
+    token_counter._short_embedding_token_count.cache_clear()
+
+
+def test_short_pieces_are_counted_once(tokenizer):
+    for _ in range(100):
+        assert embedding_token_count("the") == 1
+        assert embedding_token_count(" ") == 0
+
+    assert tokenizer.calls == 2
+
+
+def test_batch_counts_match_single_counts_in_one_call(tokenizer):
+    texts = ["a b c", "", "one two three four five six seven eight nine ten eleven"]
+
+    assert embedding_token_counts(texts) == [3, 0, 11]
+    assert tokenizer.calls == 1
+    assert [embedding_token_count(t) for t in texts] == [3, 0, 11]
+
+
+def test_length_estimate_without_tokenizer(monkeypatch):
+    monkeypatch.setattr(token_counter, "_embedding_tokenizer", lambda: None)
+
+    assert embedding_token_count("x" * 9) == 3
+    assert embedding_token_counts(["x" * 8, ""]) == [2, 0]
@@ -0,0 +1,61 @@
+import pytest
+
+import modules.transcript_service as transcript_service
+from modules.transcript_service import chunk_segments
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One embedding token per word."""
+    monkeypatch.setattr(
+        transcript_service, "embedding_token_counts", lambda texts: [len(t.split()) for t in texts]
+    )
+
+
+def segments(*word_counts):
+    return [
+        {"text": " ".join(f"w{i}_{j}" for j in range(n)), "start": 2.0 * i, "duration": 2.0}
+        for i, n in enumerate(word_counts)
+    ]
+
+
+def chunk(segs, size, overlap):
+    return chunk_segments(segs, "Talk", "vid", chunk_size=size, chunk_overlap=overlap)
+
+
+def test_chunks_never_cut_a_segment_and_respect_the_size():
+    segs = segments(3, 3, 3, 3, 3, 3)
+
+    chunks = chunk(segs, size=7, overlap=0)
+
+    assert [c.page_content.count(" ") + 1 for c in chunks] == [6, 6, 6]
+    assert [(c.metadata["start_time"], c.metadata["end_time"]) for c in chunks] == [
+        (0.0, 4.0), (4.0, 8.0), (8.0, 12.0),
+    ]
+
+
+def test_overlap_carries_trailing_segments():
+    segs = segments(3, 3, 3, 3, 3)
+
+    chunks = chunk(segs, size=6, overlap=3)
+
+    # Each chunk starts on the last segment of the previous one
+    assert [c.metadata["start_time"] for c in chunks] == [0.0, 2.0, 4.0, 6.0]
+    assert chunks[-1].metadata["end_time"] == 10.0
+
+
+def test_offsets_point_into_the_joined_transcript():
+    segs = segments(2, 4, 1, 3, 5)
+    transcript = " ".join(s["text"] for s in segs)
+
+    chunks = chunk(segs, size=6, overlap=2)
+
+    for c in chunks:
+        assert transcript[c.metadata["char_start"]:c.metadata["char_end"]] == c.page_content
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(len(chunks)))
+
+
+def test_oversized_segment_is_its_own_chunk():
+    chunks = chunk(segments(2, 9, 2), size=5, overlap=0)
+
+    assert [c.page_content.count(" ") + 1 for c in chunks] == [2, 9, 2]
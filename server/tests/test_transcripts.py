@@ -0,0 +1,143 @@
+import asyncio
+
+import modules.get_transcript as get_transcript
+import modules.load_transcript as load_transcript
+import modules.transcript_service as transcript_service
+from modules.get_transcript import Transcript
+from modules.transcript_service import TranscriptService
+
+URL_A = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+URL_B = "https://www.youtube.com/watch?v=bbbbbbbbbbb"
+
+
+def entry(title):
+    return {
+        "manifest": {"source": title},
+        "chunks": [{"ordinal": 0, "text": f"{title} text", "embedding": [0.0, 1.0]}],
+    }
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_build(monkeypatch):
+    service = TranscriptService()
+    builds = []
+
+    async def build(key, url, video_id, chunk_size, chunk_overlap):
+        builds.append(video_id)
+        await asyncio.sleep(0.05)
+        return entry("A")
+
+    monkeypatch.setattr(service, "_load_or_build", build)
+
+    async def run():
+        owner = asyncio.create_task(service.get(URL_A, 256, 32))
+        await asyncio.sleep(0.01)
+        joiner = asyncio.create_task(service.get(URL_A, 256, 32))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await joiner
+
+    assert asyncio.run(run()) == entry("A")
+    assert builds == ["aaaaaaaaaaa"]
+    assert service.stats()["joined_inflight"] == 1
+    assert service.stats()["inflight"] == 0
+
+
+def test_unknown_title_is_named_after_the_video(monkeypatch):
+    async def no_title(url):
+        return None
+
+    monkeypatch.setattr(get_transcript, "get_video_title", no_title)
+    monkeypatch.setattr(get_transcript, "_fetch_raw_transcript", lambda video_id: [{"text": "hi", "start": 0.0}])
+
+    transcript = asyncio.run(get_transcript.fetch_transcript(URL_A))
+
+    assert transcript.title == "YouTube video aaaaaaaaaaa"
+    assert not transcript.title_known
+
+
+def test_transcript_without_a_title_is_not_stored(monkeypatch):
+    service = TranscriptService()
+    stored = []
+
+    async def nothing_stored(key):
+        return None
+
+    async def fetch(url):
+        video_id = get_transcript.extract_video_id(url)
+        return Transcript(video_id, f"YouTube video {video_id}", [{"text": "hi", "start": 0.0, "duration": 1.0}], False)
+
+    async def embed(chunks):
+        return [[0.0, 1.0] for _ in chunks]
+
+    async def save(key, *args, **kwargs):
+        stored.append(key)
+
+    monkeypatch.setattr(transcript_service, "load_stored_document", nothing_stored)
+    monkeypatch.setattr(transcript_service, "fetch_transcript", fetch)
+    monkeypatch.setattr(transcript_service, "embed_chunks", embed)
+    monkeypatch.setattr(transcript_service, "save_stored_chunks", save)
+    monkeypatch.setattr(transcript_service, "finalize_stored_document", save)
+
+    async def run():
+        return await service.get(URL_A, 256, 32), await service.get(URL_B, 256, 32)
+
+    a, b = asyncio.run(run())
+
+    assert a["manifest"]["source"] == "YouTube video aaaaaaaaaaa"
+    assert b["manifest"]["source"] == "YouTube video bbbbbbbbbbb"
+    assert stored == []
+    assert service.stats()["fetches"] == 2
+
+
+class FakeService:
+    async def get(self, url, chunk_size, chunk_overlap):
+        return entry(url[-1])
+
+
+def bulk_events(monkeypatch, insert_chunks):
+    monkeypatch.setattr(load_transcript, "get_transcript_service", FakeService)
+    monkeypatch.setattr(load_transcript, "insert_chunks", insert_chunks)
+
+    async def no_links(session_id, links):
+        pass
+
+    monkeypatch.setattr(load_transcript, "append_links_to_db", no_links)
+
+    async def run():
+        return [e async for e in load_transcript.load_transcripts_bulk([URL_A, URL_B], "s1")]
+
+    return asyncio.run(run())
+
+
+def statuses(events):
+    return [(e["data"]["video_id"], e["data"]["status"]) for e in events if e["type"] == "video"]
+
+
+def test_videos_are_ready_only_after_the_bulk_write(monkeypatch):
+    written = []
+
+    async def insert_chunks(chunks, vectors):
+        written.extend(chunks)
+
+    events = bulk_events(monkeypatch, insert_chunks)
+
+    ready = [s for s in statuses(events) if s[1] == "ready"]
+    assert ready == [("aaaaaaaaaaa", "ready"), ("bbbbbbbbbbb", "ready")]
+    assert statuses(events).index(ready[0]) > max(
+        i for i, s in enumerate(statuses(events)) if s[1] == "fetched"
+    )
+    assert len(written) == 2
+    assert events[-1]["data"] == {"videos_loaded": 2, "videos_failed": 0, "chunks": 2}
+
+
+def test_failed_bulk_write_reports_every_video_failed(monkeypatch):
+    async def insert_chunks(chunks, vectors):
+        raise RuntimeError("mongo down")
+
+    events = bulk_events(monkeypatch, insert_chunks)
+
+    assert not [s for s in statuses(events) if s[1] == "ready"]
+    assert sorted(s for s in statuses(events) if s[1] == "failed") == [
+        ("aaaaaaaaaaa", "failed"), ("bbbbbbbbbbb", "failed"),
+    ]
+    assert events[-1]["data"] == {"videos_loaded": 0, "videos_failed": 2, "chunks": 0}
@@ -0,0 +1,46 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import modules.pdf_handlers as pdf_handlers
+from modules.pdf_handlers import UPLOAD_FORM_OVERHEAD_BYTES, UPLOAD_PATH, reject_oversized_upload
+
+
+def client(monkeypatch, limit):
+    monkeypatch.setattr(pdf_handlers, "MAX_UPLOAD_REQUEST_BYTES", limit)
+    app = FastAPI()
+    app.middleware("http")(reject_oversized_upload)
+    reads = []
+
+    @app.post(UPLOAD_PATH)
+    async def upload(request: Request):
+        reads.append(len(await request.body()))
+        return {"ok": True}
+
+    return TestClient(app), reads
+
+
+def test_oversized_content_length_is_refused_before_the_body_is_read(monkeypatch):
+    http, reads = client(monkeypatch, limit=1000)
+
+    response = http.post(UPLOAD_PATH, content=b"x" * (1000 + UPLOAD_FORM_OVERHEAD_BYTES + 1))
+
+    assert response.status_code == 413
+    assert reads == []
+
+
+def test_uploads_within_the_limit_pass(monkeypatch):
+    http, reads = client(monkeypatch, limit=1000)
+
+    response = http.post(UPLOAD_PATH, content=b"x" * 1500)
+
+    assert response.status_code == 200
+    assert reads == [1500]
+
+
+def test_invalid_content_length_is_rejected(monkeypatch):
+    http, reads = client(monkeypatch, limit=1000)
+
+    response = http.post(UPLOAD_PATH, content=b"x", headers={"content-length": "lots"})
+
+    assert response.status_code == 400
+    assert reads == []
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from bson import BSON
+from bson.binary import Binary
+
+from mongodb.vector_codec import decode_vector, encode_vector, quantize_int8, stored_format
+
+
+@pytest.fixture
+def vector():
+    v = np.random.default_rng(7).standard_normal(384).astype(np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def roundtrip(value):
+    """Through BSON, as Mongo stores and returns it."""
+    return BSON.decode(BSON.encode({"embedding": value}))["embedding"]
+
+
+def test_float_list_is_exact(vector):
+    stored = roundtrip(encode_vector(vector, "float_list"))
+
+    assert stored_format(stored) == "float_list"
+    assert decode_vector(stored) == [float(x) for x in vector]
+
+
+def test_float32_is_exact_and_packed(vector):
+    encoded = encode_vector(vector, "float32")
+    stored = roundtrip(encoded)
+
+    assert isinstance(stored, Binary)
+    assert stored_format(stored) == "float32"
+    assert len(stored) <= 4 * len(vector) + 2
+    assert decode_vector(stored) == np.asarray(vector, dtype=np.float32).tolist()
+
+
+def test_int8_keeps_the_direction(vector):
+    stored = roundtrip(encode_vector(vector, "int8"))
+
+    assert stored_format(stored) == "int8"
+    assert len(stored) <= len(vector) + 2
+    decoded = decode_vector(stored)
+    assert max(abs(x) for x in decoded) == 127
+    assert cosine(decoded, vector) > 0.999
+
+
+def test_int8_of_a_zero_vector():
+    assert quantize_int8([0.0, 0.0, 0.0]) == [0, 0, 0]
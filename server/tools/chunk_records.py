@@ -0,0 +1,38 @@
+import hashlib
+from typing import Optional
+
+from state.state import RetrievedChunk
+from global_modules.token_counter import llm_token_count
+
+
+def chunk_record_id(source_type: str, *parts) -> str:
+    raw = "\x00".join([source_type, *(str(p) for p in parts)])
+    return f"{source_type}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]}"
+
+
+def make_chunk_record(
+    chunk_id: str,
+    source_type: str,
+    source_name: str,
+    content: str,
+    score: Optional[float] = None,
+    location: Optional[str] = None,
+    token_count: Optional[int] = None,
+    match_content: Optional[str] = None,
+    match_token_count: Optional[int] = None,
+) -> RetrievedChunk:
+    """Builds a retrieval record; tokens are counted here unless already known."""
+    record = {
+        "chunk_id": chunk_id,
+        "source_type": source_type,
+        "source_name": source_name,
+        "content": content,
+        "score": score,
+        "location": location,
+        "token_count": token_count or llm_token_count(content),
+    }
+    # Only for neighbor-expanded content, and only when it differs
+    if match_content and match_content != content:
+        record["match_content"] = match_content
+        record["match_token_count"] = match_token_count or llm_token_count(match_content)
+    return record
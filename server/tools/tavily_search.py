@@ -1,10 +1,15 @@
-
 import logging
+from typing import List
+
+from state.state import RetrievedChunk
+from tools.chunk_records import chunk_record_id, make_chunk_record
+
 logger = logging.getLogger(__name__)
 
-async def run_tavily_search(client, query: str, max_results: int = 3) -> str:
+async def run_tavily_search(client, query: str, max_results: int = 3) -> List[RetrievedChunk]:
     """
-    Fetches search results and formats them with metadata for better LLM grounding.
+    Fetches search results as one record per result, with title, URL and score
+    kept as provenance for better LLM grounding.
     """
     try:
         # 1. Execute search
@@ -15,29 +20,31 @@ async def run_tavily_search(client, query: str, max_results: int = 3) -> str:
         )
         
         results = response.get("results", [])
-        if not results:
-            return "No relevant search results found."
 
-        # 2. Format it with metadata
-        # Adding Title and URL helps the LLM avoid 'hallucinating' source info
-        formatted_results = []
-        for i, res in enumerate(results, 1):
+        # 2. One record per result
+        # Title and URL help the LLM avoid 'hallucinating' source info
+        records = []
+        for res in results:
             title = res.get("title", "No Title")
             url = res.get("url", "No URL")
             content = res.get("content", "").strip()
             score = res.get("score", 0)
 
             # Optional: Filter out very low relevance results
-            if score < 0.3: 
+            if score < 0.3 or not content: 
                 continue
 
-            entry = f"[{i}] Source: {title}\nURL: {url}\nContent: {content}\n"
-            formatted_results.append(entry)
+            records.append(make_chunk_record(
+                chunk_record_id("internet", url, content),
+                source_type="internet",
+                source_name=title,
+                content=content,
+                score=score,
+                location=url,
+            ))
 
-        # 3. Join and Truncate
-        final_context = "\n---\n".join(formatted_results)
-        return final_context[:7000] 
+        return records
 
     except Exception as e:
         logger.error(f"❌ Tavily API logic failed: {str(e)}", exc_info=True)
-        return "Error: Unable to fetch search results at this time."
+        return []
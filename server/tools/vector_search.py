@@ -1,63 +1,376 @@
+import os
+import asyncio
 import logging
+from collections import defaultdict
+from typing import Any, Dict, List
 logger = logging.getLogger(__name__)
-from global_modules.embeddings import embeddings as embeddings_model
+from global_modules.embedding_service import get_embedding_service
 from global_modules.mongo_collections import collection
-async def run_vector_search(query: str, session_id: str) -> str:
+from mongodb.insert_chunks import source_prefix
+from mongodb.vector_codec import encode_query_vector
+from mongodb.session_index import LOCAL_VECTOR_INDEX_ENABLED, get_session_index_cache
+from pymongo.errors import OperationFailure
+from state.state import RetrievedChunk
+from tools.chunk_records import chunk_record_id, make_chunk_record
+
+# Top-k hits; with neighbor expansion a smaller k gives the same context
+VECTOR_SEARCH_LIMIT = int(os.getenv("VECTOR_SEARCH_LIMIT", "4"))
+VECTOR_SEARCH_NUM_CANDIDATES = int(os.getenv("VECTOR_SEARCH_NUM_CANDIDATES", "200"))
+# Chunks fetched on each side of every hit (0 disables expansion)
+VECTOR_SEARCH_NEIGHBORS = int(os.getenv("VECTOR_SEARCH_NEIGHBORS", "1"))
+# false: the database is a plain MongoDB; only the local per-session index searches
+ATLAS_VECTOR_SEARCH = os.getenv("ATLAS_VECTOR_SEARCH", "true").lower() == "true"
+# vector | hybrid (vector + session-filtered $text search, fused with RRF)
+VECTOR_SEARCH_MODE = os.getenv("VECTOR_SEARCH_MODE", "vector")
+# Both searches run concurrently; whatever has not answered by then is dropped
+HYBRID_SEARCH_TIMEOUT_MS = float(os.getenv("HYBRID_SEARCH_TIMEOUT_MS", "1500"))
+# Standard RRF damping constant: 1 / (k + rank)
+RRF_K = 60
+
+# Vector hits below this cosine score are dropped
+VECTOR_MIN_SCORE = 0.4
+# Lexical hits the vector search did not also find need this textScore
+# (roughly: two query terms matched, or one matched repeatedly)
+LEXICAL_MIN_SCORE = float(os.getenv("LEXICAL_MIN_SCORE", "1.0"))
+
+HIT_PROJECTION = {
+    "_id": 0,
+    "text": 1,
+    "source": 1, # Useful if you store filenames/URLs
+    "chunk_index": 1,
+    "page": 1,
+    "page_end": 1,
+    "video_id": 1,
+    "start_time": 1,
+    "end_time": 1,
+    "token_count": 1,
+}
+
+
+def _content(doc):
+    """Stored text minus the "SOURCE:" header that was only added for embedding."""
+    text = doc.get("text", "")
+    prefix = source_prefix(doc.get("source"))
+    return text[len(prefix):] if text.startswith(prefix) else text
+
+
+def _clock(seconds):
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def cite_location(doc):
+    """Page range of a PDF chunk, or time range plus a `t=` link of a transcript chunk."""
+    if doc.get("start_time") is not None:
+        span = f"{_clock(doc['start_time'])}-{_clock(doc.get('end_time') or doc['start_time'])}"
+        if doc.get("video_id"):
+            return f"{span}, https://youtu.be/{doc['video_id']}?t={int(doc['start_time'])}"
+        return span
+    if doc.get("page"):
+        pages = doc["page"] if doc.get("page_end") in (None, doc["page"]) else f"{doc['page']}-{doc['page_end']}"
+        return f"page {pages}"
+    return None
+
+
+def _merge_run(run):
+    """Joins consecutive chunks, dropping the overlap their char offsets reveal."""
+    merged = _content(run[0])
+    for prev, doc in zip(run, run[1:]):
+        text = _content(doc)
+        overlap = 0
+        if doc.get("char_start") is not None and prev.get("char_end") is not None:
+            overlap = prev["char_end"] - doc["char_start"]
+        merged += text[overlap:] if 0 < overlap <= len(text) else " " + text
+    return merged
+
+
+async def expand_neighbors(hits, session_id, neighbors):
     """
-    Search the vector database and return formatted context chunks.
+    Returns the hits grouped with their ±`neighbors` chunks, fetched in one query.
+    Each group is {"source", "score", "text", "chunk_index", "chunk_index_end", "page", "page_end",
+    "video_id", "start_time", "end_time", "token_count", "match_text", "match_token_count"};
+    overlapping or adjacent windows of the same source are merged into one group.
+    `match_text` spans only the matched chunks of the group, without the neighbors around them.
     """
-    try:
-        # 1. Generate Embedding
-        query_vector = await embeddings_model.aembed_query(query)
-        min_score = 0.4
-        num_chunks= 6
+    windows = defaultdict(list)
+    groups = []
+    for hit in hits:
+        if hit.get("chunk_index") is None:
+            # Chunks written before chunk positions existed cannot be expanded
+            groups.append({**hit, "text": _content(hit)})
+            continue
+        windows[hit["source"]].append(hit)
 
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "embedding_index",
-                    "queryVector": query_vector,
-                    "path": "embedding",
-                    "numCandidates": 400,
-                    "limit": num_chunks, 
-                    "filter": {"session_id": session_id},
-                }
-            },
+    if windows:
+        clauses = [
+            {"source": source, "chunk_index": {"$gte": h["chunk_index"] - neighbors, "$lte": h["chunk_index"] + neighbors}}
+            for source, source_hits in windows.items()
+            for h in source_hits
+        ]
+        cursor = collection.find(
+            {"session_id": session_id, "$or": clauses},
             {
-                "$project": {
-                    "_id": 0, 
-                    "text": 1, 
-                    "source": 1, # Useful if you store filenames/URLs
-                    "score": {"$meta": "vectorSearchScore"}
-                }
+                "_id": 0, "text": 1, "source": 1, "chunk_index": 1, "page": 1, "page_end": 1,
+                "char_start": 1, "char_end": 1, "token_count": 1,
+                "video_id": 1, "start_time": 1, "end_time": 1,
             },
-            {"$match": {"score": {"$gte": min_score}}}
+        )
+        fetched = defaultdict(dict)
+        async for doc in cursor:
+            fetched[doc["source"]][doc["chunk_index"]] = doc
+
+        for source, source_hits in windows.items():
+            scores = {h["chunk_index"]: h["score"] for h in source_hits}
+            wanted = sorted({
+                i for h in source_hits
+                for i in range(h["chunk_index"] - neighbors, h["chunk_index"] + neighbors + 1)
+                if i in fetched[source]
+            })
+            # Split the wanted indices into contiguous runs
+            run = []
+            for i in wanted + [None]:
+                if run and (i is None or i != run[-1] + 1):
+                    docs = [fetched[source][j] for j in run]
+                    matched = [k for k, j in enumerate(run) if j in scores]
+                    match_docs = docs[matched[0]:matched[-1] + 1] if matched else docs
+                    groups.append({
+                        "source": source,
+                        "chunk_index": run[0],
+                        "chunk_index_end": run[-1],
+                        "score": max(scores.get(j, 0) for j in run),
+                        "text": _merge_run(docs),
+                        "page": docs[0].get("page"),
+                        "page_end": docs[-1].get("page_end"),
+                        "video_id": docs[0].get("video_id"),
+                        "start_time": docs[0].get("start_time"),
+                        "end_time": docs[-1].get("end_time"),
+                        # Overlap is counted twice, so this slightly overestimates
+                        "token_count": (
+                            sum(d["token_count"] for d in docs)
+                            if all(d.get("token_count") for d in docs) else None
+                        ),
+                        # The hits alone, kept when the neighbors do not fit the prompt
+                        "match_text": _merge_run(match_docs),
+                        "match_token_count": (
+                            sum(d["token_count"] for d in match_docs)
+                            if all(d.get("token_count") for d in match_docs) else None
+                        ),
+                    })
+                    run = []
+                if i is not None:
+                    run.append(i)
+
+    return sorted(groups, key=lambda g: g.get("score", 0), reverse=True)
+
+
+async def _atlas_search(query_vector, session_id: str, num_chunks: int, min_score: float) -> List[Dict[str, Any]]:
+    pipeline = [
+        {
+            "$vectorSearch": {
+                "index": "embedding_index",
+                "queryVector": encode_query_vector(query_vector),
+                "path": "embedding",
+                "numCandidates": VECTOR_SEARCH_NUM_CANDIDATES,
+                "limit": num_chunks, 
+                "filter": {"session_id": session_id},
+            }
+        },
+        {
+            "$project": {
+                **HIT_PROJECTION,
+                "score": {"$meta": "vectorSearchScore"}
+            }
+        },
+        {"$match": {"score": {"$gte": min_score}}}
+    ]
+    
+    # 2. Execution (Motor for MongoDB uses 'async for' or 'to_list')
+    cursor = collection.aggregate(pipeline)
+    return await cursor.to_list(length=num_chunks)
+
+
+async def _vector_hits(query: str, session_id: str, num_chunks: int) -> List[Dict[str, Any]]:
+    # 1. Generate Embedding (repeat queries are answered from the cache's memory tier)
+    query_vector = await get_embedding_service().aembed_query(query)
+
+    if LOCAL_VECTOR_INDEX_ENABLED:
+        # Warm sessions are answered from memory. Cold ones load in the background
+        # while Atlas answers, or in the foreground when there is no Atlas search.
+        try:
+            results = await get_session_index_cache().search(
+                session_id, query_vector, num_chunks, VECTOR_MIN_SCORE, wait=not ATLAS_VECTOR_SEARCH
+            )
+            if results is not None:
+                return results
+        except Exception as e:
+            logger.error(f"🔴 Local vector index failed, using Atlas: {e}")
+
+    try:
+        return await _atlas_search(query_vector, session_id, num_chunks, VECTOR_MIN_SCORE)
+    except OperationFailure as e:
+        if not LOCAL_VECTOR_INDEX_ENABLED:
+            raise
+        # Plain MongoDB without Atlas Search
+        logger.warning(f"🔴 $vectorSearch unavailable ({e}), searching the local index")
+        return await get_session_index_cache().search(session_id, query_vector, num_chunks, VECTOR_MIN_SCORE)
+
+
+def text_search_query(query: str) -> str:
+    """
+    The query as plain $text terms: quotes would make phrases and a leading
+    "-" a negation, so "-v flag" must not exclude every chunk mentioning "v".
+    """
+    terms = (term.lstrip("-") for term in query.replace('"', " ").split())
+    return " ".join(term for term in terms if term)
+
+
+async def lexical_search(query: str, session_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Session-filtered MongoDB $text search: finds exact identifiers, error codes
+    and names that the embedding model blurs. Best textScore first.
+    """
+    terms = text_search_query(query)
+    if not terms:
+        return []
+    cursor = collection.find(
+        {"session_id": session_id, "$text": {"$search": terms}},
+        {**HIT_PROJECTION, "score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+def _hit_key(hit):
+    if hit.get("chunk_index") is not None:
+        return hit.get("source"), hit["chunk_index"]
+    return hit.get("text")
+
+
+def rrf_fuse(result_lists: List[List[Dict[str, Any]]], limit: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Reciprocal rank fusion: each hit scores sum(1 / (k + rank)) over the lists
+    it appears in. The fused score replaces the per-list scores.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    scores: Dict[Any, float] = defaultdict(float)
+    for results in result_lists:
+        for rank, hit in enumerate(results, 1):
+            key = _hit_key(hit)
+            fused.setdefault(key, hit)
+            scores[key] += 1.0 / (k + rank)
+
+    ranked = sorted(fused, key=lambda key: scores[key], reverse=True)[:limit]
+    return [{**fused[key], "score": scores[key]} for key in ranked]
+
+
+_hybrid_counts = {"fused": 0, "vector_only": 0, "lexical_only": 0, "empty": 0}
+
+
+def hybrid_search_stats() -> Dict[str, Any]:
+    """How often hybrid searches ran on both sides or degraded to one."""
+    return {"mode": VECTOR_SEARCH_MODE, **_hybrid_counts}
+
+
+async def _hybrid_hits(query: str, session_id: str, num_chunks: int) -> List[Dict[str, Any]]:
+    """Vector and lexical search side by side, fused, within HYBRID_SEARCH_TIMEOUT_MS."""
+    searches = {
+        "vector": asyncio.create_task(_vector_hits(query, session_id, num_chunks)),
+        "lexical": asyncio.create_task(lexical_search(query, session_id, num_chunks)),
+    }
+    done, pending = await asyncio.wait(searches.values(), timeout=HYBRID_SEARCH_TIMEOUT_MS / 1000)
+    for task in pending:
+        task.cancel()
+    # Let the late search unwind (close its cursor) before moving on
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for name, task in searches.items():
+        if task not in done:
+            logger.warning("🔴 %s search missed the %.0f ms budget", name, HYBRID_SEARCH_TIMEOUT_MS)
+        elif task.exception() is not None:
+            # e.g. no text index yet: the other side still answers
+            logger.error(f"🔴 {name} search failed: {task.exception()}")
+        else:
+            results[name] = task.result()
+
+    if "lexical" in results:
+        # Term overlap alone is weak evidence; keep it only when strong
+        found = {_hit_key(hit) for hit in results.get("vector", [])}
+        results["lexical"] = [
+            hit for hit in results["lexical"]
+            if _hit_key(hit) in found or hit.get("score", 0) >= LEXICAL_MIN_SCORE
         ]
-        
-        # 2. Execution (Motor for MongoDB uses 'async for' or 'to_list')
-        cursor = collection.aggregate(pipeline)
-        results = await cursor.to_list(length=num_chunks)
-
-        # if not results:
-        #     logger.info(f"No vector results for session {session_id} above score {min_score}")
-        #     return "No relevant information found in the uploaded documents."
-        # else:
-        #     logger.info(f"query: {query}")
-        #     logger.info(f"vector result: {results}")
-
-        # 3. Formatting for the LLM
-        # Using [Chunk X] helps the LLM distinguish between separate parts of a PDF/Video
-        formatted_chunks = []
-        for i, doc in enumerate(results, 1):
-            text = doc.get("text", "").strip()
-            source = doc.get("source", "Internal Doc")
-            score = round(doc.get("score", 0), 3)
-            
-            chunk = f"--- Document Chunk {i} (Relevance: {score}) ---\nSource: {source}\nContent: {text}"
-            formatted_chunks.append(chunk)
-
-        return "\n\n".join(formatted_chunks)
+
+    if len(results) == 2:
+        _hybrid_counts["fused"] += 1
+        return rrf_fuse([results["vector"], results["lexical"]], num_chunks)
+    if "vector" in results:
+        _hybrid_counts["vector_only"] += 1
+        return results["vector"]
+    if "lexical" in results:
+        _hybrid_counts["lexical_only"] += 1
+        logger.warning(
+            "🔴 Degraded search for session %s: %d lexical-only hits, no vector ranking",
+            session_id, len(results["lexical"]),
+        )
+        return results["lexical"]
+    _hybrid_counts["empty"] += 1
+    return []
+
+
+async def search_vector_chunks(query: str, session_id: str) -> List[Dict[str, Any]]:
+    """
+    Top-k chunks of the session for `query` (expanded with their neighbors when
+    enabled), best first. Each hit carries text, source, score, token_count and its
+    page range, or video time range for transcript chunks. In hybrid mode the
+    score is the RRF score of the vector and lexical rankings.
+    """
+    num_chunks = VECTOR_SEARCH_LIMIT
+
+    if VECTOR_SEARCH_MODE == "hybrid":
+        results = await _hybrid_hits(query, session_id, num_chunks)
+    else:
+        results = await _vector_hits(query, session_id, num_chunks)
+
+    if VECTOR_SEARCH_NEIGHBORS > 0 and results:
+        return await expand_neighbors(results, session_id, VECTOR_SEARCH_NEIGHBORS)
+    return [{**doc, "text": _content(doc)} for doc in results]
+
+
+def vector_chunk_records(hits: List[Dict[str, Any]]) -> List[RetrievedChunk]:
+    """One retrieval record per hit (or merged neighbor group), best first."""
+    records = []
+    for doc in hits:
+        text = doc.get("text", "").strip()
+        source = doc.get("source", "Internal Doc")
+        if doc.get("chunk_index") is not None:
+            position = (doc["chunk_index"], doc.get("chunk_index_end", doc["chunk_index"]))
+        else:
+            # Chunks written before chunk positions existed
+            position = (text,)
+        records.append(make_chunk_record(
+            chunk_record_id("vector_db", source, *position),
+            source_type="vector_db",
+            source_name=source,
+            content=text,
+            score=doc.get("score"),
+            location=cite_location(doc),
+            # Stored counts are used as-is; only legacy chunks without one are tokenized
+            token_count=doc.get("token_count"),
+            match_content=doc.get("match_text"),
+            match_token_count=doc.get("match_token_count"),
+        ))
+    return records
+
+
+async def run_vector_search(query: str, session_id: str) -> List[RetrievedChunk]:
+    """
+    Search the vector database and return one record per relevant chunk.
+    """
+    try:
+        hits = await search_vector_chunks(query, session_id)
+        return vector_chunk_records(hits)
 
     except Exception as e:
         logger.error(f"❌ Vector search failed: {str(e)}", exc_info=True)
-        return "Error searching internal documents."
\ No newline at end of file
+        return []
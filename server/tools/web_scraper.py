@@ -1,33 +1,64 @@
 import re
+import logging
+from typing import List
 from bs4 import BeautifulSoup
+from fastapi.concurrency import run_in_threadpool
 
-async def run_web_scrape(url: str, http_client) -> str:
+from state.state import RetrievedChunk
+from tools.chunk_records import chunk_record_id, make_chunk_record
+from modules.text_splitting import make_text_splitter
+
+logger = logging.getLogger(__name__)
+
+# Page text kept, and the passages (in embedding tokens) it is cut into for reranking
+WEB_SCRAPE_MAX_CHARS = 20000
+WEB_PASSAGE_TOKENS = 200
+WEB_PASSAGE_OVERLAP_TOKENS = 20
+
+
+def _page_passages(html: str) -> List[str]:
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 1. Remove absolute noise
+    # Added 'iframe', 'header', and 'svg' which often contain junk data
+    for element in soup(["script", "style", "nav", "footer", "header", "aside", "form", "iframe", "svg"]):
+        element.decompose()
+
+    # 2. Strategic Text Extraction
+    text = soup.get_text(separator="\n")
+
+    # 3. Clean and Normalize
+    clean_text = re.sub(r'\n{3,}', '\n\n', text)
+    
+    # Remove trailing/leading whitespace from each line
+    clean_text = "\n".join([line.strip() for line in clean_text.splitlines() if line.strip()])
+
+    # 4. Truncate, then split so the reranker can pick the relevant passages
+    splitter = make_text_splitter(WEB_PASSAGE_TOKENS, WEB_PASSAGE_OVERLAP_TOKENS)
+    return splitter.split_text(clean_text[:WEB_SCRAPE_MAX_CHARS])
+
+
+async def run_web_scrape(url: str, http_client) -> List[RetrievedChunk]:
     """
-    logic: Fetches a URL and returns LLM-friendly cleaned text.
+    logic: Fetches a URL and returns its LLM-friendly cleaned text as passages.
     """
     try:
         response = await http_client.get(url)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, "html.parser")
+        # Parsing and token-measured splitting are CPU work: off the event loop
+        passages = await run_in_threadpool(_page_passages, response.text)
 
-        # 1. Remove absolute noise
-        # Added 'iframe', 'header', and 'svg' which often contain junk data
-        for element in soup(["script", "style", "nav", "footer", "header", "aside", "form", "iframe", "svg"]):
-            element.decompose()
-
-        # 2. Strategic Text Extraction
-        text = soup.get_text(separator="\n")
-
-        # 3. Clean and Normalize
-        clean_text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Remove trailing/leading whitespace from each line
-        clean_text = "\n".join([line.strip() for line in clean_text.splitlines() if line.strip()])
-
-        # 4. Truncate
-        return clean_text[:6000]
+        return [
+            make_chunk_record(
+                chunk_record_id("webpage", url, i),
+                source_type="webpage",
+                source_name=url,
+                content=passage,
+            )
+            for i, passage in enumerate(passages)
+        ]
 
     except Exception as e:
-        return f"Error scraping {url}: {str(e)}"
-
+        logger.error(f"❌ Scraping {url} failed: {str(e)}")
+        return []